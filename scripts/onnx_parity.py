@@ -0,0 +1,56 @@
+"""Compare the ONNX embedding backend with the torch model: parity and speed.
+
+Run from the repository root with the optional ONNX requirements installed
+(pip install -r server/requirements-onnx.txt):
+
+    python -m scripts.onnx_parity MODEL_PATH [--no-quantize] [--min-cosine 0.99]
+
+Exits non-zero when the embeddings disagree.
+"""
+
+import argparse
+import sys
+import time
+
+from chromadb.utils import embedding_functions
+
+from server.shared.onnx_embedding import (
+    PARITY_TEXTS,
+    OnnxEmbeddingFunction,
+    parity_report,
+)
+
+
+def main() -> int:
+    arg_parser = argparse.ArgumentParser(
+        description="Compare the ONNX embedding backend with the torch model"
+    )
+    arg_parser.add_argument("model_path")
+    arg_parser.add_argument("--no-quantize", action="store_true")
+    arg_parser.add_argument("--min-cosine", type=float, default=0.99)
+    args = arg_parser.parse_args()
+
+    timings = {}
+    start = time.perf_counter()
+    candidate = OnnxEmbeddingFunction(args.model_path, quantize=not args.no_quantize)
+    timings["onnx load"] = time.perf_counter() - start
+    start = time.perf_counter()
+    reference = embedding_functions.SentenceTransformerEmbeddingFunction(model_name=args.model_path)
+    timings["torch load"] = time.perf_counter() - start
+
+    corpus = PARITY_TEXTS * 32
+    for label, fn in (("torch", reference), ("onnx", candidate)):
+        fn(input=corpus[:8])  # Warm up
+        start = time.perf_counter()
+        fn(input=corpus)
+        timings[f"{label} embed {len(corpus)}"] = time.perf_counter() - start
+
+    report = parity_report(reference, candidate)
+    for label, seconds in timings.items():
+        print(f"{label}: {seconds * 1000:.0f}ms")
+    print(f"cosine min {report.min_cosine:.4f} mean {report.mean_cosine:.4f}")
+    return 0 if report.passed(args.min_cosine) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
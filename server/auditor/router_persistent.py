@@ -1,52 +1,65 @@
+import asyncio
 import logging
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import JSONResponse
 from sqlalchemy import desc
 from sqlalchemy.orm import Session
 
 from server.auditor.service_persistent import PersistentAuditor
 from server.models.auditor import AuditFinding, AuditRun
-from server.shared.database import get_db
+from server.services.task_queue import task_queue, task_worker
+from server.shared.database import SessionLocal, get_db
 
 router = APIRouter(prefix="/auditor", tags=["auditor"])
 logger = logging.getLogger(__name__)
 
 
-async def run_persistent_audit(auditor: PersistentAuditor, project_id: str, project_path: str):
-    """Background task for persistent audit"""
-    try:
-        result = auditor.audit_project_persistent(project_id, project_path)
-        logger.info(
-            f"Persistent audit completed: {project_id}. Score: {result.get('health_score')}"
-        )
-    except Exception as e:
-        logger.error(f"Persistent audit failed: {e}")
+AUDIT_TASK = "audit_project"
+
+
+async def run_audit_task(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Task queue handler for a queued persistent audit"""
+    payload = task["payload"]
+
+    def audit():
+        db = SessionLocal()
+        try:
+            auditor = PersistentAuditor(db)
+            return auditor.audit_project_persistent(payload["project_id"], payload["project_path"])
+        finally:
+            db.close()
+
+    # The audit is synchronous; keep it off the event loop
+    result = await asyncio.get_running_loop().run_in_executor(None, audit)
+    logger.info(
+        f"Persistent audit completed: {payload['project_id']}. Score: {result.get('health_score')}"
+    )
+    return result
+
+
+task_worker.register(AUDIT_TASK, run_audit_task)
 
 
 @router.post("/project/{project_id}/persistent")
-async def audit_project_persistent(
-    project_id: str,
-    project_path: str,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
-) -> JSONResponse:
+async def audit_project_persistent(project_id: str, project_path: str) -> JSONResponse:
     """Audit project with persistent results"""
 
     try:
-        auditor = PersistentAuditor(db)
-
-        # Start background audit
-        background_tasks.add_task(
-            run_persistent_audit, auditor=auditor, project_id=project_id, project_path=project_path
+        job_id = task_queue.enqueue(
+            AUDIT_TASK,
+            {"project_id": project_id, "project_path": project_path},
+            project_id=project_id,
         )
+        task_worker.wake()
 
         return JSONResponse(
             {
-                "status": "started",
+                "status": "queued",
+                "job_id": job_id,
                 "project_id": project_id,
-                "message": "Audit started with persistence",
+                "message": "Audit queued with persistence",
             }
         )
 
@@ -55,6 +68,15 @@ async def audit_project_persistent(
         raise HTTPException(500, f"Failed to start audit: {str(e)}")
 
 
+@router.get("/job/{job_id}")
+async def get_audit_job(job_id: str) -> JSONResponse:
+    """Get status (and result, once completed) of a queued audit"""
+    task = task_queue.get(job_id)
+    if not task or task["kind"] != AUDIT_TASK:
+        raise HTTPException(404, "Job not found")
+    return JSONResponse(task)
+
+
 @router.get("/project/{project_id}/runs")
 async def get_audit_runs(
     project_id: str, limit: int = 10, db: Session = Depends(get_db)
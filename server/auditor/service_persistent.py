@@ -32,25 +32,24 @@ class PersistentAuditor(AuditEngine):
         self.db.commit()
 
         try:
-            # Get project files (simplified walk)
-            import os
-
+            # Get project files (same ignore-aware walk as ingestion)
             from server.ingestion.parser import CodeParser
+            from server.shared.project_walker import ProjectWalker
 
             parser = CodeParser()
+            walker = ProjectWalker(
+                extensions=parser.SUPPORTED_EXTENSIONS, max_file_size=parser.MAX_FILE_SIZE
+            )
 
             project_files = []
-            for root, _, files in os.walk(project_path):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    if parser.should_parse_file(file_path):
-                        try:
-                            language = parser.detect_language(file_path)
-                            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                                content = f.read()
-                            project_files.append((file_path, content, language))
-                        except:
-                            continue
+            for entry in walker.walk(project_path):
+                try:
+                    language = parser.detect_language(entry.path)
+                    with open(entry.path, "r", encoding="utf-8", errors="ignore") as f:
+                        content = f.read()
+                    project_files.append((entry.path, content, language))
+                except:
+                    continue
 
             audit_run.total_files = len(project_files)
             self.db.commit()
@@ -8,7 +8,7 @@ from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
 from server.llm.client import LLMClient, UserLLMConfig
 from server.services.settings_loader import SettingsLoader
 from server.shared.database import get_db
-from server.shared.vector_store import VectorStore
+from server.shared.vector_store import get_vector_store
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 logger = logging.getLogger(__name__)
@@ -108,17 +108,10 @@ async def handle_chat_message(
         # 2. RAG: Retrieve relevant context
         relevant_code = []
         if context.get("project_id"):
-            vector_store = VectorStore()
-            # Note: query_similar_code might be async or sync depending on impl
-            # Assuming it's async based on earlier files, but VectorStore uses run_in_executor usually
-            # Let's check the vector_store.py if we have time, but sticking to "async" is safer if uncertain
-            # Actually, previous analysis of vector_store.py showed it uses run_in_executor
-            # so we should await it if it's defined as async def.
-            # However, looking at previous logs, it seemed flexible.
-            # We'll assume awaitable.
+            vector_store = get_vector_store()  # Shared with ingestion; loaded at startup
             try:
-                # Mock call for now if VectorStore isn't fully robust locally
-                relevant_code = await vector_store.query_similar_code(
+                # Symbol and keyword matches do not wait for the embedding model to load
+                relevant_code = await vector_store.search_code(
                     project_id=context["project_id"], query=user_message, n_results=3
                 )
             except Exception as e:
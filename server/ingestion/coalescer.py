@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# (project_id, {file_path: content}) -> {file_path: result}
+FlushFn = Callable[[str, Dict[str, str]], Awaitable[Dict[str, Any]]]
+
+
+class _Pending:
+    """Saves collected for one project since its last flush"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.files: Dict[str, str] = {}
+        self.result: asyncio.Future = loop.create_future()
+        self.first_at = loop.time()
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class SaveCoalescer:
+    """Debounces file saves per project and ingests them as one batch.
+
+    Repeated saves of a path within the debounce window keep only the latest
+    content, so a save storm (format all, branch checkout) costs one parse
+    per distinct file and one embed/write/commit per batch. A batch is
+    flushed once no save arrived for `debounce` seconds, or `max_delay`
+    seconds after its first save. Flushes of one project run one at a time,
+    in order.
+    """
+
+    def __init__(self, flush: FlushFn, debounce: float = 0.25, max_delay: float = 2.0):
+        self.flush = flush
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._pending: Dict[str, _Pending] = {}
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    @classmethod
+    def from_env(cls, flush: FlushFn) -> "SaveCoalescer":
+        """Build from INGESTION_DEBOUNCE_MS / INGESTION_MAX_DELAY_MS"""
+        return cls(
+            flush,
+            debounce=int(os.getenv("INGESTION_DEBOUNCE_MS", "250")) / 1000,
+            max_delay=int(os.getenv("INGESTION_MAX_DELAY_MS", "2000")) / 1000,
+        )
+
+    async def submit(self, project_id: str, files: Dict[str, str]) -> Dict[str, Any]:
+        """Queue saves and wait for the batch that ingests them; results per submitted path"""
+        loop = asyncio.get_running_loop()
+        pending = self._pending.get(project_id)
+        if pending is None:
+            pending = self._pending[project_id] = _Pending(loop)
+        pending.files.update(files)
+
+        if pending.timer:
+            pending.timer.cancel()
+        if self.debounce <= 0 or loop.time() - pending.first_at >= self.max_delay:
+            self._start_flush(project_id)
+        else:
+            pending.timer = loop.call_later(self.debounce, self._start_flush, project_id)
+
+        # Shielded: one cancelled request must not cancel the batch others wait on
+        results = await asyncio.shield(pending.result)
+        return {path: results[path] for path in files}
+
+    def _start_flush(self, project_id: str):
+        pending = self._pending.pop(project_id, None)
+        if pending is not None:
+            asyncio.ensure_future(self._flush(project_id, pending))
+
+    async def _flush(self, project_id: str, pending: _Pending):
+        async with self._locks[project_id]:
+            try:
+                results = await self.flush(project_id, pending.files)
+            except Exception as e:
+                logger.error(f"Ingesting {len(pending.files)} saved files failed: {e}")
+                pending.result.set_exception(e)
+            else:
+                pending.result.set_result(results)
@@ -0,0 +1,96 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Optional
+
+from server.shared.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+
+class ParseCache(SQLiteStore):
+    """On-disk LRU cache of parse results.
+
+    Entries are keyed by (content hash, parser version, language), so a hit
+    is valid for any file with the same content. Stored in SQLite so the
+    parser's process-pool workers can share it; each thread and process
+    opens its own connection.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS parse_cache (
+            key TEXT PRIMARY KEY,
+            payload TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            last_used REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_parse_cache_last_used ON parse_cache(last_used);
+    """
+    EVICT_CHECK_INTERVAL = 64
+
+    @classmethod
+    def from_env(cls) -> Optional["ParseCache"]:
+        """Build from PARSE_CACHE_PATH / PARSE_CACHE_MAX_MB (0 disables the cache)"""
+        max_mb = int(os.getenv("PARSE_CACHE_MAX_MB", "256"))
+        if max_mb <= 0:
+            return None
+        path = os.getenv("PARSE_CACHE_PATH", "./parse_cache.sqlite3")
+        return cls(path, max_mb * 1024 * 1024)
+
+    @staticmethod
+    def make_key(content_hash: str, parser_version: str, language: str) -> str:
+        return f"{content_hash}:{parser_version}:{language}"
+
+    def __getstate__(self):
+        # Sent to process-pool workers: connections stay behind
+        return {"path": self.path, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], state["max_bytes"])
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached record for key, marking it recently used"""
+        try:
+            conn = self._connect()
+            row = conn.execute("SELECT payload FROM parse_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE parse_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            return json.loads(row[0])
+        except (sqlite3.Error, ValueError) as e:
+            logger.debug(f"Parse cache read failed: {e}")
+            return None
+
+    def put(self, key: str, record: Dict[str, Any]):
+        try:
+            payload = json.dumps(record)
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO parse_cache (key, payload, size, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                (key, payload, len(payload), time.time()),
+            )
+            conn.commit()
+            self._count_writes(conn)
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.debug(f"Parse cache write failed: {e}")
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Drop least recently used entries, summing their stored payload sizes"""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM parse_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        excess = total - int(self.max_bytes * self.EVICT_TARGET)
+        stale_keys = []
+        for key, size in conn.execute("SELECT key, size FROM parse_cache ORDER BY last_used"):
+            stale_keys.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM parse_cache WHERE key = ?", stale_keys)
+        conn.commit()
+        logger.info(f"Parse cache evicted {len(stale_keys)} entries")
@@ -1,10 +1,23 @@
+import bisect
+import collections
 import hashlib
+import io
+import itertools
 import logging
+import multiprocessing
 import os
-import re
-from dataclasses import dataclass, field
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field, replace
 from enum import Enum
-from typing import Any, Dict, List, Optional, Tuple
+from functools import cached_property
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from server.ingestion.parse_cache import ParseCache
+from server.ingestion.regex_scanner import get_scanner
+from server.ingestion.token_budget import TokenBudget
+from server.shared.project_walker import ProjectWalker
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +57,54 @@ class FileMetadata:
     hash: str
     parser_mode_used: ParserMode
     error_messages: List[str] = field(default_factory=list)
+    # MD5 of the raw bytes on disk; None for content parsed from memory
+    file_hash: Optional[str] = None
+    # (mtime_ns, size) taken when the file was opened, before the bytes hashed above were read
+    file_stat: Optional[Tuple[int, int]] = None
+    # Streamed large files arrive in parts: set on every part but the last
+    partial: bool = False
+    # Distinct chunks over all parts of a streamed file (the last part holds only its own)
+    chunks_count: Optional[int] = None
+
+
+@dataclass
+class ParsedSource:
+    """A file's text plus the derived views every extractor and chunker shares.
+
+    Built once per file so the line split, line-offset index and content hash
+    are computed a single time instead of per extractor.
+    """
+
+    text: str
+    lines: List[str] = field(init=False, repr=False)
+    line_starts: List[int] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.lines = self.text.split("\n")
+        # Offset of the first character of each line (+1 skips the newline)
+        self.line_starts = [0] + list(
+            itertools.accumulate(len(line) + 1 for line in self.lines[:-1])
+        )
+
+    @cached_property
+    def data(self) -> bytes:
+        """UTF-8 encoded text (hashing and tree-sitter both need bytes)"""
+        return self.text.encode("utf-8")
+
+    @cached_property
+    def content_hash(self) -> str:
+        return hashlib.md5(self.data).hexdigest()
+
+    @property
+    def total_lines(self) -> int:
+        return len(self.lines)
+
+    def line_of(self, offset: int) -> int:
+        """0-based line number containing a character offset"""
+        return bisect.bisect_right(self.line_starts, offset) - 1
+
+    def join_lines(self, start: int, end: int) -> str:
+        return "\n".join(self.lines[start:end])
 
 
 class ParserCapability:
@@ -85,16 +146,7 @@ class ParserCapability:
             "java",
         ]:
             return ParserMode.TREE_SITTER
-        elif language in [
-            "python",
-            "javascript",
-            "typescript",
-            "java",
-            "go",
-            "rust",
-            "csharp",
-            "php",
-        ]:
+        elif get_scanner(language) is not None:
             return ParserMode.REGEX
         else:
             return ParserMode.LINES
@@ -125,9 +177,78 @@ class CodeParser:
 
     MAX_FILE_SIZE = 10 * 1024 * 1024
 
-    def __init__(self):
+    # Files above this are read line by line and chunked as they stream in
+    LARGE_FILE_SIZE = 1024 * 1024
+    # Leading bytes checked for NUL to detect binary content
+    BINARY_SNIFF_BYTES = 8192
+
+    # Line windows used when no token budget is configured
+    LINE_CHUNK_SIZE = 50
+    LINE_CHUNK_OVERLAP = 10
+    # Without a token budget, code between definitions shorter than this joins the one before it
+    MIN_GAP_LINES = 3
+    # With a token budget, windows overlap by up to this fraction of the budget
+    TOKEN_OVERLAP_DIVISOR = 8
+
+    # Bump whenever extraction or chunking output changes; invalidates the parse cache
+    PARSER_VERSION = 5
+
+    # Parallel scan batching: bytes of source per process-pool task
+    MIN_SCAN_BATCH_BYTES = 256 * 1024
+    MAX_SCAN_BATCH_FILES = 200
+    # Chunks per part when a large file is streamed to ingestion
+    LARGE_FILE_PART_CHUNKS = 256
+    # Batches submitted ahead per worker; bounds results held by finished futures
+    MAX_SCAN_BATCHES_PER_WORKER = 2
+
+    # Per-language tree-sitter queries. Definitions are captured as @function /
+    # @class (the name is read from the node's "name" field); @import captures
+    # the imported module.
+    TREE_SITTER_QUERIES = {
+        "python": """
+            (function_definition) @function
+            (class_definition) @class
+            (import_statement name: (dotted_name) @import)
+            (import_statement name: (aliased_import name: (dotted_name) @import))
+            (import_from_statement module_name: (_) @import)
+        """,
+        "javascript": """
+            (function_declaration) @function
+            (generator_function_declaration) @function
+            (method_definition) @function
+            (variable_declarator value: [(arrow_function) (function)]) @function
+            (class_declaration) @class
+            (import_statement source: (string) @import)
+        """,
+        "typescript": """
+            (function_declaration) @function
+            (generator_function_declaration) @function
+            (method_definition) @function
+            (variable_declarator value: [(arrow_function) (function)]) @function
+            (class_declaration) @class
+            (abstract_class_declaration) @class
+            (import_statement source: (string) @import)
+        """,
+        "java": """
+            (method_declaration) @function
+            (constructor_declaration) @function
+            (class_declaration) @class
+            (interface_declaration) @class
+            (enum_declaration) @class
+            (import_declaration [(scoped_identifier) (identifier)] @import)
+        """,
+    }
+
+    # Parent nodes that belong to a definition's span (decorators, export keywords)
+    TREE_SITTER_WRAPPERS = {"decorated_definition", "export_statement"}
+
+    def __init__(
+        self, cache: Optional[ParseCache] = None, token_budget: Optional[TokenBudget] = None
+    ):
         self.capabilities = ParserCapability()
-        self.parsers = {}
+        self.cache = cache
+        self.token_budget = token_budget
+        self._local = threading.local()
         logger.info(
             f"Available parser modes: {[m.value for m in self.capabilities.supported_modes]}"
         )
@@ -137,41 +258,84 @@ class CodeParser:
         return self.SUPPORTED_EXTENSIONS.get(ext)
 
     def should_parse_file(self, file_path: str) -> bool:
+        # Cheap name checks first; stat only files that could be parsed
         if not self.detect_language(file_path):
             return False
+
+        parts = os.path.normpath(file_path).split(os.sep)
+        if any(part in ProjectWalker.SKIP_DIRS for part in parts[:-1]):
+            return False
+
         try:
             if os.path.getsize(file_path) > self.MAX_FILE_SIZE:
                 return False
         except OSError:
             return False
-
-        skip_dirs = {
-            "node_modules",
-            "__pycache__",
-            ".git",
-            "dist",
-            "build",
-            "vendor",
-            ".venv",
-            "venv",
-        }
-        if any(skip in file_path for skip in skip_dirs):
-            return False
-
-        binary_exts = {".pyc", ".so", ".dll", ".exe", ".jpg", ".png"}
-        if any(file_path.endswith(ext) for ext in binary_exts):
-            return False
         return True
 
     def parse_file(
         self, file_path: str, content: Optional[str] = None
     ) -> Tuple[FileMetadata, List[CodeChunk]]:
-        if content is None:
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
+        """Parse content, or the file on disk when content is None.
 
+        For files read from disk, metadata.file_hash is the MD5 of the raw
+        bytes (as FileIndexTracker hashes them), even when decoding
+        normalizes line endings, and metadata.file_stat the file's stat at
+        open time.
+        """
         language = self.detect_language(file_path) or "text"
-        file_hash = hashlib.md5(content.encode()).hexdigest()
+        if content is not None:
+            return self._parse_source(file_path, ParsedSource(content), language)
+
+        with open(file_path, "rb") as raw:
+            file_stat = self._open_file_stat(raw)
+            head = raw.read(self.BINARY_SNIFF_BYTES)
+            if b"\0" in head:
+                metadata, chunks = self._binary_result(file_path, language, raw, head)
+            elif file_stat[1] > self.LARGE_FILE_SIZE:
+                raw.seek(0)
+                metadata, chunks = self._parse_large_file(file_path, raw, language)
+                chunks = list(chunks)
+            else:
+                raw.seek(0)
+                data = raw.read()
+                metadata = None
+
+        if metadata is None:
+            text = data.decode("utf-8")
+            if "\r" in text:
+                # Universal newlines, as text-mode reads do
+                text = text.replace("\r\n", "\n").replace("\r", "\n")
+            metadata, chunks = self._parse_source(file_path, ParsedSource(text), language)
+            metadata.file_hash = hashlib.md5(data).hexdigest()
+        metadata.file_stat = file_stat
+        return metadata, chunks
+
+    @staticmethod
+    def _open_file_stat(raw: io.BufferedIOBase) -> Tuple[int, int]:
+        """(mtime_ns, size) of an open file, taken before reading it.
+
+        Stored with the file's hash, so it must never be newer than the bytes
+        hashed: an edit made while the file is read then shows up as a stat
+        change on the next incremental run instead of being missed.
+        """
+        st = os.fstat(raw.fileno())
+        return st.st_mtime_ns, st.st_size
+
+    def _parse_source(
+        self, file_path: str, source: ParsedSource, language: str
+    ) -> Tuple[FileMetadata, List[CodeChunk]]:
+        cache_key = None
+        if self.cache is not None:
+            # Grammar rather than language: .ts and .tsx share a language but not a parse
+            cache_key = ParseCache.make_key(
+                source.content_hash,
+                self._cache_version(),
+                self._treesitter_grammar(language, file_path),
+            )
+            record = self.cache.get(cache_key)
+            if record is not None:
+                return self._from_cache_record(file_path, source, language, record)
 
         recommended = self.capabilities.get_recommended_mode(language)
         modes_to_try = [recommended] + [
@@ -181,184 +345,310 @@ class CodeParser:
         for mode in modes_to_try:
             try:
                 if mode == ParserMode.TREE_SITTER:
-                    return self._parse_with_treesitter(file_path, content, language, file_hash)
+                    metadata, chunks = self._parse_with_treesitter(file_path, source, language)
                 elif mode == ParserMode.REGEX:
-                    return self._parse_with_regex(file_path, content, language, file_hash)
+                    metadata, chunks = self._parse_with_regex(file_path, source, language)
                 else:
-                    return self._parse_with_lines(file_path, content, language, file_hash)
+                    metadata, chunks = self._parse_with_lines(file_path, source, language)
             except Exception as e:
                 logger.debug(f"Failed to parse {file_path} with {mode.value}: {e}")
                 continue
 
+            if cache_key is not None:
+                self.cache.put(cache_key, self._to_cache_record(metadata, chunks))
+            return metadata, chunks
+
         # Last resort
-        return self._parse_minimal(file_path, content, language, file_hash, "All parsers failed")
+        return self._parse_minimal(file_path, source, language, "All parsers failed")
 
-    def _parse_with_treesitter(self, file_path: str, content: str, language: str, file_hash: str):
-        if not self.capabilities.tree_sitter_available:
-            raise ImportError("Tree-sitter unavailable")
-        from tree_sitter_languages import get_parser
+    def _cache_version(self) -> str:
+        """Parser version plus the token budget, since both decide chunk boundaries"""
+        if self.token_budget is None:
+            return str(self.PARSER_VERSION)
+        return f"{self.PARSER_VERSION}+{self.token_budget.signature}"
 
-        if language not in self.parsers:
-            self.parsers[language] = get_parser(language)
+    def _to_cache_record(self, metadata: FileMetadata, chunks: List[CodeChunk]) -> Dict:
+        """Path-independent parse result: extraction output plus chunk boundaries"""
+        return {
+            "functions": metadata.functions,
+            "classes": metadata.classes,
+            "imports": metadata.imports,
+            "parser_mode": metadata.parser_mode_used.value,
+            "error_messages": metadata.error_messages,
+            "chunks": [
+                [
+                    c.start_line,
+                    c.end_line,
+                    c.metadata.get("element_type"),
+                    c.metadata.get("element_name"),
+                ]
+                for c in chunks
+            ],
+        }
+
+    def _from_cache_record(
+        self, file_path: str, source: ParsedSource, language: str, record: Dict
+    ) -> Tuple[FileMetadata, List[CodeChunk]]:
+        """Rebuild a parse result for file_path from a cached record"""
+        parser_mode = ParserMode(record["parser_mode"])
+        metadata = FileMetadata(
+            language,
+            file_path,
+            record["functions"],
+            record["classes"],
+            record["imports"],
+            source.total_lines,
+            source.content_hash,
+            parser_mode,
+            record["error_messages"],
+        )
+        chunks = [
+            self._make_chunk(
+                file_path,
+                source.join_lines(start, end),
+                language,
+                parser_mode,
+                start,
+                end,
+                {"type": element_type, "name": name} if element_type else None,
+            )
+            for start, end, element_type, name in record["chunks"]
+        ]
+        return metadata, chunks
+
+    def _get_treesitter_parser(self, language: str, file_path: str):
+        """Get the calling thread's (parser, query) pair for a language.
 
-        parser = self.parsers[language]
-        # tree = parser.parse(bytes(content, 'utf-8'))
-        # NOTE: Full tree-sitter extraction logic omitted for MVP brevity, defaulting to regex inside TS block for now or assume simple pass
-        # For this refactor, let's behave as if we extracted properly, but actually we might need the extraction logic.
-        # Since I am replacing the file, I should probably include the extraction logic if I want it to actually work.
-        # But for robustness, I will fall back to regex even inside here if extraction is complex.
+        tree-sitter parsers are not safe to share between the ingestion
+        executor's worker threads, so each thread lazily builds its own.
+        """
+        from tree_sitter_languages import get_language, get_parser
 
-        # ACTUALLY, let's just stick to the plan:
-        # The plan had `_extract_with_treesitter_query` but stubbed it out.
-        # I will do the same: rely on regex for extraction but tag it as TS if TS parser loaded (somewhat cheating but safe).
+        grammar = self._treesitter_grammar(language, file_path)
+        cache = getattr(self._local, "treesitter", None)
+        if cache is None:
+            cache = self._local.treesitter = {}
+        if grammar not in cache:
+            query = get_language(grammar).query(self.TREE_SITTER_QUERIES[language])
+            cache[grammar] = (get_parser(grammar), query)
+        return cache[grammar]
 
-        functions = self._extract_functions_regex(content, language)
-        classes = self._extract_classes_regex(content, language)
-        imports = self._extract_imports_regex(content, language)
+    def _treesitter_grammar(self, language: str, file_path: str) -> str:
+        # .tsx shares the "typescript" language but needs the JSX-aware grammar
+        if language == "typescript" and file_path.lower().endswith(".tsx"):
+            return "tsx"
+        return language
+
+    def _parse_with_treesitter(self, file_path: str, source: ParsedSource, language: str):
+        if not self.capabilities.tree_sitter_available:
+            raise ImportError("Tree-sitter unavailable")
+        if language not in self.TREE_SITTER_QUERIES:
+            raise ValueError(f"No tree-sitter query for {language}")
+
+        parser, query = self._get_treesitter_parser(language, file_path)
+        tree = parser.parse(source.data)
+        functions, classes, imports = self._extract_with_treesitter_query(tree, query)
 
-        lines = content.split("\n")
         metadata = FileMetadata(
             language,
             file_path,
             functions,
             classes,
             imports,
-            len(lines),
-            file_hash,
+            source.total_lines,
+            source.content_hash,
             ParserMode.TREE_SITTER,
         )
-        chunks = self._chunk_by_structure(
-            file_path, content, language, metadata, ParserMode.TREE_SITTER
-        )
+        if functions or classes:
+            chunks = self._chunk_by_structure(
+                file_path, source, language, metadata, ParserMode.TREE_SITTER
+            )
+        else:
+            chunks = self._chunk_by_lines(file_path, source, language, ParserMode.TREE_SITTER)
         return metadata, chunks
 
-    def _parse_with_regex(self, file_path: str, content: str, language: str, file_hash: str):
-        functions = self._extract_functions_regex(content, language)
-        classes = self._extract_classes_regex(content, language)
-        imports = self._extract_imports_regex(content, language)
+    def _extract_with_treesitter_query(
+        self, tree, query
+    ) -> Tuple[List[Dict], List[Dict], List[str]]:
+        """Run the language query and return (functions, classes, imports) with exact lines"""
+        functions, classes, imports = [], [], []
+        seen = set()
+        for node, capture in query.captures(tree.root_node):
+            if capture == "import":
+                imports.append(node.text.decode("utf-8", errors="ignore").strip("'\"` "))
+                continue
+
+            name_node = node.child_by_field_name("name")
+            if name_node is None:
+                continue
+            # Include decorators / export keywords in the element's span
+            outer = node
+            while outer.parent is not None and outer.parent.type in self.TREE_SITTER_WRAPPERS:
+                outer = outer.parent
+            key = (outer.start_byte, outer.end_byte, capture)
+            if key in seen:
+                continue
+            seen.add(key)
+
+            element = {
+                "name": name_node.text.decode("utf-8", errors="ignore"),
+                "start_line": outer.start_point[0],
+                "end_line": outer.end_point[0],
+                "type": capture,
+            }
+            (functions if capture == "function" else classes).append(element)
+        return functions, classes, list(set(imports))
+
+    def _parse_with_regex(self, file_path: str, source: ParsedSource, language: str):
+        functions, classes, imports = self._extract_with_regex(source, language)
 
-        lines = content.split("\n")
         metadata = FileMetadata(
             language,
             file_path,
             functions,
             classes,
             imports,
-            len(lines),
-            file_hash,
+            source.total_lines,
+            source.content_hash,
             ParserMode.REGEX,
         )
 
         if functions or classes:
             chunks = self._chunk_by_structure(
-                file_path, content, language, metadata, ParserMode.REGEX
+                file_path, source, language, metadata, ParserMode.REGEX
             )
         else:
-            chunks = self._chunk_by_lines(file_path, lines, language, ParserMode.REGEX)
+            chunks = self._chunk_by_lines(file_path, source, language, ParserMode.REGEX)
         return metadata, chunks
 
-    def _parse_with_lines(self, file_path: str, content: str, language: str, file_hash: str):
-        lines = content.split("\n")
+    def _extract_with_regex(
+        self, source: ParsedSource, language: str
+    ) -> Tuple[List[Dict], List[Dict], List[str]]:
+        """Functions, classes and imports from one pass of the language's scanner"""
+        functions, classes, imports = [], [], []
+        scanner = get_scanner(language)
+        if scanner is None:
+            return functions, classes, imports
+
+        for kind, name, offset in scanner.scan(source.text):
+            if kind == "import":
+                imports.append(name)
+                continue
+            element = {
+                "name": name,
+                "start_line": source.line_of(offset),
+                "end_line": None,  # Estimated when chunking
+                "type": kind,
+            }
+            (functions if kind == "function" else classes).append(element)
+        return functions, classes, list(set(imports))
+
+    def _parse_with_lines(self, file_path: str, source: ParsedSource, language: str):
         metadata = FileMetadata(
-            language, file_path, [], [], [], len(lines), file_hash, ParserMode.LINES
+            language,
+            file_path,
+            [],
+            [],
+            [],
+            source.total_lines,
+            source.content_hash,
+            ParserMode.LINES,
         )
-        chunks = self._chunk_by_lines(file_path, lines, language, ParserMode.LINES)
+        chunks = self._chunk_by_lines(file_path, source, language, ParserMode.LINES)
         return metadata, chunks
 
-    def _parse_minimal(
-        self, file_path: str, content: str, language: str, file_hash: str, error: str
-    ):
-        lines = content.split("\n")
+    def _parse_large_file(
+        self, file_path: str, raw: io.BufferedIOBase, language: str
+    ) -> Tuple[FileMetadata, Iterator[CodeChunk]]:
+        """Line-window chunks for a large file, emitted as the file is read.
+
+        Structure extraction is skipped. The metadata's line count (matching
+        what ParsedSource would report) and raw-bytes hashes are computed in
+        the same pass, so they are set once the chunk iterator is exhausted.
+        """
+        hashing = _HashingReader(raw)
+        stream = io.TextIOWrapper(io.BufferedReader(hashing), encoding="utf-8")
+        metadata = FileMetadata(language, file_path, [], [], [], 0, "", ParserMode.LINES)
+
+        def iter_lines():
+            ends_with_newline = True
+            for line in stream:
+                metadata.total_lines += 1
+                ends_with_newline = line.endswith("\n")
+                yield line[:-1] if ends_with_newline else line
+            if ends_with_newline:
+                # str.split("\n") yields a trailing empty line here
+                metadata.total_lines += 1
+                yield ""
+
+        def iter_chunks():
+            yield from self.iter_line_chunks(file_path, iter_lines(), language, ParserMode.LINES)
+            metadata.hash = metadata.file_hash = hashing.digest.hexdigest()
+
+        return metadata, iter_chunks()
+
+    def _binary_result(self, file_path: str, language: str, raw: io.BufferedIOBase, head: bytes):
+        digest = hashlib.md5(head)
+        for block in iter(lambda: raw.read(1024 * 1024), b""):
+            digest.update(block)
+        file_hash = digest.hexdigest()
+        metadata = FileMetadata(
+            language,
+            file_path,
+            [],
+            [],
+            [],
+            0,
+            file_hash,
+            ParserMode.FALLBACK,
+            ["Binary content skipped"],
+            file_hash=file_hash,
+        )
+        return metadata, []
+
+    def _parse_minimal(self, file_path: str, source: ParsedSource, language: str, error: str):
         metadata = FileMetadata(
-            language, file_path, [], [], [], len(lines), file_hash, ParserMode.FALLBACK, [error]
+            language,
+            file_path,
+            [],
+            [],
+            [],
+            source.total_lines,
+            source.content_hash,
+            ParserMode.FALLBACK,
+            [error],
         )
         chunk_id = hashlib.md5(f"{file_path}:full".encode()).hexdigest()
         chunk = CodeChunk(
-            content[:2000],
+            source.text[:2000],
             {"file_path": file_path},
             chunk_id,
             0,
-            len(lines),
+            source.total_lines,
             None,
             ParserMode.FALLBACK,
         )
         return metadata, [chunk]
 
-    def _extract_functions_regex(self, content: str, language: str) -> List[Dict]:
-        functions = []
-        patterns = {
-            "python": r"def\s+(\w+)\s*\([^)]*\)\s*(?:->[^:]+)?:",
-            "javascript": r"function\s+(\w+)\s*\([^)]*\)\s*\{",
-            "typescript": r"function\s+(\w+)\s*\([^)]*\)\s*(?::[^{]*)?\{",
-            "java": r"(?:public|private|protected)\s+(?:\w+\s+)*(\w+)\s*\([^)]*\)\s*\{",
-        }
-        if language in patterns:
-            for match in re.finditer(patterns[language], content, re.MULTILINE):
-                functions.append(
-                    {
-                        "name": match.group(1),
-                        "start_line": content[: match.start()].count("\n"),
-                        "end_line": None,  # Estimate later
-                        "type": "function",
-                    }
-                )
-        return functions
-
-    def _extract_classes_regex(self, content: str, language: str) -> List[Dict]:
-        classes = []
-        patterns = {
-            "python": r"class\s+(\w+)\s*(?:\([^)]*\))?\s*:",
-            "javascript": r"class\s+(\w+)\s*(?:extends\s+\w+)?\s*\{",
-            "typescript": r"class\s+(\w+)\s*(?:extends\s+\w+)?\s*\{",
-            "java": r"class\s+(\w+)\s*(?:extends\s+\w+)?\s*(?:implements[^{]*)?\{",
-        }
-        if language in patterns:
-            for match in re.finditer(patterns[language], content, re.MULTILINE):
-                classes.append(
-                    {
-                        "name": match.group(1),
-                        "start_line": content[: match.start()].count("\n"),
-                        "end_line": None,
-                        "type": "class",
-                    }
-                )
-        return classes
-
-    def _extract_imports_regex(self, content: str, language: str) -> List[str]:
-        imports = []
-        patterns = {
-            "python": [r"^import\s+([\w.,\s]+)", r"^from\s+([\w.]+)\s+import"],
-            "javascript": [r'^import\s+.*?[\'"]([^\'"]+)[\'"]'],
-            "typescript": [r'^import\s+.*?[\'"]([^\'"]+)[\'"]'],
-        }
-        if language in patterns:
-            plist = (
-                patterns[language] if isinstance(patterns[language], list) else [patterns[language]]
-            )
-            for p in plist:
-                for m in re.finditer(p, content, re.MULTILINE):
-                    imports.append(m.group(1).strip())
-        return list(set(imports))
-
     def _chunk_by_structure(
         self,
         file_path: str,
-        content: str,
+        source: ParsedSource,
         language: str,
         metadata: FileMetadata,
         parser_mode: ParserMode,
     ) -> List[CodeChunk]:
-        chunks = []
-        lines = content.split("\n")
+        total_lines = source.total_lines
         elements = []
-        # Merge funcs/classes
+        # Merge funcs/classes. Exact end lines come from tree-sitter; regex
+        # extraction leaves them unset, so fall back to a fixed window.
         for f in metadata.functions:
             elements.append(
                 {
                     "type": "function",
                     "name": f["name"],
                     "start": f["start_line"],
-                    "end": f["start_line"] + 20,
+                    "end": f.get("end_line"),
                 }
             )
         for c in metadata.classes:
@@ -367,78 +657,474 @@ class CodeParser:
                     "type": "class",
                     "name": c["name"],
                     "start": c["start_line"],
-                    "end": c["start_line"] + 50,
+                    "end": c.get("end_line"),
                 }
             )
         elements.sort(key=lambda x: x["start"])
 
-        for element in elements:
-            start = max(0, element["start"] - 2)
-            end = min(len(lines), element["end"] + 2)
-            chunk_content = "\n".join(lines[start:end])
-            chunk_id = hashlib.md5(
-                f"{file_path}:{element['type']}:{element['name']}:{start}".encode()
-            ).hexdigest()
-            chunks.append(
-                CodeChunk(
-                    content=chunk_content,
-                    metadata={
-                        "file_path": file_path,
-                        "language": language,
-                        "element_name": element["name"],
-                    },
-                    chunk_id=chunk_id,
-                    start_line=start,
-                    end_line=end,
-                    parser_mode=parser_mode,
-                    embedding_text=chunk_content,
-                )
+        spans = []
+        function_end = -1
+        for idx, element in enumerate(elements):
+            if element["end"] is None:
+                window = 50 if element["type"] == "class" else 20
+                start = max(0, element["start"] - 2)
+                end = min(total_lines, element["start"] + window + 2)
+            else:
+                start = element["start"]
+                end = min(total_lines, element["end"] + 1)
+                # Nested definitions are already part of their function's chunk
+                if start < function_end:
+                    continue
+                if element["type"] == "function":
+                    function_end = end
+                elif idx + 1 < len(elements):
+                    # A class stops where its first member begins, so members
+                    # are chunked once instead of twice.
+                    next_start = elements[idx + 1]["start"]
+                    if start < next_start < end:
+                        end = next_start
+            spans.append((start, end, element))
+
+        # Module-level code and class bodies between members get line windows
+        spans.extend((start, end, None) for start, end in self._gap_spans(source, spans))
+        spans.sort(key=lambda span: span[0])
+
+        if self.token_budget is not None:
+            spans = self._fit_spans_to_budget(source, spans)
+        else:
+            spans = self._attach_small_gaps(spans)
+        return [
+            self._make_chunk(
+                file_path, source.join_lines(start, end), language, parser_mode, start, end, element
             )
-        return chunks
+            for start, end, element in spans
+        ]
+
+    def _gap_spans(
+        self, source: ParsedSource, spans: List[Tuple[int, int, Dict]]
+    ) -> List[Tuple[int, int]]:
+        """Line ranges no span covers, trimmed of blank lines.
+
+        Without a token budget, long ranges are cut into the same overlapping
+        windows iter_line_chunks uses; with one, _fit_spans_to_budget splits them.
+        """
+        covered = bytearray(source.total_lines)
+        for start, end, _ in spans:
+            covered[start:end] = b"\1" * (end - start)
+
+        ranges = []
+        line = 0
+        while line < source.total_lines:
+            if covered[line] or not source.lines[line].strip():
+                line += 1
+                continue
+            start = line
+            while line < source.total_lines and not covered[line]:
+                line += 1
+            end = line
+            while not source.lines[end - 1].strip():
+                end -= 1
+            ranges.append((start, end))
+
+        if self.token_budget is not None:
+            return ranges
+        size = self.LINE_CHUNK_SIZE
+        step = size - self.LINE_CHUNK_OVERLAP
+        windows = []
+        for start, end in ranges:
+            for window_start in range(start, max(start + 1, end - self.LINE_CHUNK_OVERLAP), step):
+                windows.append((window_start, min(end, window_start + size)))
+        return windows
+
+    def _attach_small_gaps(self, spans: List[Tuple[int, int, Dict]]) -> List[Tuple[int, int, Dict]]:
+        """Fold gap spans under MIN_GAP_LINES into the span before them.
+
+        A closing brace or a class attribute between methods is too small to
+        be a useful chunk on its own. A gap that opens the file (its imports)
+        has no span before it and stays a chunk.
+        """
+        attached = []
+        for start, end, element in spans:
+            if element is None and attached and end - start < self.MIN_GAP_LINES:
+                prev_start, prev_end, prev_element = attached[-1]
+                attached[-1] = (prev_start, max(prev_end, end), prev_element)
+                continue
+            attached.append((start, end, element))
+        return attached
+
+    def _fit_spans_to_budget(
+        self, source: ParsedSource, spans: List[Tuple[int, int, Dict]]
+    ) -> List[Tuple[int, int, Dict]]:
+        """Split spans over the token budget into windows and pack small neighbours together"""
+        budget = self.token_budget.content_tokens
+        prefix = [0] + list(itertools.accumulate(self.token_budget.count_lines(source.lines)))
+
+        pieces = []
+        for start, end, element in spans:
+            if prefix[end] - prefix[start] <= budget:
+                pieces.append((start, end, element))
+                continue
+            for window_start, window_end, _ in self._iter_token_windows(
+                source.lines[start:end], start
+            ):
+                pieces.append((window_start, window_end, element))
+
+        packed = []
+        for start, end, element in pieces:
+            if packed:
+                prev_start, prev_end, prev_element = packed[-1]
+                # Only disjoint, in-order spans; the lines between them come along
+                if prev_end <= start and prefix[end] - prefix[prev_start] <= budget:
+                    packed[-1] = (prev_start, end, self._merge_elements(prev_element, element))
+                    continue
+            packed.append((start, end, element))
+        return packed
+
+    @staticmethod
+    def _merge_elements(first: Optional[Dict], second: Optional[Dict]) -> Optional[Dict]:
+        # None marks code outside any definition; the definition names the chunk
+        if first is None or second is None:
+            return first or second
+        names = first["name"].split(", ")
+        if second["name"] not in names:
+            names.append(second["name"])
+        element_type = first["type"] if first["type"] == second["type"] else "group"
+        return {"type": element_type, "name": ", ".join(names)}
 
     def _chunk_by_lines(
-        self, file_path: str, lines: List[str], language: str, parser_mode: ParserMode
+        self, file_path: str, source: ParsedSource, language: str, parser_mode: ParserMode
     ) -> List[CodeChunk]:
-        chunks = []
-        chunk_size = 50
-        overlap = 10
-        for i in range(0, len(lines), chunk_size - overlap):
-            start = i
-            end = min(i + chunk_size, len(lines))
-            content = "\n".join(lines[start:end])
-            chunk_id = hashlib.md5(f"{file_path}:{start}".encode()).hexdigest()
-            chunks.append(
-                CodeChunk(
-                    content,
-                    {"file_path": file_path, "language": language},
-                    chunk_id,
-                    start,
-                    end,
-                    None,
-                    parser_mode,
+        if self.token_budget is not None:
+            # Tokenize the whole file in one batch; the windows then hit the line cache
+            self.token_budget.count_lines(source.lines)
+        return list(self.iter_line_chunks(file_path, source.lines, language, parser_mode))
+
+    def iter_line_chunks(
+        self, file_path: str, lines: Iterable[str], language: str, parser_mode: ParserMode
+    ) -> Iterator[CodeChunk]:
+        """Overlapping line windows, emitted as soon as each window is complete.
+
+        Windows are filled up to the token budget when one is set, otherwise
+        they are fixed line counts. Only one window of lines is buffered, so
+        this works directly on a file stream as well as on an in-memory lines list.
+        """
+        if self.token_budget is not None:
+            for start, end, window in self._iter_token_windows(lines):
+                yield self._make_chunk(
+                    file_path, "\n".join(window), language, parser_mode, start, end
+                )
+            return
+
+        size = self.LINE_CHUNK_SIZE
+        step = size - self.LINE_CHUNK_OVERLAP
+        window = collections.deque()
+        start = 0
+        for line in lines:
+            window.append(line)
+            if len(window) == size:
+                yield self._make_chunk(
+                    file_path, "\n".join(window), language, parser_mode, start, start + size
                 )
+                for _ in range(step):
+                    window.popleft()
+                start += step
+
+        # Tail windows (the same starts range(0, total, step) would produce)
+        while window:
+            end = start + len(window)
+            yield self._make_chunk(file_path, "\n".join(window), language, parser_mode, start, end)
+            for _ in range(min(step, len(window))):
+                window.popleft()
+            start += step
+
+    def _iter_token_windows(
+        self, lines: Iterable[str], offset: int = 0
+    ) -> Iterator[Tuple[int, int, List[str]]]:
+        """(start, end, lines) windows holding as many lines as fit in the token budget.
+
+        Each window repeats the trailing lines of the previous one, up to
+        1/TOKEN_OVERLAP_DIVISOR of the budget, and always advances by at least
+        one line. A single line over the budget becomes a window of its own.
+        """
+        budget = self.token_budget.content_tokens
+        max_overlap = budget // self.TOKEN_OVERLAP_DIVISOR
+        window = collections.deque()  # (line, tokens)
+        tokens = 0
+        start = offset
+        fresh = False  # Window holds lines not emitted yet
+        for line in lines:
+            count = self.token_budget.count_line(line)
+            if window and tokens + count > budget:
+                yield start, start + len(window), [text for text, _ in window]
+                size = len(window)
+                while window and (tokens > max_overlap or len(window) == size):
+                    tokens -= window.popleft()[1]
+                if tokens + count > budget:
+                    tokens = 0
+                    window.clear()
+                start += size - len(window)
+                fresh = False
+            window.append((line, count))
+            tokens += count
+            fresh = True
+        if fresh:
+            yield start, start + len(window), [text for text, _ in window]
+
+    def _make_chunk(
+        self,
+        file_path: str,
+        content: str,
+        language: str,
+        parser_mode: ParserMode,
+        start: int,
+        end: int,
+        element: Optional[Dict] = None,
+    ) -> CodeChunk:
+        """Build the chunk for lines [start, end), optionally tied to a function/class"""
+        if element is None:
+            chunk_id = hashlib.md5(f"{file_path}:{start}".encode()).hexdigest()
+            return CodeChunk(
+                content,
+                {"file_path": file_path, "language": language},
+                chunk_id,
+                start,
+                end,
+                None,
+                parser_mode,
             )
-        return chunks
+
+        chunk_id = hashlib.md5(
+            f"{file_path}:{element['type']}:{element['name']}:{start}".encode()
+        ).hexdigest()
+        return CodeChunk(
+            content=content,
+            metadata={
+                "file_path": file_path,
+                "language": language,
+                "element_name": element["name"],
+                "element_type": element["type"],
+            },
+            chunk_id=chunk_id,
+            start_line=start,
+            end_line=end,
+            parser_mode=parser_mode,
+            embedding_text=content,
+        )
 
     def scan_project(
-        self, project_path: str
+        self, project_path: str, max_workers: int = 1
     ) -> List[Tuple[FileMetadata, List[CodeChunk], List[str]]]:
-        results = []
-        for root, dirs, files in os.walk(project_path):
-            dirs[:] = [
-                d
-                for d in dirs
-                if not d.startswith(".")
-                and d not in {"node_modules", "__pycache__", "dist", "build", ".venv"}
-            ]
-            for file in files:
-                file_path = os.path.join(root, file)
-                if not self.should_parse_file(file_path):
-                    continue
+        """Parse every supported file under project_path into a list.
+
+        Holds every file's chunks in memory; ingestion streams through
+        iter_parse_files instead.
+        """
+        return list(self.iter_parse_files(self.iter_project_files(project_path), max_workers))
+
+    def iter_parse_files(
+        self, file_paths: Iterable[str], max_workers: int = 1, stream_large_files: bool = False
+    ) -> Iterator[Tuple[Optional[FileMetadata], List[CodeChunk], List[str]]]:
+        """Parse files lazily, yielding (metadata, chunks, errors) per file.
+
+        With max_workers > 1 files are parsed on a process pool (parsing is
+        CPU-bound and GIL-bound) and results are yielded in completion order.
+        With stream_large_files, files over LARGE_FILE_SIZE are read in this
+        process and yielded in parts as they are read (see _scan_file_parts).
+        """
+        if max_workers > 1:
+            files, large_files = [], []
+            for file_path in file_paths:
                 try:
-                    metadata, chunks = self.parse_file(file_path)
-                    results.append((metadata, chunks, []))
-                except Exception as e:
-                    # Minimal failure record
-                    results.append((None, [], [str(e)]))
-        return results
+                    size = os.path.getsize(file_path)
+                except OSError as e:
+                    # Vanished since listing: a failed file, as parse_file would report it
+                    yield None, [], [str(e)]
+                    continue
+                if stream_large_files and size > self.LARGE_FILE_SIZE:
+                    large_files.append(file_path)
+                else:
+                    files.append((file_path, size))
+            yield from self._scan_files_parallel(files, max_workers)
+            for file_path in large_files:
+                yield from self._scan_file_parts(file_path)
+            return
+
+        for file_path in file_paths:
+            if stream_large_files and self._is_large_file(file_path):
+                yield from self._scan_file_parts(file_path)
+            else:
+                yield self._scan_file(file_path)
+
+    def iter_project_files(self, project_path: str) -> Iterator[str]:
+        """Paths of parseable files, skipping ignored/vendored directories"""
+        walker = ProjectWalker(
+            extensions=self.SUPPORTED_EXTENSIONS, max_file_size=self.MAX_FILE_SIZE
+        )
+        for entry in walker.walk(project_path):
+            yield entry.path
+
+    def filter_project_files(self, project_path: str, rel_paths: Iterable[str]) -> List[str]:
+        """Which of these project-relative paths iter_project_files would yield"""
+        walker = ProjectWalker(
+            extensions=self.SUPPORTED_EXTENSIONS, max_file_size=self.MAX_FILE_SIZE
+        )
+        return [entry.path for entry in walker.filter_paths(project_path, rel_paths)]
+
+    def _scan_file(
+        self, file_path: str
+    ) -> Tuple[Optional[FileMetadata], List[CodeChunk], List[str]]:
+        try:
+            metadata, chunks = self.parse_file(file_path)
+            return metadata, chunks, []
+        except Exception as e:
+            # Minimal failure record
+            return None, [], [str(e)]
+
+    def _is_large_file(self, file_path: str) -> bool:
+        try:
+            return os.path.getsize(file_path) > self.LARGE_FILE_SIZE
+        except OSError:
+            return False  # _scan_file reports it
+
+    def _scan_file_parts(
+        self, file_path: str
+    ) -> Iterator[Tuple[Optional[FileMetadata], List[CodeChunk], List[str]]]:
+        """_scan_file for a large file, yielding its chunks in parts while it is read.
+
+        Parts hold up to LARGE_FILE_PART_CHUNKS chunks, so memory stays flat
+        whatever the file size. Every part but the last has metadata.partial
+        set; the last carries the finished metadata.
+        """
+        language = self.detect_language(file_path) or "text"
+        try:
+            raw = open(file_path, "rb")
+        except OSError as e:
+            yield None, [], [str(e)]
+            return
+
+        with raw:
+            file_stat = self._open_file_stat(raw)
+            head = raw.read(self.BINARY_SNIFF_BYTES)
+            if b"\0" in head:
+                metadata, chunks = self._binary_result(file_path, language, raw, head)
+                metadata.file_stat = file_stat
+                yield metadata, chunks, []
+                return
+            raw.seek(0)
+            metadata, chunks = self._parse_large_file(file_path, raw, language)
+            distinct = set()  # Content digests: identical chunks are stored once
+            part = []
+            try:
+                for chunk in chunks:
+                    distinct.add(hashlib.md5(chunk.content.encode("utf-8")).digest())
+                    part.append(chunk)
+                    if len(part) == self.LARGE_FILE_PART_CHUNKS:
+                        yield replace(metadata, partial=True), part, []
+                        part = []
+            except Exception as e:
+                # Parts already stored have no index row, so the next ingest redoes the file
+                yield None, [], [str(e)]
+                return
+            metadata.chunks_count = len(distinct)
+            metadata.file_stat = file_stat
+            yield metadata, part, []
+
+    def _scan_files_parallel(
+        self, files: List[Tuple[str, int]], max_workers: int
+    ) -> Iterator[Tuple[Optional[FileMetadata], List[CodeChunk], List[str]]]:
+        """Parse (path, size) pairs on a process pool, yielding per-file results.
+
+        At most MAX_SCAN_BATCHES_PER_WORKER batches per worker are in flight,
+        and closing the generator cancels the batches not started yet.
+        """
+        batches = self._batch_by_size(files, max_workers)
+        if not batches:
+            return
+
+        # spawn: the server process runs threads (executor, Chroma), which fork does not survive
+        context = multiprocessing.get_context("spawn")
+        workers = min(max_workers, len(batches))
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        in_flight = {}  # future -> batch index
+        next_batch = 0
+        done = set()
+        try:
+            while next_batch < len(batches) or in_flight:
+                while (
+                    next_batch < len(batches)
+                    and len(in_flight) < workers * self.MAX_SCAN_BATCHES_PER_WORKER
+                ):
+                    batch = batches[next_batch]
+                    in_flight[pool.submit(_scan_batch, batch, self.cache, self.token_budget)] = (
+                        next_batch
+                    )
+                    next_batch += 1
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    idx = in_flight.pop(future)
+                    results = future.result()
+                    done.add(idx)
+                    yield from results
+        except BrokenProcessPool as e:
+            logger.warning(f"Parse worker pool failed ({e}); parsing remaining files serially")
+            for idx, batch in enumerate(batches):
+                if idx in done:
+                    continue
+                for file_path in batch:
+                    yield self._scan_file(file_path)
+        finally:
+            # Early close: drop queued batches and let running ones finish in the background
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _batch_by_size(self, files: List[Tuple[str, int]], max_workers: int) -> List[List[str]]:
+        """Split files into batches of roughly equal total bytes.
+
+        Aims for several batches per worker so a slow batch does not leave the
+        rest of the pool idle; largest files are scheduled first.
+        """
+        total_bytes = sum(size for _, size in files)
+        target = max(self.MIN_SCAN_BATCH_BYTES, total_bytes // (max_workers * 4))
+
+        batches, current, current_bytes = [], [], 0
+        for path, size in sorted(files, key=lambda f: f[1], reverse=True):
+            current.append(path)
+            current_bytes += size
+            if current_bytes >= target or len(current) >= self.MAX_SCAN_BATCH_FILES:
+                batches.append(current)
+                current, current_bytes = [], 0
+        if current:
+            batches.append(current)
+        return batches
+
+
+class _HashingReader(io.RawIOBase):
+    """Raw reader that hashes the bytes passing through it"""
+
+    def __init__(self, raw: io.BufferedIOBase):
+        self.raw = raw
+        self.digest = hashlib.md5()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = self.raw.readinto(buffer)
+        if n:
+            self.digest.update(memoryview(buffer)[:n])
+        return n
+
+
+# Parser instance owned by each process-pool worker
+_worker_parser: Optional[CodeParser] = None
+
+
+def _scan_batch(
+    file_paths: List[str],
+    cache: Optional[ParseCache] = None,
+    token_budget: Optional[TokenBudget] = None,
+) -> List[Tuple[Optional[FileMetadata], List[CodeChunk], List[str]]]:
+    """Process-pool entry point: parse a batch of files"""
+    global _worker_parser
+    if _worker_parser is None:
+        _worker_parser = CodeParser(cache=cache, token_budget=token_budget)
+    return [_worker_parser._scan_file(file_path) for file_path in file_paths]
@@ -0,0 +1,89 @@
+import asyncio
+from dataclasses import dataclass
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    List,
+    Sequence,
+)
+
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    """One pipeline step: `concurrency` workers applying an async fn to items"""
+
+    name: str
+    fn: Callable[[Any], Awaitable[Any]]
+    concurrency: int = 1
+    queue_size: int = 2  # Items buffered in front of this stage
+
+
+async def batched(source: AsyncIterable[Any], size: int) -> AsyncIterator[List[Any]]:
+    """Group an async stream into lists of up to size items"""
+    batch = []
+    async for item in source:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def run_pipeline(source: AsyncIterable[Any], stages: Sequence[Stage]):
+    """Push source items through stages connected by bounded queues.
+
+    Each stage's result is the next stage's input (the last stage's result
+    is dropped). Stages run concurrently, so a slow stage fills the queue in
+    front of it and the stages before it wait instead of buffering without
+    limit. The first error cancels every stage and is raised; the source is
+    closed either way.
+    """
+    queues = [asyncio.Queue(maxsize=stage.queue_size) for stage in stages]
+    running = [stage.concurrency for stage in stages]
+
+    async def feed():
+        try:
+            async for item in source:
+                await queues[0].put(item)
+        finally:
+            if hasattr(source, "aclose"):
+                await source.aclose()
+        for _ in range(stages[0].concurrency):
+            await queues[0].put(_DONE)
+
+    async def work(index: int):
+        stage = stages[index]
+        out = queues[index + 1] if index + 1 < len(stages) else None
+        while True:
+            item = await queues[index].get()
+            if item is _DONE:
+                break
+            result = await stage.fn(item)
+            if out is not None:
+                await out.put(result)
+
+        # The stage's last worker tells the next stage's workers to finish
+        running[index] -= 1
+        if running[index] == 0 and out is not None:
+            for _ in range(stages[index + 1].concurrency):
+                await out.put(_DONE)
+
+    tasks = [asyncio.ensure_future(feed())]
+    for index, stage in enumerate(stages):
+        tasks.extend(asyncio.ensure_future(work(index)) for _ in range(stage.concurrency))
+
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if task.exception() is not None:
+                raise task.exception()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
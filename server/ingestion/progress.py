@@ -0,0 +1,79 @@
+import asyncio
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Optional, Set
+
+from server.models.ingestion import IngestionJob, IngestionStatus
+
+# Most recent errors carried by a single progress event
+EVENT_MAX_ERRORS = 10
+
+FINISHED_STATUSES = (IngestionStatus.COMPLETED, IngestionStatus.FAILED)
+
+
+def progress_fields(job: IngestionJob, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Compact progress view of a job: counts, throughput and ETA (no error list)"""
+    end = job.completed_at or now or datetime.now()
+    elapsed = (end - job.started_at).total_seconds() if job.started_at else 0.0
+    rate = job.processed_files / elapsed if elapsed > 0 else 0.0
+    remaining = max(job.total_files - job.processed_files, 0)
+
+    eta = None
+    if job.status in FINISHED_STATUSES:
+        eta = 0
+    elif rate > 0:
+        eta = round(remaining / rate)
+
+    return {
+        "status": job.status.value,
+        "total_files": job.total_files,
+        "processed_files": job.processed_files,
+        "successful_files": job.successful_files,
+        "failed_files": job.failed_files,
+        "skipped_files": job.skipped_files,
+        "total_chunks": job.total_chunks,
+        "error_count": job.error_count,
+        "files_per_second": round(rate, 1),
+        "eta_seconds": eta,
+    }
+
+
+def progress_delta(
+    previous: Dict[str, Any], current: Dict[str, Any], job: IngestionJob
+) -> Dict[str, Any]:
+    """Fields that changed since the previous event, plus errors added since then"""
+    delta = {key: value for key, value in current.items() if previous.get(key) != value}
+    new_errors = current["error_count"] - previous.get("error_count", 0)
+    if new_errors > 0 and job.errors:
+        delta["errors"] = job.errors[-min(new_errors, EVENT_MAX_ERRORS) :]
+    return delta
+
+
+class ProgressNotifier:
+    """Wakes progress streams when a job running in this process changes.
+
+    Notifications carry no data: a woken stream reads the job's current
+    state, so a slow client skips intermediate updates instead of queueing
+    them.
+    """
+
+    def __init__(self):
+        self._waiters: Dict[str, Set[asyncio.Event]] = defaultdict(set)
+
+    def notify(self, job_id: str):
+        for event in self._waiters.get(job_id, ()):
+            event.set()
+
+    async def wait(self, job_id: str, timeout: float) -> bool:
+        """Wait for the next notification; False on timeout"""
+        event = asyncio.Event()
+        self._waiters[job_id].add(event)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._waiters[job_id].discard(event)
+            if not self._waiters[job_id]:
+                del self._waiters[job_id]
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import List
+
+from server.services.file_index_tracker import FileIndexTracker
+from server.shared.vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ReconcileReport:
+    """Differences found (and repaired) between Chroma and file_index_status"""
+
+    orphaned_files: List[str] = field(default_factory=list)  # Chunks but no index row
+    mismatched_files: List[str] = field(default_factory=list)  # Indexed, wrong chunk count
+    lexical_rebuilt: bool = False  # Lexical index did not match the stored chunks
+
+    @property
+    def needs_reingest(self) -> bool:
+        return bool(self.mismatched_files)
+
+
+async def reconcile_project(
+    project_id: str, store: VectorStore, tracker: FileIndexTracker
+) -> ReconcileReport:
+    """Repair a project whose vector chunks and index rows disagree.
+
+    Chunks of files the index does not know are deleted. Files marked
+    indexed whose stored chunk count differs (e.g. a write that landed
+    without its row, or the reverse) lose their chunks and are marked
+    pending, so the next incremental ingest re-embeds only those files.
+    The lexical index is rebuilt from the remaining chunks if its count
+    differs.
+    """
+    # Tracker queries run in the executor, off the event loop
+    loop = asyncio.get_running_loop()
+    stored = await store.count_chunks_by_file(project_id)
+    rows = await loop.run_in_executor(None, tracker.get_chunk_counts, project_id)
+
+    report = ReconcileReport()
+    report.orphaned_files = sorted(path for path in stored if path not in rows)
+    report.mismatched_files = sorted(
+        path
+        for path, (status, chunks_count) in rows.items()
+        if status == "indexed" and stored.get(path, 0) != chunks_count
+    )
+
+    stale = report.orphaned_files + [path for path in report.mismatched_files if path in stored]
+    if stale:
+        await store.delete_file_chunks(project_id, stale)
+    if report.mismatched_files:
+        await loop.run_in_executor(None, tracker.mark_pending, project_id, report.mismatched_files)
+
+    stale_set = set(stale)
+    remaining = sum(count for path, count in stored.items() if path not in stale_set)
+    report.lexical_rebuilt = await store.sync_lexical_index(project_id, remaining)
+
+    logger.info(
+        f"Reconciled {project_id}: {len(report.orphaned_files)} orphaned, "
+        f"{len(report.mismatched_files)} mismatched files"
+    )
+    return report
@@ -0,0 +1,176 @@
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Shared pattern pieces
+_WS = r"[ \t]"
+
+
+class RegexScanner:
+    """Extracts functions, classes and imports in a single regex pass.
+
+    Rules are (kind, pattern) pairs where kind is "function", "class" or
+    "import" and the pattern captures the name in a (?P<name>...) group.
+    Patterns match at the start of a line, after its indentation. All rules
+    are compiled into one line-anchored alternation, so the text is scanned
+    once; when two rules match the same line the earlier rule wins.
+    """
+
+    KINDS = ("function", "class", "import")
+
+    def __init__(self, rules: Sequence[Tuple[str, str]], split_imports: bool = False):
+        self.rules = list(rules)
+        # "import a, b as c" style statements name several modules
+        self.split_imports = split_imports
+
+        alternatives = []
+        # Outer group number -> (kind, group number of the name)
+        self._groups: Dict[int, Tuple[str, int]] = {}
+        group = 0
+        for idx, (kind, pattern) in enumerate(self.rules):
+            if kind not in self.KINDS:
+                raise ValueError(f"Unknown rule kind: {kind}")
+            inner = re.compile(pattern, re.MULTILINE)
+            if "name" not in inner.groupindex:
+                raise ValueError(f"Rule pattern has no (?P<name>...) group: {pattern}")
+            self._groups[group + 1] = (kind, group + 1 + inner.groupindex["name"])
+            alternatives.append(f"(?P<_r{idx}>{pattern.replace('(?P<name>', f'(?P<_n{idx}>')})")
+            group += 1 + inner.groups
+        # Anchored at ^ and followed by keywords, so the indent run backtracks cheaply
+        # (no possessive quantifier: re only has those from Python 3.11)
+        self.pattern = re.compile(rf"^{_WS}*(?:{'|'.join(alternatives)})", re.MULTILINE)
+
+    def scan(self, text: str) -> List[Tuple[str, str, int]]:
+        """(kind, name, offset) for every match, in text order"""
+        groups = self._groups
+        found = []
+        for match in self.pattern.finditer(text):
+            # The rule's outer group is the last one closed
+            kind, name_group = groups[match.lastindex]
+            name = match.group(name_group)
+            if kind == "import" and self.split_imports:
+                for part in name.split(","):
+                    module = part.split()
+                    if module:
+                        found.append((kind, module[0], match.start()))
+            else:
+                found.append((kind, name.strip(), match.start()))
+        return found
+
+
+_JS_FUNCTION_PREFIX = rf"(?:export{_WS}+)?(?:default{_WS}+)?(?:async{_WS}+)?"
+_JS_RULES = [
+    (
+        "class",
+        rf"(?:export{_WS}+)?(?:default{_WS}+)?(?:abstract{_WS}+)?class{_WS}+(?P<name>\w+)",
+    ),
+    (
+        "function",
+        rf"{_JS_FUNCTION_PREFIX}function{_WS}*\*?{_WS}*(?P<name>\w+){_WS}*(?:<[^>\n]*>)?{_WS}*\(",
+    ),
+    (
+        "function",
+        rf"(?:export{_WS}+)?(?:const|let|var){_WS}+(?P<name>\w+)(?::[^=\n]*)?{_WS}*="
+        rf"{_WS}*(?:async{_WS}+)?(?:function\b|\([^)\n]*\)[^=\n]*=>|\w+{_WS}*=>)",
+    ),
+    ("import", r"import\b[^'\";]*?['\"](?P<name>[^'\"\n]+)['\"]"),
+]
+
+_JAVA_MODIFIERS = r"public|private|protected|static|final|abstract|synchronized|native|default"
+_CSHARP_MODIFIERS = (
+    r"public|private|protected|internal|static|virtual|override|abstract|async|sealed"
+    r"|extern|new|unsafe|partial|readonly"
+)
+
+# Built-in scanners by language
+SCANNERS: Dict[str, RegexScanner] = {
+    "python": RegexScanner(
+        [
+            ("class", rf"class{_WS}+(?P<name>\w+)"),
+            ("function", rf"(?:async{_WS}+)?def{_WS}+(?P<name>\w+){_WS}*\("),
+            ("import", rf"import{_WS}+(?P<name>[\w., \t]+)"),
+            ("import", rf"from{_WS}+(?P<name>[\w.]+){_WS}+import\b"),
+        ],
+        split_imports=True,
+    ),
+    "javascript": RegexScanner(_JS_RULES),
+    "typescript": RegexScanner(_JS_RULES),
+    "java": RegexScanner(
+        [
+            (
+                "class",
+                rf"(?:(?:{_JAVA_MODIFIERS}|sealed){_WS}+)*"
+                rf"(?:class|interface|enum|record|@interface){_WS}+(?P<name>\w+)",
+            ),
+            (
+                "function",
+                rf"(?:(?:{_JAVA_MODIFIERS}){_WS}+)+(?:<[^>\n]*>{_WS}+)?"
+                rf"(?:[\w<>\[\],.?]+{_WS}+)*?(?P<name>\w+){_WS}*\(",
+            ),
+            ("import", rf"import{_WS}+(?:static{_WS}+)?(?P<name>[\w.*]+){_WS}*;"),
+        ]
+    ),
+    "go": RegexScanner(
+        [
+            ("class", rf"type{_WS}+(?P<name>\w+)(?:\[[^\]\n]*\])?{_WS}+(?:struct|interface)\b"),
+            ("function", rf"func{_WS}+(?:\([^)\n]*\){_WS}*)?(?P<name>\w+){_WS}*[\[(]"),
+            ("import", rf"import{_WS}+(?:[\w.]+{_WS}+)?\"(?P<name>[^\"\n]+)\""),
+            # Indented lines of an import ( ... ) block
+            ("import", rf"(?<=[ \t])(?:[\w.]+{_WS}+)?\"(?P<name>[^\"\n]+)\"{_WS}*$"),
+        ]
+    ),
+    "rust": RegexScanner(
+        [
+            (
+                "class",
+                rf"(?:pub(?:\([^)\n]*\))?{_WS}+)?(?:struct|enum|trait|union)"
+                rf"{_WS}+(?P<name>\w+)",
+            ),
+            (
+                "function",
+                rf"(?:pub(?:\([^)\n]*\))?{_WS}+)?"
+                rf"(?:(?:async|const|unsafe|extern(?:{_WS}+\"[^\"\n]*\")?){_WS}+)*"
+                rf"fn{_WS}+(?P<name>\w+)",
+            ),
+            ("import", rf"(?:pub(?:\([^)\n]*\))?{_WS}+)?use{_WS}+(?P<name>[\w:]+)"),
+        ]
+    ),
+    "csharp": RegexScanner(
+        [
+            (
+                "class",
+                rf"(?:(?:{_CSHARP_MODIFIERS}){_WS}+)*"
+                rf"(?:class|interface|struct|enum|record){_WS}+(?P<name>\w+)",
+            ),
+            (
+                "function",
+                rf"(?:(?:{_CSHARP_MODIFIERS}){_WS}+)+(?:[\w<>\[\],.?]+{_WS}+)*?"
+                rf"(?P<name>\w+){_WS}*(?:<[^>\n]*>)?{_WS}*\(",
+            ),
+            ("import", rf"using{_WS}+(?:static{_WS}+)?(?P<name>[\w.]+){_WS}*;"),
+        ]
+    ),
+    "php": RegexScanner(
+        [
+            (
+                "class",
+                rf"(?:(?:abstract|final|readonly){_WS}+)*(?:class|interface|trait|enum)"
+                rf"{_WS}+(?P<name>\w+)",
+            ),
+            (
+                "function",
+                rf"(?:(?:public|private|protected|static|abstract|final){_WS}+)*"
+                rf"function{_WS}+&?(?P<name>\w+)",
+            ),
+            ("import", rf"use{_WS}+(?:function{_WS}+|const{_WS}+)?(?P<name>[\w\\]+)"),
+        ]
+    ),
+}
+
+
+def register_scanner(language: str, scanner: RegexScanner):
+    """Add or replace the regex scanner for a language (routes it to REGEX mode)"""
+    SCANNERS[language] = scanner
+
+
+def get_scanner(language: str) -> Optional[RegexScanner]:
+    return SCANNERS.get(language)
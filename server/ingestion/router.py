@@ -1,39 +1,66 @@
 import asyncio
+import json
 import logging
-from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+import time
+import uuid
+from contextlib import closing
 from datetime import datetime
-from typing import Dict, List, Optional
-
-from fastapi import APIRouter, BackgroundTasks, Depends, Form, HTTPException
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    Form,
+    HTTPException,
+    Request,
+    WebSocket,
+    WebSocketDisconnect,
+)
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
+from server.ingestion.coalescer import SaveCoalescer
+from server.ingestion.parse_cache import ParseCache
 from server.ingestion.parser import CodeChunk, CodeParser, FileMetadata
+from server.ingestion.pipeline import Stage, batched, run_pipeline
+from server.ingestion.progress import (
+    FINISHED_STATUSES,
+    ProgressNotifier,
+    progress_delta,
+    progress_fields,
+)
+from server.ingestion.reconcile import reconcile_project
+from server.ingestion.scheduler import IngestionScheduler, Priority
+from server.ingestion.token_budget import TokenBudget
 from server.models.ingestion import IngestionJob, IngestionStatus
-from server.services.file_index_tracker import FileIndexTracker
-from server.shared.database import get_db
-from server.shared.vector_store import VectorStore
+from server.services.file_index_tracker import FileChanges, FileIndexTracker
+from server.services.git_changes import GitSnapshot, detect_git_changes, take_snapshot
+from server.services.task_queue import TaskFailed, task_queue, task_worker
+from server.shared.database import SessionLocal, get_db
+from server.shared.embedding_worker import EmbedPriority
+from server.shared.vector_store import EmbeddedSnippets, get_vector_store
 
 router = APIRouter(prefix="/ingestion", tags=["ingestion"])
 logger = logging.getLogger(__name__)
 
-parser = CodeParser()
-_vector_store: Optional[VectorStore] = None
+parser = CodeParser(cache=ParseCache.from_env(), token_budget=TokenBudget.from_env())
+# Jobs running in this process; finished jobs live only in the task queue
 ingestion_jobs: Dict[str, IngestionJob] = {}
 
+INGEST_TASK = "ingest_project"
+# Minimum seconds between progress snapshots written to the task queue
+PROGRESS_SAVE_INTERVAL = 1.0
+# Progress streams send a keepalive after this many seconds without changes
+STREAM_KEEPALIVE_INTERVAL = 15.0
 
-def get_vector_store() -> VectorStore:
-    """Lazy initialization of VectorStore to avoid blocking server startup"""
-    global _vector_store
-    if _vector_store is None:
-        logger.info("Initializing VectorStore (lazy load)...")
-        _vector_store = VectorStore()
-        logger.info("✅ VectorStore initialized")
-    return _vector_store
+# Wakes /ws/job streams when a job in this process stores a batch
+progress_notifier = ProgressNotifier()
 
 
-# Global executor for CPU-bound tasks
-executor = ThreadPoolExecutor(max_workers=4)
+# Fixed pool for parsing/walking; saves (INTERACTIVE) run ahead of project scans (BULK)
+scheduler = IngestionScheduler.from_env()
 
 
 @router.get("/capabilities")
@@ -45,98 +72,203 @@ async def get_capabilities():
     }
 
 
+# Parsed files buffered between the scan thread and the storage stage
+SCAN_QUEUE_SIZE = 40
+
+_SCAN_DONE = object()
+
+# (metadata, chunks, errors) for one parsed file
+ScanResult = Tuple[Optional[FileMetadata], List[CodeChunk], List[str]]
+
+# Parsed files per embedding pass / write
+STORE_BATCH_SIZE = 10
+# Batches embedded at once; the model already uses every core, so more mostly adds memory
+EMBED_CONCURRENCY = int(os.getenv("INGESTION_EMBED_CONCURRENCY", "1"))
+
+
+async def stream_scan_results(
+    file_paths: List[str], max_workers: int, project_id: Optional[str] = None
+) -> AsyncIterator[ScanResult]:
+    """Parse files as bulk scheduler work and yield results as they complete.
+
+    Results pass through a bounded queue, so the scan blocks once the storage
+    stage falls SCAN_QUEUE_SIZE files behind and memory stays flat regardless
+    of repository size.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=SCAN_QUEUE_SIZE)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            # closing: stopping early cancels the scan's queued batches right away
+            # Large files arrive in parts, so their chunks flow through as they are read
+            scan = parser.iter_parse_files(file_paths, max_workers, stream_large_files=True)
+            with closing(scan) as results:
+                for item in results:
+                    if stop.is_set():
+                        break
+                    asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+        finally:
+            asyncio.run_coroutine_threadsafe(queue.put(_SCAN_DONE), loop).result()
+
+    producer = asyncio.ensure_future(scheduler.run(Priority.BULK, project_id, produce))
+    try:
+        while True:
+            item = await queue.get()
+            if item is _SCAN_DONE:
+                break
+            yield item
+        await producer  # Surface scan errors
+    finally:
+        # Consumer stopped early: unblock the producer so its thread can exit
+        stop.set()
+        while not producer.done():
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                await asyncio.sleep(0.01)
+
+
+def detect_git_project_changes(
+    project_path: str, project_id: str, tracker: FileIndexTracker
+) -> Tuple[Optional[GitSnapshot], Optional[FileChanges]]:
+    """(HEAD snapshot to record, changes since the last ingested commit) for a git checkout.
+
+    The snapshot is None outside git; changes are None when there is no usable
+    previous commit and the tree must be walked instead.
+    """
+    snapshot = take_snapshot(project_path)
+    state = tracker.get_git_state(project_id) if snapshot else None
+    if state is None:
+        return snapshot, None
+
+    last_commit, last_dirty_paths = state
+    changes = detect_git_changes(
+        project_path,
+        snapshot,
+        last_commit,
+        last_dirty_paths,
+        tracker.unindexed_paths(project_id),
+        parser.filter_project_files,
+    )
+    if changes is not None:
+        tracked = tracker.tracked_paths(project_id, changes.removed)
+        changes.removed = [path for path in changes.removed if path in tracked]
+        logger.info(
+            f"git diff {last_commit[:12]}..{snapshot.commit[:12]}: "
+            f"{len(changes.changed)} changed, {len(changes.removed)} removed"
+        )
+    return snapshot, changes
+
+
 async def ingest_project_background(
-    job_id: str, project_path: str, project_id: str, max_workers: int, db: Session
+    job_id: str,
+    project_path: str,
+    project_id: str,
+    max_workers: int,
+    db: Session,
+    incremental: bool = False,
+    on_progress: Optional[Callable[[IngestionJob], Awaitable[None]]] = None,
+    resume_since: Optional[datetime] = None,
+    use_git: bool = False,
 ):
+    """Walk, parse, embed and store a project, updating the job in ingestion_jobs.
+
+    Each stored batch commits its tracker rows, which act as the job's
+    checkpoint: with resume_since (UTC start of an interrupted earlier
+    attempt) files indexed since then are not processed again. Incremental
+    runs resume on their own, as committed files compare unchanged.
+
+    use_git makes the run incremental and, for git checkouts ingested this
+    way before, takes the changed files from a diff against the last
+    ingested commit instead of walking and stat-ing the whole tree.
+    """
     job = ingestion_jobs.get(job_id)
     if not job:
         return
 
     try:
         job.status = IngestionStatus.PROCESSING
-        loop = asyncio.get_event_loop()
 
-        # Initialize tracker
+        # Initialize tracker; its queries run in the executor, off the event loop
         tracker = FileIndexTracker(db)
+        loop = asyncio.get_running_loop()
+
+        git_snapshot, changes = None, None
+        if use_git:
+            git_snapshot, changes = await scheduler.run(
+                Priority.BULK,
+                project_id,
+                detect_git_project_changes,
+                project_path,
+                project_id,
+                tracker,
+            )
 
-        # 1. Scan (CPU bound)
-        # Note: scan_project is synchronous in parser, so run in executor
-        scan_results = await loop.run_in_executor(executor, parser.scan_project, project_path)
-        job.total_files = len(scan_results)
-
-        # 2. Process batches
-        batch_size = 10
-        for i in range(0, len(scan_results), batch_size):
-            batch = scan_results[i : i + batch_size]
-
-            # Process batch concurrently
-            futures = []
-            for item in batch:
-                # item is (metadata, chunks, errors)
-                futures.append(
-                    loop.run_in_executor(executor, process_single_file_sync, item, project_id)
-                )
-
-            results = await asyncio.gather(*futures)
-
-            # Update stats
-            for res_meta, res_chunks, res_errors in results:
-                job.processed_files += 1
-                if res_errors or (res_meta and res_meta.error_messages):
-                    job.failed_files += 1
-                    errs = res_errors + (res_meta.error_messages if res_meta else [])
-                    job.errors.extend(errs)
-                else:
-                    job.successful_files += 1
-                    job.total_chunks += len(res_chunks)
-                    if res_meta:
-                        mode = res_meta.parser_mode_used.value
-                        job.parser_stats[mode] = job.parser_stats.get(mode, 0) + 1
-
-                        # Store in vector store (I/O bound-ish, but Chroma local is sync/blocking often,
-                        # so keeping it in executor or doing here?
-                        # VectorStore.add_code_snippet is async in our impl?
-                        # Checking code: vector_store defines 'async def add_code_snippet' which runs 'run_in_executor'.
-                        # So we should call it here in the loop, awaiting it.
-                        # Wait, 'process_single_file_sync' assumes we do CPU work.
-                        # We need to separate parsing (CPU) from Storing (I/O).
-                        # Let's adjust logic:
-                        # scan_project already parsed everything? Yes, scan_project calls parse_file.
-                        # So scan_results already has chunks!
-                        # We just need to store them.
-                        # Storing is I/O. We can do it directly here using await.
-                        pass
-
-            # Actually store the batch
-            # scan_project DOES parse, so we already have chunks.
-            # We just need to iterate and store.
-            vector_store = get_vector_store()  # Lazy init on first use
-            for meta, chunks, errs in batch:
-                if not meta:
-                    continue  # Failed scan
-                for chunk in chunks:
-                    await vector_store.add_code_snippet(
-                        project_id=project_id,
-                        code=chunk.content,
-                        file_path=meta.file_path,
-                        function_name=chunk.metadata.get("element_name"),
-                    )
-
-            # Update status for each file in batch
-            for meta, chunks, errs in batch:
-                if not meta:
-                    continue
-
-                status = "error" if errs or meta.error_messages else "indexed"
-                error_msg = "; ".join(errs + meta.error_messages) if status == "error" else None
-
-                tracker.update_file_status(
-                    project_id=project_id,
-                    file_path=meta.file_path,
-                    status=status,
-                    chunks_count=len(chunks),
-                    error_message=error_msg,
+        if changes is None:
+            # 1. Walk first (cheap) so progress has a total before parsing starts
+            file_paths = await scheduler.run(
+                Priority.BULK, project_id, lambda: list(parser.iter_project_files(project_path))
+            )
+            if incremental or use_git:
+                changes = await scheduler.run(
+                    Priority.BULK, project_id, tracker.detect_changes, project_id, file_paths
                 )
+        elif resume_since:
+            done = await loop.run_in_executor(None, tracker.indexed_since, project_id, resume_since)
+            job.resumed_files = sum(1 for path in changes.changed if path in done)
+            changes.changed = [path for path in changes.changed if path not in done]
+
+        if changes is not None:
+            # Only new/modified files are parsed; removed files lose their chunks and rows
+            job.skipped_files = len(changes.unchanged)
+            job.removed_files = len(changes.removed)
+            stale_paths = changes.removed + changes.changed
+            if stale_paths:
+                await get_vector_store().delete_file_chunks(project_id, stale_paths)
+            await loop.run_in_executor(None, tracker.remove_files, project_id, changes.removed)
+            file_paths = changes.changed
+        elif resume_since:
+            done = await loop.run_in_executor(None, tracker.indexed_since, project_id, resume_since)
+            remaining = [path for path in file_paths if path not in done]
+            job.resumed_files = len(file_paths) - len(remaining)
+            file_paths = remaining
+
+        job.total_files = len(file_paths)
+        progress_notifier.notify(job_id)
+
+        # 2. Parse (max_workers processes) -> embed -> write, all three overlapping
+        async def embed(batch):
+            return batch, await embed_scan_batch(batch, project_id)
+
+        async def persist(embedded_batch):
+            batch, embedded = embedded_batch
+            await persist_scan_batch(job, batch, embedded, project_id, tracker)
+            progress_notifier.notify(job_id)
+            if on_progress:
+                # Awaited here, so checkpoints are written one at a time and in order
+                await on_progress(job)
+            # Let pending saves parse and store before the next batch
+            await scheduler.pause_for_interactive()
+
+        await run_pipeline(
+            batched(stream_scan_results(file_paths, max_workers, project_id), STORE_BATCH_SIZE),
+            [
+                Stage("embed", embed, concurrency=EMBED_CONCURRENCY),
+                # A single writer: Chroma and the tracker session see one batch at a time
+                Stage("persist", persist),
+            ],
+        )
+        if git_snapshot:
+            # The next git-aware run diffs against the tree as it was when this one started
+            await loop.run_in_executor(
+                None,
+                tracker.set_git_state,
+                project_id,
+                git_snapshot.commit,
+                git_snapshot.dirty_paths,
+            )
 
         job.status = IngestionStatus.COMPLETED
         job.completed_at = datetime.now()
@@ -144,47 +276,188 @@ async def ingest_project_background(
     except Exception as e:
         logger.error(f"Background ingestion failed: {e}")
         job.status = IngestionStatus.FAILED
-        job.errors.append(str(e))
+        job.add_errors([str(e)])
         job.completed_at = datetime.now()
+    finally:
+        progress_notifier.notify(job_id)
 
 
-def process_single_file_sync(item, project_id):
-    # This helper is seemingly redundant if scan_project parses everything.
-    # scan_project in parser.py calls parse_file.
-    # So we don't need to re-parse.
-    # Just passing through for structure if needed, but returning item as is.
-    return item
+async def run_ingestion_task(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Task queue handler for a queued project ingestion"""
+    payload = task["payload"]
+    job = IngestionJob(
+        id=task["id"], project_id=payload["project_id"], project_path=payload["project_path"]
+    )
+    ingestion_jobs[job.id] = job
+    loop = asyncio.get_running_loop()
+    last_save = 0.0
+
+    resume_since = None
+    if task["attempts"] > 1 or task["progress"]:
+        # An earlier attempt crashed or failed; keep what it already stored
+        resume_since = datetime.fromisoformat(task["created_at"])
+        logger.info(f"Resuming ingestion job {job.id}")
+
+    async def save_progress(job: IngestionJob):
+        nonlocal last_save
+        if time.monotonic() - last_save >= PROGRESS_SAVE_INTERVAL:
+            last_save = time.monotonic()
+            snapshot = job.model_dump(mode="json")
+            try:
+                await loop.run_in_executor(None, task_queue.save_progress, job.id, snapshot)
+            except Exception as e:
+                # The tracker rows are the real checkpoint; a missed snapshot only lags the UI
+                logger.warning(f"Failed to save progress for job {job.id}: {e}")
+
+    db = SessionLocal()
+    try:
+        await ingest_project_background(
+            job.id,
+            payload["project_path"],
+            payload["project_id"],
+            max_workers=payload["max_workers"],
+            db=db,
+            incremental=payload["incremental"],
+            on_progress=save_progress,
+            resume_since=resume_since,
+            use_git=payload.get("use_git", False),
+        )
+    finally:
+        db.close()
+        ingestion_jobs.pop(job.id, None)
+        progress_notifier.notify(job.id)  # Streams switch to the task row
+
+    progress = job.model_dump(mode="json")
+    if job.status == IngestionStatus.FAILED:
+        raise TaskFailed(job.errors[-1] if job.errors else "Ingestion failed", progress)
+    return progress
+
+
+task_worker.register(INGEST_TASK, run_ingestion_task)
+
+
+def stored_chunk_count(chunks: List[CodeChunk]) -> int:
+    """Chunks a file has in the vector store (identical chunks share one id)"""
+    return len({chunk.content for chunk in chunks})
+
+
+def chunk_snippet(chunk: CodeChunk, file_path: str) -> Dict[str, Any]:
+    """VectorStore.add_code_snippets entry for a parsed chunk"""
+    return {
+        "code": chunk.content,
+        "file_path": file_path,
+        "function_name": chunk.metadata.get("element_name"),
+    }
+
+
+async def embed_scan_batch(
+    batch: List[ScanResult], project_id: str, priority: EmbedPriority = EmbedPriority.INGEST
+) -> EmbeddedSnippets:
+    """Embed the chunks of one batch of parsed files (one embedding pass)"""
+    snippets = [
+        chunk_snippet(chunk, meta.file_path)
+        for meta, chunks, errs in batch
+        if meta  # Failed scans have no chunks
+        for chunk in chunks
+    ]
+    # Lazy init on first use
+    return await get_vector_store().embed_snippets(project_id, snippets, priority=priority)
+
+
+def file_status_entries(batch: List[ScanResult]) -> List[Dict[str, Any]]:
+    """Tracker upsert entries for a batch of parsed files"""
+    entries = []
+    for meta, chunks, errs in batch:
+        if not meta or meta.partial:
+            continue
+
+        status = "error" if errs or meta.error_messages else "indexed"
+        error_msg = "; ".join(errs + meta.error_messages) if status == "error" else None
+        entries.append(
+            {
+                "file_path": meta.file_path,
+                "status": status,
+                "chunks_count": (
+                    meta.chunks_count
+                    if meta.chunks_count is not None
+                    else stored_chunk_count(chunks)
+                ),
+                "error_message": error_msg,
+                # Set by the parser for files read from disk; else the tracker hashes the file
+                "file_hash": meta.file_hash,
+                "file_stat": meta.file_stat,
+            }
+        )
+    return entries
+
+
+async def persist_scan_batch(
+    job: IngestionJob,
+    batch: List[ScanResult],
+    embedded: EmbeddedSnippets,
+    project_id: str,
+    tracker: FileIndexTracker,
+):
+    """Write an embedded batch, then update job stats and tracker rows"""
+    await get_vector_store().write_embedded_snippets(project_id, embedded)
+
+    # Update stats
+    for res_meta, res_chunks, res_errors in batch:
+        if res_meta and res_meta.partial:
+            # A streamed file counts once, with its last part
+            job.total_chunks += len(res_chunks)
+            continue
+        job.processed_files += 1
+        if res_errors or (res_meta and res_meta.error_messages):
+            job.failed_files += 1
+            errs = res_errors + (res_meta.error_messages if res_meta else [])
+            job.add_errors(errs)
+        else:
+            job.successful_files += 1
+            job.total_chunks += len(res_chunks)
+            if res_meta:
+                mode = res_meta.parser_mode_used.value
+                job.parser_stats[mode] = job.parser_stats.get(mode, 0) + 1
+
+    # Update status for every file in the batch in one transaction
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(
+        None, tracker.upsert_file_statuses, project_id, file_status_entries(batch)
+    )
+
+
+def enqueue_ingestion(
+    project_path: str, project_id: str, max_workers: int, incremental: bool, use_git: bool = False
+) -> str:
+    job_id = task_queue.enqueue(
+        INGEST_TASK,
+        {
+            "project_path": project_path,
+            "project_id": project_id,
+            "max_workers": max_workers,
+            "incremental": incremental,
+            "use_git": use_git,
+        },
+        project_id=project_id,
+        task_id=f"job_{project_id}_{uuid.uuid4().hex[:12]}",
+    )
+    task_worker.wake()
+    return job_id
 
 
 @router.post("/project")
 async def ingest_project(
-    background_tasks: BackgroundTasks,
     project_path: str = Form(...),
     project_id: str = Form(...),
     max_workers: int = Form(4),
-    db: Session = Depends(get_db),
+    incremental: bool = Form(False),
+    use_git: bool = Form(False),
 ):
-    # Resize executor if needed
-    global executor
-    if executor._max_workers != max_workers:
-        executor = ThreadPoolExecutor(max_workers=max_workers)
-
-    job_id = f"job_{project_id}_{int(asyncio.get_event_loop().time())}"
-    job = IngestionJob(id=job_id, project_id=project_id, project_path=project_path)
-    ingestion_jobs[job_id] = job
-
-    background_tasks.add_task(
-        ingest_project_background,
-        job_id=job_id,
-        project_path=project_path,
-        project_id=project_id,
-        max_workers=max_workers,
-        db=db,
-    )
+    job_id = enqueue_ingestion(project_path, project_id, max_workers, incremental, use_git)
 
     return JSONResponse(
         {
-            "status": "started",
+            "status": "queued",
             "job_id": job_id,
             "capabilities": {
                 "tree_sitter": parser.capabilities.tree_sitter_available,
@@ -194,56 +467,205 @@ async def ingest_project(
     )
 
 
+async def ingest_saved_files(project_id: str, files: Dict[str, str]) -> Dict[str, Any]:
+    """Parse, embed and store saved files as one batch (the save coalescer's flush)"""
+    # Parse in threads, ahead of any queued project scan work
+    parsed = await asyncio.gather(
+        *(
+            scheduler.run(Priority.INTERACTIVE, project_id, parser.parse_file, path, content)
+            for path, content in files.items()
+        ),
+        return_exceptions=True,
+    )
+
+    results: Dict[str, Any] = {}
+    batch: List[ScanResult] = []
+    for file_path, outcome in zip(files, parsed):
+        if isinstance(outcome, Exception):
+            results[file_path] = {"status": "failed", "chunks": 0, "errors": [str(outcome)]}
+            continue
+        metadata, chunks = outcome
+        batch.append((metadata, chunks, []))
+        results[file_path] = {
+            "status": "success",
+            "chunks": len(chunks),
+            "mode": metadata.parser_mode_used.value,
+            "errors": metadata.error_messages,
+        }
+    if not batch:
+        return results
+
+    # One embedding pass, then one write replacing the files' previous chunks; a failed
+    # or cancelled embed leaves the stored chunks searchable
+    embedded = await embed_scan_batch(batch, project_id, EmbedPriority.INTERACTIVE)
+    await get_vector_store().replace_file_chunks(
+        project_id, [meta.file_path for meta, _, _ in batch], embedded
+    )
+
+    # Track status in one transaction
+    def track():
+        db = SessionLocal()
+        try:
+            FileIndexTracker(db).upsert_file_statuses(project_id, file_status_entries(batch))
+        finally:
+            db.close()
+
+    await asyncio.get_running_loop().run_in_executor(None, track)
+    return results
+
+
+# Coalesces save storms from /file and /files into per-project batches
+save_coalescer = SaveCoalescer.from_env(ingest_saved_files)
+
+
 @router.post("/file")
 async def ingest_file(
     content: str = Form(...),
     file_path: str = Form(...),
     project_id: str = Form(...),
-    db: Session = Depends(get_db),
 ):
     try:
-        loop = asyncio.get_event_loop()
-        # Parse in thread
-        metadata, chunks = await loop.run_in_executor(
-            executor, parser.parse_file, file_path, content
-        )
+        result = (await save_coalescer.submit(project_id, {file_path: content}))[file_path]
+    except Exception as e:
+        logger.error(f"Ingest file error: {e}")
+        raise HTTPException(500, str(e))
+    if result["status"] == "failed":
+        raise HTTPException(500, result["errors"][0])
+    return JSONResponse(result)
+
+
+@router.post("/files")
+async def ingest_files(request: Request, project_id: str):
+    """Ingest many saved files sent as NDJSON, one {"file_path", "content"} object per line.
+
+    Later lines (and saves from concurrent requests within the debounce
+    window) for the same path replace earlier ones; each distinct file is
+    parsed once and the batch is embedded and committed together.
+    """
+    files: Dict[str, str] = {}
+    received = 0
+    for line_no, line in enumerate((await request.body()).splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+            files[entry["file_path"]] = entry["content"]
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(400, f'Line {line_no}: expected {{"file_path", "content"}}')
+        received += 1
+    if not files:
+        raise HTTPException(400, "No files in request body")
 
-        # Store
-        vector_store = get_vector_store()  # Lazy init on first use
-        for chunk in chunks:
-            await vector_store.add_code_snippet(
-                project_id, chunk.content, file_path, chunk.metadata.get("element_name")
-            )
+    try:
+        results = await save_coalescer.submit(project_id, files)
+    except Exception as e:
+        logger.error(f"Ingest files error: {e}")
+        raise HTTPException(500, str(e))
+    return {"status": "success", "received": received, "files": len(files), "results": results}
 
-        # Track status
-        tracker = FileIndexTracker(db)
-        status = "error" if metadata.error_messages else "indexed"
-        error_msg = "; ".join(metadata.error_messages) if metadata.error_messages else None
-
-        tracker.update_file_status(
-            project_id=project_id,
-            file_path=file_path,
-            status=status,
-            chunks_count=len(chunks),
-            error_message=error_msg,
-        )
 
-        return JSONResponse(
-            {
-                "status": "success",
-                "chunks": len(chunks),
-                "mode": metadata.parser_mode_used.value,
-                "errors": metadata.error_messages,
-            }
+async def load_job(job_id: str) -> Optional[IngestionJob]:
+    """A job running in this process, else its state from the task queue"""
+    job = ingestion_jobs.get(job_id)
+    if job:
+        return job
+
+    task = await asyncio.get_running_loop().run_in_executor(None, task_queue.get, job_id)
+    if not task or task["kind"] != INGEST_TASK:
+        return None
+    if task["progress"]:
+        job = IngestionJob(**task["progress"])
+    else:
+        job = IngestionJob(
+            id=task["id"],
+            project_id=task["payload"]["project_id"],
+            project_path=task["payload"]["project_path"],
         )
-    except Exception as e:
-        logger.error(f"Ingest file error: {e}")
-        raise HTTPException(500, str(e))
+    # The row's status wins: a snapshot may predate a crash or the final update
+    job.status = IngestionStatus(task["status"])
+    if task["status"] == "failed" and task["errors"]:
+        job.add_errors([e for e in task["errors"] if e not in job.errors])
+    return job
 
 
 @router.get("/job/{job_id}")
 async def get_job_status(job_id: str):
-    job = ingestion_jobs.get(job_id)
+    job = await load_job(job_id)
     if not job:
         raise HTTPException(404, "Job not found")
     return job
+
+
+@router.post("/job/{job_id}/resume")
+async def resume_job(job_id: str):
+    """Re-run a failed job, skipping the files it already stored"""
+    loop = asyncio.get_running_loop()
+    task = await loop.run_in_executor(None, task_queue.get, job_id)
+    if not task or task["kind"] != INGEST_TASK:
+        raise HTTPException(404, "Job not found")
+    if not await loop.run_in_executor(None, task_queue.requeue, job_id):
+        raise HTTPException(409, f"Only failed jobs can be resumed (job is {task['status']})")
+    task_worker.wake()
+    return {"status": "queued", "job_id": job_id}
+
+
+@router.post("/project/{project_id}/reconcile")
+async def reconcile_project_index(
+    project_id: str,
+    project_path: Optional[str] = Form(None),
+    max_workers: int = Form(4),
+    db: Session = Depends(get_db),
+):
+    """Repair chunk/index mismatches; with project_path, re-ingest the affected files"""
+    report = await reconcile_project(project_id, get_vector_store(), FileIndexTracker(db))
+    job_id = None
+    if report.needs_reingest and project_path:
+        job_id = enqueue_ingestion(project_path, project_id, max_workers, incremental=True)
+    return {
+        "orphaned_files": report.orphaned_files,
+        "mismatched_files": report.mismatched_files,
+        "lexical_rebuilt": report.lexical_rebuilt,
+        "job_id": job_id,
+    }
+
+
+@router.websocket("/ws/job/{job_id}")
+async def stream_job_progress(websocket: WebSocket, job_id: str):
+    """Push progress deltas for a job until it finishes.
+
+    The first event carries every progress field; later ones only the fields
+    that changed, plus errors added since the previous event. Jobs running
+    in this process push an event per stored batch; others are followed
+    through their task queue snapshots.
+    """
+    await websocket.accept()
+    sent: Dict[str, Any] = {}
+    last_send = time.monotonic()
+    try:
+        while True:
+            job = await load_job(job_id)
+            if not job:
+                await websocket.send_json({"type": "error", "message": "Job not found"})
+                await websocket.close(code=4404)
+                return
+
+            fields = progress_fields(job)
+            delta = progress_delta(sent, fields, job)
+            if delta:
+                await websocket.send_json({"type": "progress", "job_id": job_id, **delta})
+                sent = fields
+                last_send = time.monotonic()
+            elif time.monotonic() - last_send >= STREAM_KEEPALIVE_INTERVAL:
+                await websocket.send_json({"type": "keepalive"})
+                last_send = time.monotonic()
+
+            if job.status in FINISHED_STATUSES:
+                await websocket.close()
+                return
+            if job_id in ingestion_jobs:
+                # The timeout also covers a notification sent while we were sending
+                await progress_notifier.wait(job_id, timeout=PROGRESS_SAVE_INTERVAL)
+            else:
+                await asyncio.sleep(PROGRESS_SAVE_INTERVAL)
+    except WebSocketDisconnect:
+        logger.debug(f"Progress stream for {job_id} disconnected")
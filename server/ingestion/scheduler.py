@@ -0,0 +1,141 @@
+import asyncio
+import functools
+import heapq
+import itertools
+import logging
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from enum import IntEnum
+from typing import Any, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Scheduling classes; lower runs first"""
+
+    INTERACTIVE = 0  # Single-file ingests fired on save
+    BULK = 1  # Project scans
+
+
+class IngestionScheduler:
+    """Runs ingestion work on one fixed thread pool, interactive work first.
+
+    Waiting work is started in priority order. Bulk work never takes the
+    slots reserved for interactive work and is limited per project, so a
+    save is picked up immediately even while full reindexes run. Bulk jobs
+    also call pause_for_interactive() between batches to give way to
+    in-flight saves.
+    """
+
+    def __init__(
+        self, max_workers: int = 4, per_project_limit: int = 2, reserved_interactive: int = 1
+    ):
+        self.max_workers = max_workers
+        self.per_project_limit = per_project_limit
+        # At least one slot always stays free for bulk work
+        self.reserved_interactive = min(reserved_interactive, max_workers - 1)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingestion")
+
+        self._running: Counter = Counter()  # Priority -> running count
+        self._project_running: Counter = Counter()  # Project -> running bulk count
+        self._waiters: List[Tuple[int, int, Optional[str], asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._interactive_idle: List[asyncio.Future] = []
+
+    @classmethod
+    def from_env(cls) -> "IngestionScheduler":
+        """Build from INGESTION_WORKERS / INGESTION_PROJECT_CONCURRENCY"""
+        return cls(
+            max_workers=int(os.getenv("INGESTION_WORKERS", "4")),
+            per_project_limit=int(os.getenv("INGESTION_PROJECT_CONCURRENCY", "2")),
+        )
+
+    async def run(
+        self, priority: Priority, project_id: Optional[str], fn: Callable, *args: Any
+    ) -> Any:
+        """Run fn(*args) on the pool once a slot for this priority/project frees up"""
+        await self._acquire(priority, project_id)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, functools.partial(fn, *args))
+        # Released when the thread finishes, even if the awaiting task is cancelled
+        future.add_done_callback(lambda _: self._release(priority, project_id))
+        return await future
+
+    async def pause_for_interactive(self):
+        """Wait while interactive work is running or queued (called between bulk batches)"""
+        while self._interactive_busy():
+            waiter = asyncio.get_running_loop().create_future()
+            self._interactive_idle.append(waiter)
+            await waiter
+
+    def _interactive_busy(self) -> bool:
+        return self._running[Priority.INTERACTIVE] > 0 or any(
+            p == Priority.INTERACTIVE for p, _, _, _ in self._waiters
+        )
+
+    def _can_start(self, priority: Priority, project_id: Optional[str]) -> bool:
+        if sum(self._running.values()) >= self.max_workers:
+            return False
+        if priority == Priority.BULK:
+            if self._running[Priority.BULK] >= self.max_workers - self.reserved_interactive:
+                return False
+            if project_id and self._project_running[project_id] >= self.per_project_limit:
+                return False
+        return True
+
+    def _start(self, priority: Priority, project_id: Optional[str]):
+        self._running[priority] += 1
+        if priority == Priority.BULK and project_id:
+            self._project_running[project_id] += 1
+
+    async def _acquire(self, priority: Priority, project_id: Optional[str]):
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (int(priority), next(self._seq), project_id, waiter)
+        heapq.heappush(self._waiters, entry)
+        # Starts now unless earlier waiters that fit take the free slots
+        self._dispatch()
+        if waiter.done():
+            return
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release(priority, project_id)  # Granted just before the cancel
+            else:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._wake_idle_waiters()
+            raise
+
+    def _release(self, priority: Priority, project_id: Optional[str]):
+        self._running[priority] -= 1
+        if priority == Priority.BULK and project_id:
+            self._project_running[project_id] -= 1
+            if self._project_running[project_id] <= 0:
+                del self._project_running[project_id]
+        self._dispatch()
+        self._wake_idle_waiters()
+
+    def _dispatch(self):
+        """Start waiters that fit, in priority then arrival order"""
+        remaining = []
+        for entry in sorted(self._waiters):
+            priority, _, project_id, waiter = entry
+            if waiter.done():
+                continue
+            if self._can_start(Priority(priority), project_id):
+                self._start(Priority(priority), project_id)
+                waiter.set_result(None)
+            else:
+                remaining.append(entry)
+        heapq.heapify(remaining)
+        self._waiters = remaining
+
+    def _wake_idle_waiters(self):
+        if self._interactive_idle and not self._interactive_busy():
+            waiters, self._interactive_idle = self._interactive_idle, []
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
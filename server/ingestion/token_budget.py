@@ -0,0 +1,162 @@
+import json
+import logging
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Rough word-piece split used when the model's tokenizer is not available locally
+_HEURISTIC_TOKEN = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+
+class TokenBudget:
+    """Token limit of the active embedding model plus a cached per-line token counter.
+
+    Chunks are packed/split to this limit so embedding calls carry as much
+    useful text as possible and nothing is silently truncated. Only local
+    tokenizer files are used (an explicit model path or the Hugging Face
+    cache); otherwise a word-piece heuristic is used.
+    """
+
+    # [CLS] / [SEP] added by BERT-style sentence embedders
+    SPECIAL_TOKENS = 2
+    DEFAULT_MAX_TOKENS = 256  # all-MiniLM-L6-v2 max_seq_length
+    MAX_CACHED_LINES = 200_000
+
+    def __init__(self, max_tokens: int, tokenizer_source: Optional[str] = None):
+        self.max_tokens = max_tokens
+        self.tokenizer_source = tokenizer_source
+        self._tokenizer = None
+        self._tokenizer_loaded = False
+        self._tokenizer_lock = threading.Lock()
+        self._line_tokens: Dict[str, int] = {}
+
+    @classmethod
+    def from_env(cls) -> Optional["TokenBudget"]:
+        """Budget for the model VectorStore embeds with (EMBEDDING_MAX_TOKENS=0 disables)"""
+        explicit_path = os.getenv("EMBEDDING_MODEL_PATH")
+        model_name = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+        source = explicit_path if explicit_path and os.path.isdir(explicit_path) else model_name
+
+        max_tokens = os.getenv("EMBEDDING_MAX_TOKENS")
+        if max_tokens is not None:
+            max_tokens = int(max_tokens)
+            if max_tokens <= 0:
+                return None
+        else:
+            max_tokens = cls._model_max_tokens(source) or cls.DEFAULT_MAX_TOKENS
+        return cls(max_tokens, source)
+
+    def __getstate__(self):
+        # Sent to process-pool workers, which load their own tokenizer
+        return {"max_tokens": self.max_tokens, "tokenizer_source": self.tokenizer_source}
+
+    def __setstate__(self, state):
+        self.__init__(state["max_tokens"], state["tokenizer_source"])
+
+    @property
+    def content_tokens(self) -> int:
+        """Tokens available for chunk text"""
+        return self.max_tokens - self.SPECIAL_TOKENS
+
+    @property
+    def signature(self) -> str:
+        """Identifies the chunk boundaries this budget produces (part of the parse cache key)"""
+        counter = self.tokenizer_source if self._get_tokenizer() else "heuristic"
+        return f"{counter}:{self.max_tokens}"
+
+    def count_line(self, line: str) -> int:
+        count = self._line_tokens.get(line)
+        if count is None:
+            count = self.count_lines([line])[0]
+        return count
+
+    def count_lines(self, lines: Iterable[str]) -> List[int]:
+        """Token counts for lines, tokenizing only lines not seen before (in one batch)"""
+        lines = list(lines)
+        cache = self._line_tokens
+        missing = list({line for line in lines if line not in cache})
+        counted = dict(zip(missing, self._count_uncached(missing))) if missing else {}
+        if counted:
+            if len(cache) + len(counted) > self.MAX_CACHED_LINES:
+                cache.clear()
+            cache.update(counted)
+
+        counts = []
+        for line in lines:
+            count = counted.get(line)
+            if count is None:
+                count = cache.get(line)
+            if count is None:
+                # Evicted by another thread's clear() in the meantime
+                count = self._count_uncached([line])[0]
+            counts.append(count)
+        return counts
+
+    def _count_uncached(self, lines: List[str]) -> List[int]:
+        tokenizer = self._get_tokenizer()
+        if tokenizer is not None:
+            return [len(e.ids) for e in tokenizer.encode_batch(lines, add_special_tokens=False)]
+        return [self._heuristic_count(line) for line in lines]
+
+    def _heuristic_count(self, line: str) -> int:
+        count = 0
+        for token in _HEURISTIC_TOKEN.findall(line):
+            # Long identifiers split into several word pieces
+            count += 1 + (len(token) - 1) // 6
+        return count
+
+    def _get_tokenizer(self):
+        if self._tokenizer_loaded:
+            return self._tokenizer
+        with self._tokenizer_lock:
+            if not self._tokenizer_loaded:
+                self._tokenizer = self._load_tokenizer()
+                self._tokenizer_loaded = True
+        return self._tokenizer
+
+    def _load_tokenizer(self):
+        path = self._local_file(self.tokenizer_source, "tokenizer.json")
+        if path:
+            try:
+                from tokenizers import Tokenizer
+
+                tokenizer = Tokenizer.from_file(path)
+                tokenizer.no_truncation()
+                return tokenizer
+            except Exception as e:
+                logger.warning(f"Failed to load tokenizer from {path}: {e}")
+        logger.info("Embedding tokenizer not available locally; estimating token counts")
+        return None
+
+    @classmethod
+    def _model_max_tokens(cls, source: str) -> Optional[int]:
+        path = cls._local_file(source, "sentence_bert_config.json")
+        if not path:
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return int(json.load(f)["max_seq_length"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    @staticmethod
+    def _local_file(source: Optional[str], filename: str) -> Optional[str]:
+        """Path of a model file from a local model dir or the Hugging Face cache (no download)"""
+        if not source:
+            return None
+        if os.path.isdir(source):
+            path = os.path.join(source, filename)
+            return path if os.path.exists(path) else None
+        try:
+            from huggingface_hub import try_to_load_from_cache
+        except ImportError:
+            return None
+        repo_id = source if "/" in source else f"sentence-transformers/{source}"
+        try:
+            path = try_to_load_from_cache(repo_id, filename)
+        except Exception:
+            return None
+        return path if isinstance(path, str) else None
@@ -1,23 +1,40 @@
+import asyncio
 import logging
 import os
+from contextlib import asynccontextmanager
 
 from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from server.auditor.router_persistent import router as auditor_router
 from server.chat.router_enhanced import router as chat_router
 from server.dashboard.router_simple import router as dashboard_router
 from server.ingestion.router import router as ingestion_router
+from server.services.task_queue import task_worker
 from server.settings.router_simple import router as settings_router
 from server.shared.database import get_db
+from server.shared.vector_store import get_vector_store
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open Chroma now and load the embedding model in the background (see /health/ready)
+    await asyncio.get_running_loop().run_in_executor(None, get_vector_store)
+    # Queued ingestion/audit jobs (including ones interrupted by a restart) run here
+    await task_worker.start()
+    yield
+    await task_worker.stop()
+
+
 app = FastAPI(
     title="AIde API (Enhanced)",
     description="AI-powered coding assistant with user settings and persistent audit",
     version="0.3.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS
@@ -76,6 +93,20 @@ async def detailed_health(db=Depends(get_db)):
     return health_status
 
 
+@app.get("/health/ready")
+async def readiness():
+    """Readiness check: 503 until the embedding model has loaded, and for good if it failed to"""
+    vector_store = get_vector_store()
+    # "fallback" means dummy embeddings: the server runs, but search results are meaningless
+    ready = vector_store.embedding_status == "ready"
+    status = {
+        "ready": ready,
+        "embedding": vector_store.embedding_status,  # loading / ready / fallback
+        "embedding_model": vector_store.embedding_model_id,
+    }
+    return JSONResponse(status, status_code=200 if ready else 503)
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,42 @@
+import logging
+import os
+import sys
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import text
+
+from server.shared.database import SessionLocal
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def migrate():
+    """Add file_mtime_ns / file_size to file_index_status for incremental ingestion"""
+    db = SessionLocal()
+    try:
+        logger.info("Checking for file stat columns...")
+
+        result = db.execute(text("PRAGMA table_info(file_index_status)"))
+        columns = [row.name for row in result]
+
+        for column in ("file_mtime_ns", "file_size"):
+            if column not in columns:
+                logger.info(f"Adding {column} column...")
+                db.execute(text(f"ALTER TABLE file_index_status ADD COLUMN {column} INTEGER"))
+            else:
+                logger.info(f"Column {column} already exists.")
+        db.commit()
+        logger.info("Migration successful.")
+
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,59 @@
+import logging
+import os
+import sys
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import text
+
+from server.shared.database import SessionLocal
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def migrate():
+    """Ensure file_index_status is unique on (project_id, file_path) for batched upserts.
+
+    Tables from migration 006 already are; tables created by init_db() before
+    the model declared the constraint are deduplicated and get a unique index.
+    """
+    db = SessionLocal()
+    try:
+        logger.info("Checking for a unique (project_id, file_path) index...")
+
+        for index in db.execute(text("PRAGMA index_list(file_index_status)")).fetchall():
+            if not index.unique:
+                continue
+            columns = [
+                row.name
+                for row in db.execute(text(f"PRAGMA index_info('{index.name}')")).fetchall()
+            ]
+            if columns == ["project_id", "file_path"]:
+                logger.info("Unique index already exists.")
+                return
+
+        logger.info("Removing duplicate rows...")
+        db.execute(text("""
+            DELETE FROM file_index_status WHERE id NOT IN (
+                SELECT MAX(id) FROM file_index_status GROUP BY project_id, file_path
+            )
+            """))
+        logger.info("Creating unique index...")
+        db.execute(text("""
+            CREATE UNIQUE INDEX IF NOT EXISTS uq_file_index_project_path
+            ON file_index_status(project_id, file_path)
+            """))
+        db.commit()
+        logger.info("Migration successful.")
+
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,57 @@
+import logging
+import os
+import sys
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import text
+
+from server.shared.database import SessionLocal
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def migrate():
+    """Create the task_queue table backing durable ingestion/audit jobs"""
+    db = SessionLocal()
+    try:
+        logger.info("Creating task_queue table...")
+        db.execute(text("""
+            CREATE TABLE IF NOT EXISTS task_queue (
+                id VARCHAR(100) PRIMARY KEY,
+                kind VARCHAR(50) NOT NULL,           -- ingest_project, audit_project
+                project_id VARCHAR(100),
+                payload TEXT NOT NULL,               -- JSON handler arguments
+                status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                attempts INTEGER DEFAULT 0,
+                lease_owner VARCHAR(100),
+                lease_expires_at DATETIME,
+                progress TEXT,                       -- JSON progress/result snapshot
+                errors TEXT,                         -- JSON list of recent errors
+                error_count INTEGER DEFAULT 0,
+                created_at DATETIME NOT NULL,
+                updated_at DATETIME,
+                finished_at DATETIME
+            )
+            """))
+        db.execute(text("""
+            CREATE INDEX IF NOT EXISTS idx_task_queue_claim
+            ON task_queue(status, kind, created_at)
+            """))
+        db.execute(text("""
+            CREATE INDEX IF NOT EXISTS idx_task_queue_finished ON task_queue(finished_at)
+            """))
+        db.commit()
+        logger.info("Migration successful.")
+
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    migrate()
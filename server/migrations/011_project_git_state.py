@@ -0,0 +1,40 @@
+import logging
+import os
+import sys
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import text
+
+from server.shared.database import SessionLocal
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def migrate():
+    """Create project_git_state, the last ingested commit per project"""
+    db = SessionLocal()
+    try:
+        logger.info("Creating project_git_state table...")
+        db.execute(text("""
+            CREATE TABLE IF NOT EXISTS project_git_state (
+                project_id VARCHAR(100) PRIMARY KEY,
+                commit_sha VARCHAR(64) NOT NULL,
+                dirty_paths TEXT,                    -- JSON list of uncommitted paths
+                indexed_at DATETIME
+            )
+            """))
+        db.commit()
+        logger.info("Migration successful.")
+
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    migrate()
@@ -1,4 +1,12 @@
-from sqlalchemy import Column, DateTime, Integer, String, Text
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Integer,
+    String,
+    Text,
+    UniqueConstraint,
+)
 from sqlalchemy.sql import func
 
 from server.shared.database import Base
@@ -6,7 +14,11 @@ from server.shared.database import Base
 
 class FileIndexStatus(Base):
     __tablename__ = "file_index_status"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        # Upserts conflict on this pair (migrations 006 / 009)
+        UniqueConstraint("project_id", "file_path"),
+        {"extend_existing": True},
+    )
 
     id = Column(Integer, primary_key=True)
     project_id = Column(String(100), nullable=False)
@@ -14,6 +26,24 @@ class FileIndexStatus(Base):
     file_hash = Column(String(64), nullable=False)
     status = Column(String(20), nullable=False)  # indexed, pending, error
 
+    # Stat at index time; incremental ingestion only hashes files whose stat changed
+    file_mtime_ns = Column(BigInteger)
+    file_size = Column(Integer)
+
     chunks_count = Column(Integer, default=0)
     indexed_at = Column(DateTime(timezone=True))
     error_message = Column(Text)
+
+
+class ProjectGitState(Base):
+    """Last commit a project was ingested at (git-aware incremental ingestion)"""
+
+    __tablename__ = "project_git_state"
+    __table_args__ = {"extend_existing": True}
+
+    project_id = Column(String(100), primary_key=True)
+    commit_sha = Column(String(64), nullable=False)
+    # JSON list of paths that differed from commit_sha at ingest time (uncommitted or
+    # untracked); they are re-checked next time even if git no longer reports them
+    dirty_paths = Column(Text)
+    indexed_at = Column(DateTime(timezone=True))
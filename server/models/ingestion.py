@@ -1,6 +1,6 @@
 from datetime import datetime
 from enum import Enum
-from typing import Any, Dict, List, Optional
+from typing import Any, ClassVar, Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -15,6 +15,9 @@ class IngestionStatus(str, Enum):
 class IngestionJob(BaseModel):
     """Represents an ingestion job state"""
 
+    # Only the most recent errors are kept; error_count has the total
+    MAX_ERRORS: ClassVar[int] = 100
+
     id: str
     project_id: str
     project_path: str
@@ -25,11 +28,15 @@ class IngestionJob(BaseModel):
     processed_files: int = 0
     successful_files: int = 0
     failed_files: int = 0
+    skipped_files: int = 0  # Unchanged (incremental mode)
+    removed_files: int = 0  # Deleted from disk since last ingest (incremental mode)
+    resumed_files: int = 0  # Already stored by an interrupted attempt of this job
     total_chunks: int = 0
 
     # Statistics
     parser_stats: Dict[str, int] = Field(default_factory=dict)
     errors: List[str] = Field(default_factory=list)
+    error_count: int = 0
 
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
@@ -39,6 +46,12 @@ class IngestionJob(BaseModel):
         if not self.started_at:
             self.started_at = datetime.now()
 
+    def add_errors(self, errors: List[str]):
+        self.errors.extend(errors)
+        self.error_count += len(errors)
+        if len(self.errors) > self.MAX_ERRORS:
+            del self.errors[: -self.MAX_ERRORS]
+
 
 class FileIngestionRequest(BaseModel):
     content: str
@@ -51,3 +64,4 @@ class ProjectIngestionRequest(BaseModel):
     project_path: str
     project_id: str
     max_workers: int = 4
+    incremental: bool = False
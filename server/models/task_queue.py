@@ -0,0 +1,35 @@
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text
+
+from server.shared.database import Base
+
+
+class QueuedTask(Base):
+    """A durable background job (project ingestion, audit) and its last known progress"""
+
+    __tablename__ = "task_queue"
+    __table_args__ = (
+        Index("idx_task_queue_claim", "status", "kind", "created_at"),
+        Index("idx_task_queue_finished", "finished_at"),
+        {"extend_existing": True},
+    )
+
+    id = Column(String(100), primary_key=True)
+    kind = Column(String(50), nullable=False)  # ingest_project, audit_project
+    project_id = Column(String(100))
+    payload = Column(Text, nullable=False)  # JSON arguments for the handler
+
+    # 'pending', 'processing', 'completed', 'failed'
+    status = Column(String(20), nullable=False, default="pending")
+    attempts = Column(Integer, default=0)
+
+    # Worker holding the task; an expired lease means the worker died
+    lease_owner = Column(String(100))
+    lease_expires_at = Column(DateTime)
+
+    progress = Column(Text)  # JSON progress/result snapshot
+    errors = Column(Text)  # JSON list of the most recent errors
+    error_count = Column(Integer, default=0)
+
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime)
+    finished_at = Column(DateTime)
@@ -1,21 +1,35 @@
 import hashlib
+import json
 import logging
 import os
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
-from sqlalchemy import case, desc
+from sqlalchemy import case, desc, func
 from sqlalchemy.orm import Session
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class FileChanges:
+    """Result of comparing a project's files on disk against its index rows"""
+
+    changed: List[str] = field(default_factory=list)  # New or modified: (re)ingest
+    unchanged: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)  # Indexed but gone from disk
+
+
 class FileIndexTracker:
     """Track file indexing status in database"""
 
     def __init__(self, db_session: Session):
         self.db = db_session
 
+    # Rows per INSERT statement, to stay under SQLite's bound-parameter limit
+    UPSERT_BATCH_SIZE = 100
+
     def update_file_status(
         self,
         project_id: str,
@@ -23,48 +37,216 @@ class FileIndexTracker:
         status: str,
         chunks_count: int = 0,
         error_message: Optional[str] = None,
+        file_hash: Optional[str] = None,
     ):
         """Update or create file index status"""
+        self.upsert_file_statuses(
+            project_id,
+            [
+                {
+                    "file_path": file_path,
+                    "status": status,
+                    "chunks_count": chunks_count,
+                    "error_message": error_message,
+                    "file_hash": file_hash,
+                }
+            ],
+        )
+
+    def upsert_file_statuses(self, project_id: str, entries: Iterable[Dict]):
+        """Insert or update many files' status in one transaction.
+
+        Entries are dicts with file_path, status and optionally chunks_count,
+        error_message, file_hash and file_stat ((mtime_ns, size)). Pass the
+        parser's file_hash and file_stat, taken when it read the file, so the
+        stored stat matches the stored hash; without them the file is stat-ed
+        and then hashed from disk.
+        """
         from server.models.file_index import FileIndexStatus
 
-        # Calculate file hash to detect changes
-        file_hash = self._calculate_file_hash(file_path) or "unknown"
+        now = datetime.utcnow()
+        rows = []
+        for entry in entries:
+            file_path = entry["file_path"]
+            # Stat before hashing: a stat newer than the hash would hide a concurrent edit
+            file_mtime_ns, file_size = entry.get("file_stat") or self._stat_file(file_path)
+            file_hash = entry.get("file_hash") or self._calculate_file_hash(file_path)
+            rows.append(
+                {
+                    "project_id": project_id,
+                    "file_path": file_path,
+                    "file_hash": file_hash or "unknown",
+                    "file_mtime_ns": file_mtime_ns,
+                    "file_size": file_size,
+                    "status": entry["status"],
+                    "chunks_count": entry.get("chunks_count", 0),
+                    "error_message": entry.get("error_message"),
+                    "indexed_at": now if entry["status"] == "indexed" else None,
+                }
+            )
+        if not rows:
+            return
 
-        # Check if record exists
-        record = (
-            self.db.query(FileIndexStatus)
-            .filter_by(project_id=project_id, file_path=file_path)
-            .first()
-        )
+        insert = self._dialect_insert()
+        table = FileIndexStatus.__table__
+        try:
+            for i in range(0, len(rows), self.UPSERT_BATCH_SIZE):
+                stmt = insert(table).values(rows[i : i + self.UPSERT_BATCH_SIZE])
+                excluded = stmt.excluded
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[table.c.project_id, table.c.file_path],
+                    set_={
+                        "file_hash": excluded.file_hash,
+                        "file_mtime_ns": excluded.file_mtime_ns,
+                        "file_size": excluded.file_size,
+                        "status": excluded.status,
+                        "chunks_count": excluded.chunks_count,
+                        "error_message": excluded.error_message,
+                        # Failed re-ingests keep the last successful index time
+                        "indexed_at": func.coalesce(excluded.indexed_at, table.c.indexed_at),
+                    },
+                )
+                self.db.execute(stmt)
+            self.db.commit()
+            # Core statements bypass the ORM; drop any loaded rows so they reload
+            self.db.expire_all()
+        except Exception:
+            self.db.rollback()
+            raise
 
-        if record:
-            # Update existing
-            record.file_hash = file_hash
-            record.status = status
-            record.chunks_count = chunks_count
-            record.error_message = error_message
-            if status == "indexed":
-                record.indexed_at = datetime.utcnow()
+    def _dialect_insert(self):
+        """INSERT construct supporting ON CONFLICT for the session's database"""
+        if self.db.get_bind().dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
         else:
-            # Create new
-            record = FileIndexStatus(
-                project_id=project_id,
-                file_path=file_path,
-                file_hash=file_hash,
-                status=status,
-                chunks_count=chunks_count,
-                error_message=error_message,
+            from sqlalchemy.dialects.sqlite import insert
+        return insert
+
+    def detect_changes(self, project_id: str, file_paths: Iterable[str]) -> FileChanges:
+        """Classify files against the index for incremental ingestion.
+
+        (mtime_ns, size) is compared first; only files whose size matches but
+        whose mtime moved are hashed. Unchanged-but-touched files get their
+        stored stat refreshed so they are not hashed again next time.
+        """
+        from server.models.file_index import FileIndexStatus
+
+        records = {
+            r.file_path: r for r in self.db.query(FileIndexStatus).filter_by(project_id=project_id)
+        }
+        changes = FileChanges()
+        touched = False
+
+        for file_path in file_paths:
+            record = records.pop(file_path, None)
+            if record is None or record.status != "indexed":
+                changes.changed.append(file_path)
+                continue
+
+            file_mtime_ns, file_size = self._stat_file(file_path)
+            if file_size != record.file_size:
+                changes.changed.append(file_path)
+            elif file_mtime_ns == record.file_mtime_ns:
+                changes.unchanged.append(file_path)
+            elif self._calculate_file_hash(file_path) == record.file_hash:
+                record.file_mtime_ns = file_mtime_ns
+                touched = True
+                changes.unchanged.append(file_path)
+            else:
+                changes.changed.append(file_path)
+
+        changes.removed = list(records)
+        if touched:
+            self.db.commit()
+        return changes
+
+    def remove_files(self, project_id: str, file_paths: List[str]):
+        """Delete index rows for files that no longer exist"""
+        from server.models.file_index import FileIndexStatus
+
+        # Batched to stay under SQLite's bound-parameter limit
+        for i in range(0, len(file_paths), 500):
+            self.db.query(FileIndexStatus).filter(
+                FileIndexStatus.project_id == project_id,
+                FileIndexStatus.file_path.in_(file_paths[i : i + 500]),
+            ).delete(synchronize_session=False)
+        self.db.commit()
+
+    def indexed_since(self, project_id: str, since: datetime) -> Set[str]:
+        """Files indexed at or after since (UTC), e.g. by an interrupted job's earlier attempt"""
+        from server.models.file_index import FileIndexStatus
+
+        rows = self.db.query(FileIndexStatus.file_path).filter(
+            FileIndexStatus.project_id == project_id,
+            FileIndexStatus.status == "indexed",
+            FileIndexStatus.indexed_at >= since,
+        )
+        return {row.file_path for row in rows}
+
+    def get_chunk_counts(self, project_id: str) -> Dict[str, Tuple[str, int]]:
+        """(status, chunks_count) per tracked file"""
+        from server.models.file_index import FileIndexStatus
+
+        rows = self.db.query(
+            FileIndexStatus.file_path, FileIndexStatus.status, FileIndexStatus.chunks_count
+        ).filter_by(project_id=project_id)
+        return {row.file_path: (row.status, row.chunks_count or 0) for row in rows}
+
+    def mark_pending(self, project_id: str, file_paths: List[str]):
+        """Flag files for re-ingestion: the next incremental ingest treats them as changed"""
+        from server.models.file_index import FileIndexStatus
+
+        for i in range(0, len(file_paths), 500):
+            self.db.query(FileIndexStatus).filter(
+                FileIndexStatus.project_id == project_id,
+                FileIndexStatus.file_path.in_(file_paths[i : i + 500]),
+            ).update({"status": "pending", "chunks_count": 0}, synchronize_session=False)
+        self.db.commit()
+
+    def tracked_paths(self, project_id: str, file_paths: List[str]) -> Set[str]:
+        """Which of file_paths have an index row"""
+        from server.models.file_index import FileIndexStatus
+
+        tracked = set()
+        for i in range(0, len(file_paths), 500):
+            rows = self.db.query(FileIndexStatus.file_path).filter(
+                FileIndexStatus.project_id == project_id,
+                FileIndexStatus.file_path.in_(file_paths[i : i + 500]),
             )
-            if status == "indexed":
-                record.indexed_at = datetime.utcnow()
-            self.db.add(record)
+            tracked.update(row.file_path for row in rows)
+        return tracked
+
+    def unindexed_paths(self, project_id: str) -> List[str]:
+        """Tracked files whose last ingest failed or that are waiting for re-ingestion"""
+        from server.models.file_index import FileIndexStatus
+
+        rows = self.db.query(FileIndexStatus.file_path).filter(
+            FileIndexStatus.project_id == project_id, FileIndexStatus.status != "indexed"
+        )
+        return [row.file_path for row in rows]
+
+    def get_git_state(self, project_id: str) -> Optional[Tuple[str, List[str]]]:
+        """(last ingested commit, paths dirty at that ingest), or None"""
+        from server.models.file_index import ProjectGitState
 
+        state = self.db.get(ProjectGitState, project_id)
+        if state is None:
+            return None
+        return state.commit_sha, json.loads(state.dirty_paths or "[]")
+
+    def set_git_state(self, project_id: str, commit_sha: str, dirty_paths: List[str]):
+        """Record the commit (and uncommitted paths) a completed ingest reflects"""
+        from server.models.file_index import ProjectGitState
+
+        state = self.db.get(ProjectGitState, project_id) or ProjectGitState(project_id=project_id)
+        state.commit_sha = commit_sha
+        state.dirty_paths = json.dumps(dirty_paths)
+        state.indexed_at = datetime.utcnow()
+        self.db.add(state)
         self.db.commit()
 
     def get_project_stats(self, project_id: str) -> Dict:
         """Get indexing statistics for project"""
-        from sqlalchemy import func
-
         from server.models.file_index import FileIndexStatus
 
         # Using a safer way to query aggregate
@@ -119,6 +301,14 @@ class FileIndexTracker:
             for f in files
         ]
 
+    def _stat_file(self, file_path: str):
+        """(mtime_ns, size) of a file, or (None, None) if it cannot be read"""
+        try:
+            st = os.stat(file_path)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None, None
+
     def _calculate_file_hash(self, file_path: str) -> Optional[str]:
         """Calculate MD5 hash of file content"""
         try:
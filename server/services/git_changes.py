@@ -0,0 +1,106 @@
+import logging
+import os
+import subprocess
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, List, Optional, Set
+
+from server.services.file_index_tracker import FileChanges
+
+logger = logging.getLogger(__name__)
+
+GIT_TIMEOUT = 120
+
+
+class GitError(Exception):
+    pass
+
+
+@dataclass
+class GitSnapshot:
+    """A working tree's HEAD and the paths that differ from it"""
+
+    commit: str
+    dirty_paths: List[str] = field(default_factory=list)  # Relative, '/'-separated
+
+
+def _git(project_path: str, *args: str) -> str:
+    try:
+        result = subprocess.run(
+            ["git", "-C", project_path, *args],
+            capture_output=True,
+            timeout=GIT_TIMEOUT,
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise GitError(str(e))
+    if result.returncode != 0:
+        raise GitError(result.stderr.decode("utf-8", "replace").strip())
+    return result.stdout.decode("utf-8", "surrogateescape")
+
+
+def _split_z(output: str) -> List[str]:
+    return [path for path in output.split("\0") if path]
+
+
+def take_snapshot(project_path: str) -> Optional[GitSnapshot]:
+    """HEAD plus uncommitted/untracked paths under project_path; None if not a git checkout"""
+    try:
+        commit = _git(project_path, "rev-parse", "--verify", "HEAD").strip()
+        dirty = _split_z(_git(project_path, "diff", "--name-only", "-z", "--relative", "HEAD"))
+        untracked = _split_z(_git(project_path, "ls-files", "--others", "--exclude-standard", "-z"))
+    except GitError as e:
+        logger.debug(f"{project_path} is not usable as a git checkout: {e}")
+        return None
+    return GitSnapshot(commit=commit, dirty_paths=sorted(set(dirty) | set(untracked)))
+
+
+def changed_since(project_path: str, commit: str) -> Optional[Set[str]]:
+    """Relative paths whose working-tree content may differ from commit; None if unknown.
+
+    Compares commit to the working tree, so committed, staged and unstaged
+    changes are all included. Git answers from its index and stat cache,
+    so unchanged files are not read or hashed.
+    """
+    try:
+        _git(project_path, "cat-file", "-e", f"{commit}^{{commit}}")
+        diff = _git(project_path, "diff", "--name-only", "-z", "--no-renames", "--relative", commit)
+    except GitError as e:
+        logger.info(f"Cannot diff against {commit[:12]} ({e}); falling back to a full scan")
+        return None
+    return set(_split_z(diff))
+
+
+def detect_git_changes(
+    project_path: str,
+    snapshot: GitSnapshot,
+    last_commit: str,
+    last_dirty_paths: Iterable[str],
+    retry_paths: Iterable[str],
+    filter_files: Callable[[str, Iterable[str]], List[str]],
+) -> Optional[FileChanges]:
+    """Classify the paths git reports as changed since last_commit.
+
+    Candidates are paths changed between last_commit and the working tree,
+    paths that were dirty at the last ingest (they may have been reverted
+    since), paths dirty now and retry_paths (absolute paths whose last
+    ingest did not succeed). Candidates filter_files accepts are changed;
+    the rest were deleted or are now excluded and become removed (callers
+    keep only those they track). Returns None when last_commit is no longer
+    in the repository.
+    """
+    candidates = changed_since(project_path, last_commit)
+    if candidates is None:
+        return None
+    candidates.update(last_dirty_paths)
+    candidates.update(snapshot.dirty_paths)
+    for path in retry_paths:
+        candidates.add(os.path.relpath(path, project_path).replace(os.sep, "/"))
+
+    ordered = sorted(candidates)
+    accepted = filter_files(project_path, ordered)
+    accepted_set = set(accepted)
+    removed = [
+        full_path
+        for full_path in (os.path.join(project_path, *path.split("/")) for path in ordered)
+        if full_path not in accepted_set
+    ]
+    return FileChanges(changed=accepted, removed=removed)
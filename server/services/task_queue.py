@@ -0,0 +1,382 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from server.models.task_queue import QueuedTask
+from server.shared.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+TaskHandler = Callable[[Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class TaskFailed(Exception):
+    """Raised by a handler to fail its task while still recording its progress"""
+
+    def __init__(self, message: str, progress: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        self.progress = progress
+
+
+class TaskQueue:
+    """Durable job queue stored in the app database.
+
+    Workers lease tasks for a limited time and renew the lease while they
+    run; a task whose lease expires (worker crashed or restarted) is handed
+    to the next worker, up to MAX_ATTEMPTS times. Each task keeps a bounded
+    list of its most recent errors, and finished tasks are deleted after the
+    TTL.
+    """
+
+    MAX_ATTEMPTS = 3
+    MAX_ERRORS = 50
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        lease_seconds: int = 60,
+        ttl_seconds: int = 7 * 24 * 3600,
+        worker_id: Optional[str] = None,
+    ):
+        self.session_factory = session_factory
+        self.lease_seconds = lease_seconds
+        self.ttl_seconds = ttl_seconds
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    @classmethod
+    def from_env(cls) -> "TaskQueue":
+        """Build from TASK_LEASE_SECONDS / TASK_TTL_HOURS"""
+        return cls(
+            lease_seconds=int(os.getenv("TASK_LEASE_SECONDS", "60")),
+            ttl_seconds=int(float(os.getenv("TASK_TTL_HOURS", "168")) * 3600),
+        )
+
+    @contextmanager
+    def _session(self):
+        db = self.session_factory()
+        try:
+            yield db
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        project_id: Optional[str] = None,
+        task_id: Optional[str] = None,
+    ) -> str:
+        task_id = task_id or f"{kind}_{uuid.uuid4().hex[:12]}"
+        now = datetime.utcnow()
+        with self._session() as db:
+            db.add(
+                QueuedTask(
+                    id=task_id,
+                    kind=kind,
+                    project_id=project_id,
+                    payload=json.dumps(payload),
+                    status="pending",
+                    attempts=0,
+                    error_count=0,
+                    created_at=now,
+                    updated_at=now,
+                )
+            )
+            db.commit()
+        return task_id
+
+    def lease(self, kinds: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """Claim the oldest runnable task of the given kinds, or None"""
+        kinds = list(kinds)
+        now = datetime.utcnow()
+        expired = and_(QueuedTask.status == "processing", QueuedTask.lease_expires_at < now)
+        claimable = or_(QueuedTask.status == "pending", expired)
+
+        with self._session() as db:
+            # Tasks whose workers died too often are not retried again
+            for task in db.query(QueuedTask).filter(
+                QueuedTask.kind.in_(kinds), expired, QueuedTask.attempts >= self.MAX_ATTEMPTS
+            ):
+                self._finish(task, "failed", now)
+                self._push_errors(task, [f"Abandoned after {task.attempts} attempts"])
+            db.commit()
+
+            # Another worker may claim the same row between select and update; retry then
+            for _ in range(5):
+                candidate = (
+                    db.query(QueuedTask.id)
+                    .filter(QueuedTask.kind.in_(kinds), claimable)
+                    .order_by(QueuedTask.created_at)
+                    .first()
+                )
+                if candidate is None:
+                    return None
+                claimed = (
+                    db.query(QueuedTask)
+                    .filter(QueuedTask.id == candidate.id, claimable)
+                    .update(
+                        {
+                            QueuedTask.status: "processing",
+                            QueuedTask.lease_owner: self.worker_id,
+                            QueuedTask.lease_expires_at: now
+                            + timedelta(seconds=self.lease_seconds),
+                            QueuedTask.attempts: QueuedTask.attempts + 1,
+                            QueuedTask.updated_at: now,
+                        },
+                        synchronize_session=False,
+                    )
+                )
+                db.commit()
+                if claimed:
+                    return self._to_dict(db.get(QueuedTask, candidate.id))
+        return None
+
+    def renew(self, task_id: str) -> bool:
+        """Extend this worker's lease; False if the lease was lost"""
+        now = datetime.utcnow()
+        with self._session() as db:
+            renewed = (
+                self._owned(db, task_id)
+                .filter(QueuedTask.status == "processing")
+                .update(
+                    {
+                        QueuedTask.lease_expires_at: now + timedelta(seconds=self.lease_seconds),
+                        QueuedTask.updated_at: now,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+        return bool(renewed)
+
+    def save_progress(self, task_id: str, progress: Dict[str, Any]):
+        """Store a progress snapshot for a running task"""
+        with self._session() as db:
+            self._owned(db, task_id).filter(QueuedTask.status == "processing").update(
+                {
+                    QueuedTask.progress: json.dumps(progress, default=str),
+                    QueuedTask.updated_at: datetime.utcnow(),
+                },
+                synchronize_session=False,
+            )
+            db.commit()
+
+    def complete(self, task_id: str, progress: Optional[Dict[str, Any]] = None):
+        self._finish_owned(task_id, "completed", progress, [])
+
+    def fail(self, task_id: str, error: str, progress: Optional[Dict[str, Any]] = None):
+        self._finish_owned(task_id, "failed", progress, [error])
+
+    def requeue(self, task_id: str) -> bool:
+        """Put a failed task back in the queue, keeping its progress; False if not failed"""
+        now = datetime.utcnow()
+        with self._session() as db:
+            requeued = (
+                db.query(QueuedTask)
+                .filter(QueuedTask.id == task_id, QueuedTask.status == "failed")
+                .update(
+                    {
+                        QueuedTask.status: "pending",
+                        QueuedTask.attempts: 0,
+                        QueuedTask.lease_owner: None,
+                        QueuedTask.lease_expires_at: None,
+                        QueuedTask.finished_at: None,
+                        QueuedTask.updated_at: now,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+        return bool(requeued)
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self._session() as db:
+            task = db.get(QueuedTask, task_id)
+            return self._to_dict(task) if task else None
+
+    def evict_finished(self) -> int:
+        """Delete completed/failed tasks that finished more than the TTL ago"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+        with self._session() as db:
+            deleted = (
+                db.query(QueuedTask)
+                .filter(
+                    QueuedTask.status.in_(["completed", "failed"]),
+                    QueuedTask.finished_at < cutoff,
+                )
+                .delete(synchronize_session=False)
+            )
+            db.commit()
+        if deleted:
+            logger.info(f"Evicted {deleted} finished tasks")
+        return deleted
+
+    def _owned(self, db: Session, task_id: str):
+        return db.query(QueuedTask).filter(
+            QueuedTask.id == task_id, QueuedTask.lease_owner == self.worker_id
+        )
+
+    def _finish_owned(
+        self, task_id: str, status: str, progress: Optional[Dict[str, Any]], errors: List[str]
+    ):
+        with self._session() as db:
+            task = self._owned(db, task_id).filter(QueuedTask.status == "processing").first()
+            if task is None:
+                logger.warning(f"Task {task_id} lease lost; not marking it {status}")
+                return
+            self._finish(task, status, datetime.utcnow())
+            if progress is not None:
+                task.progress = json.dumps(progress, default=str)
+            self._push_errors(task, errors)
+            db.commit()
+
+    def _finish(self, task: QueuedTask, status: str, now: datetime):
+        task.status = status
+        task.finished_at = now
+        task.updated_at = now
+        task.lease_expires_at = None
+
+    def _push_errors(self, task: QueuedTask, errors: List[str]):
+        """Append to the task's error ring buffer (last MAX_ERRORS kept)"""
+        if not errors:
+            return
+        recent = json.loads(task.errors) if task.errors else []
+        recent = (recent + errors)[-self.MAX_ERRORS :]
+        task.errors = json.dumps(recent)
+        task.error_count = (task.error_count or 0) + len(errors)
+
+    def _to_dict(self, task: QueuedTask) -> Dict[str, Any]:
+        return {
+            "id": task.id,
+            "kind": task.kind,
+            "project_id": task.project_id,
+            "payload": json.loads(task.payload),
+            "status": task.status,
+            "attempts": task.attempts,
+            "progress": json.loads(task.progress) if task.progress else None,
+            "errors": json.loads(task.errors) if task.errors else [],
+            "error_count": task.error_count or 0,
+            "created_at": task.created_at.isoformat() if task.created_at else None,
+            "finished_at": task.finished_at.isoformat() if task.finished_at else None,
+        }
+
+
+class TaskWorker:
+    """Runs queued tasks on the event loop with registered per-kind handlers.
+
+    Handlers are coroutines taking the task dict and returning a result
+    dict stored as the task's final progress; raising fails the task. The
+    worker renews each task's lease while its handler runs.
+    """
+
+    POLL_INTERVAL = 2.0
+    EVICT_INTERVAL = 600.0
+
+    def __init__(self, queue: TaskQueue, max_concurrent: int = 2):
+        self.queue = queue
+        self.max_concurrent = max_concurrent
+        self.handlers: Dict[str, TaskHandler] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._loop_task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    def register(self, kind: str, handler: TaskHandler):
+        self.handlers[kind] = handler
+
+    def wake(self):
+        """Poll now instead of at the next interval (call after enqueue)"""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def start(self):
+        if self._loop_task is None:
+            self._wake = asyncio.Event()
+            self._loop_task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop leasing and cancel running handlers; their leases expire and are retried"""
+        if self._loop_task is None:
+            return
+        self._loop_task.cancel()
+        for task in list(self._running.values()):
+            task.cancel()
+        await asyncio.gather(self._loop_task, *self._running.values(), return_exceptions=True)
+        self._loop_task = None
+        self._running.clear()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_evict = 0.0
+        while True:
+            try:
+                if loop.time() >= next_evict:
+                    next_evict = loop.time() + self.EVICT_INTERVAL
+                    await loop.run_in_executor(None, self.queue.evict_finished)
+
+                while len(self._running) < self.max_concurrent:
+                    task = await loop.run_in_executor(None, self.queue.lease, list(self.handlers))
+                    if task is None:
+                        break
+                    self._running[task["id"]] = asyncio.create_task(self._execute(task))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Task queue poll failed: {e}")
+
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _execute(self, task: Dict[str, Any]):
+        loop = asyncio.get_running_loop()
+        task_id = task["id"]
+        handler_task = asyncio.create_task(self.handlers[task["kind"]](task))
+        heartbeat = asyncio.create_task(self._heartbeat(task_id, handler_task))
+        try:
+            result = await handler_task
+            await loop.run_in_executor(None, self.queue.complete, task_id, result)
+        except asyncio.CancelledError:
+            handler_task.cancel()
+            raise
+        except TaskFailed as e:
+            await loop.run_in_executor(None, self.queue.fail, task_id, str(e), e.progress)
+        except Exception as e:
+            logger.error(f"Task {task_id} failed: {e}")
+            await loop.run_in_executor(None, self.queue.fail, task_id, str(e))
+        finally:
+            heartbeat.cancel()
+            self._running.pop(task_id, None)
+            self.wake()  # A slot is free
+
+    async def _heartbeat(self, task_id: str, handler_task: asyncio.Task):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            try:
+                renewed = await loop.run_in_executor(None, self.queue.renew, task_id)
+            except Exception as e:
+                logger.warning(f"Lease renewal for {task_id} failed: {e}")
+                continue
+            if not renewed:
+                logger.warning(f"Lease on task {task_id} lost; stopping it")
+                handler_task.cancel()
+                return
+
+
+# Process-wide queue and worker; handlers are registered by the routers
+task_queue = TaskQueue.from_env()
+task_worker = TaskWorker(task_queue, max_concurrent=int(os.getenv("TASK_WORKER_CONCURRENCY", "2")))
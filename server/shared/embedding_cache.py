@@ -0,0 +1,119 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+from array import array
+from typing import List, Optional, Sequence
+
+from server.shared.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache(SQLiteStore):
+    """On-disk LRU cache of embeddings shared by every project.
+
+    Entries are keyed by (model id, sha256 of the text), so identical code
+    in another file, project or re-ingest reuses the stored vector. Vectors
+    are stored as float32, the precision Chroma keeps anyway. Each thread
+    opens its own SQLite connection.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS embedding_cache (
+            key TEXT PRIMARY KEY,
+            vector BLOB NOT NULL,
+            last_used REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_used ON embedding_cache(last_used);
+    """
+    # Keys per SELECT (SQLite bound-parameter limit)
+    LOOKUP_BATCH_SIZE = 500
+
+    @classmethod
+    def from_env(cls) -> Optional["EmbeddingCache"]:
+        """Build from EMBEDDING_CACHE_PATH / EMBEDDING_CACHE_MAX_MB (0 disables the cache)"""
+        max_mb = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "512"))
+        if max_mb <= 0:
+            return None
+        path = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache.sqlite3")
+        return cls(path, max_mb * 1024 * 1024)
+
+    @staticmethod
+    def make_key(model_id: str, text: str) -> str:
+        return f"{model_id}:{hashlib.sha256(text.encode('utf-8', 'surrogatepass')).hexdigest()}"
+
+    def get_many(self, model_id: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Cached vector per text (None on a miss), marking hits recently used"""
+        keys = [self.make_key(model_id, text) for text in texts]
+        found = {}
+        try:
+            conn = self._connect()
+            unique = list(dict.fromkeys(keys))
+            for i in range(0, len(unique), self.LOOKUP_BATCH_SIZE):
+                batch = unique[i : i + self.LOOKUP_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                found.update(
+                    conn.execute(
+                        f"SELECT key, vector FROM embedding_cache WHERE key IN ({placeholders})",
+                        batch,
+                    )
+                )
+            if found:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE embedding_cache SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.debug(f"Embedding cache read failed: {e}")
+            return [None] * len(texts)
+
+        vectors = []
+        for key in keys:
+            blob = found.get(key)
+            if blob is None:
+                vectors.append(None)
+            else:
+                vector = array("f")
+                vector.frombytes(blob)
+                vectors.append(vector.tolist())
+        return vectors
+
+    def put_many(self, model_id: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        try:
+            now = time.time()
+            rows = [
+                (self.make_key(model_id, text), array("f", vector).tobytes(), now)
+                for text, vector in zip(texts, vectors)
+            ]
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (key, vector, last_used) VALUES (?, ?, ?)",
+                rows,
+            )
+            conn.commit()
+            self._count_writes(conn, len(rows))
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.debug(f"Embedding cache write failed: {e}")
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Drop the least recently used vectors, counted from the average entry size"""
+        count, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(key) + LENGTH(vector)), 0) FROM embedding_cache"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+
+        # Entries for one model are all the same size, so evict by count
+        excess = total - int(self.max_bytes * self.EVICT_TARGET)
+        drop = min(count, -(-excess * count // total))
+        conn.execute(
+            "DELETE FROM embedding_cache WHERE key IN "
+            "(SELECT key FROM embedding_cache ORDER BY last_used LIMIT ?)",
+            (drop,),
+        )
+        conn.commit()
+        logger.info(f"Embedding cache evicted {drop} entries")
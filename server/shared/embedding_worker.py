@@ -0,0 +1,149 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Callable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+EmbedFn = Callable[..., Sequence[Any]]  # embedding_fn(input=texts) -> one vector per text
+
+
+class EmbedPriority(IntEnum):
+    """Embedding request classes; lower runs first"""
+
+    QUERY = 0  # Chat retrieval, someone is waiting
+    INTERACTIVE = 1  # Saved files, the editor is about to query them
+    INGEST = 2  # Chunks being indexed in bulk
+
+
+@dataclass(order=True)
+class _Request:
+    priority: int
+    seq: int
+    texts: List[str] = field(compare=False)
+    embedding_fn: EmbedFn = field(compare=False)
+    future: Future = field(compare=False)
+
+
+class EmbeddingWorker:
+    """Runs every embedding call of a process on one dedicated thread.
+
+    Requests arriving within `window` seconds of each other are embedded
+    as one model call of up to `max_batch` texts, so concurrent chat
+    queries share a forward pass instead of queueing behind each other.
+    Waiting queries are always taken before saved files and saved files
+    before bulk ingestion texts; requests are split into max_batch slices,
+    so a query or a save waits for at most one lower-priority slice.
+    """
+
+    def __init__(self, window: float = 0.005, max_batch: int = 256):
+        self.window = window
+        self.max_batch = max_batch
+        self._queue: List[_Request] = []
+        self._queued_texts = 0
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls, max_batch: int = 256) -> "EmbeddingWorker":
+        """Build from EMBEDDING_BATCH_WINDOW_MS"""
+        return cls(
+            window=float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5")) / 1000, max_batch=max_batch
+        )
+
+    def submit(
+        self, texts: Sequence[str], embedding_fn: EmbedFn, priority: EmbedPriority
+    ) -> List[Future]:
+        """Queue texts; one future per max_batch slice, each resolving to its vectors"""
+        futures = []
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embedding", daemon=True)
+                self._thread.start()
+            for i in range(0, len(texts), self.max_batch):
+                request = _Request(
+                    priority,
+                    next(self._seq),
+                    list(texts[i : i + self.max_batch]),
+                    embedding_fn,
+                    Future(),
+                )
+                heapq.heappush(self._queue, request)
+                self._queued_texts += len(request.texts)
+                futures.append(request.future)
+            self._cond.notify()
+        return futures
+
+    def embed(self, texts: Sequence[str], embedding_fn: EmbedFn, priority: EmbedPriority) -> List:
+        """Embed texts on the worker thread, blocking until done"""
+        vectors = []
+        for future in self.submit(texts, embedding_fn, priority):
+            vectors.extend(future.result())
+        return vectors
+
+    async def embed_async(
+        self, texts: Sequence[str], embedding_fn: EmbedFn, priority: EmbedPriority
+    ) -> List:
+        """Embed texts on the worker thread without blocking the event loop or a pool thread"""
+        futures = self.submit(texts, embedding_fn, priority)
+        vectors = []
+        for result in await asyncio.gather(*(asyncio.wrap_future(f) for f in futures)):
+            vectors.extend(result)
+        return vectors
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                # Let requests fired at about the same time join this batch
+                deadline = time.monotonic() + self.window
+                while self._queued_texts < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._take_batch()
+            self._embed_batch(batch)
+
+    def _take_batch(self) -> List[_Request]:
+        """Highest-priority requests sharing one embedding function, up to max_batch texts"""
+        batch = [heapq.heappop(self._queue)]
+        size = len(batch[0].texts)
+        while self._queue:
+            head = self._queue[0]
+            if head.embedding_fn is not batch[0].embedding_fn:
+                break
+            if size + len(head.texts) > self.max_batch:
+                break
+            batch.append(heapq.heappop(self._queue))
+            size += len(head.texts)
+        self._queued_texts -= size
+        return batch
+
+    def _embed_batch(self, batch: List[_Request]):
+        batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+        if not batch:
+            return  # Every waiter gave up
+        texts = [text for request in batch for text in request.texts]
+        try:
+            vectors = batch[0].embedding_fn(input=texts)
+        except Exception as e:
+            logger.warning(f"Embedding {len(texts)} texts failed: {e}")
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        start = 0
+        for request in batch:
+            end = start + len(request.texts)
+            request.future.set_result(list(vectors[start:end]))
+            start = end
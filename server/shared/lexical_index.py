@@ -0,0 +1,265 @@
+import logging
+import os
+import re
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from server.shared.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+_QUERY_TOKEN = re.compile(r"`([^`]+)`|[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*(\s*\()?")
+_CAMEL = re.compile(r"[a-z0-9][A-Z]|[A-Z]{2}[a-z]")
+
+
+def query_identifiers(query: str) -> List[str]:
+    """Code identifiers named in a chat query.
+
+    A token counts when it is backticked, called (`name(`), dotted,
+    snake_case or camelCase, or is the whole query; plain words do not.
+    Dotted names also yield their last part (`Class.method` -> `method`).
+    """
+    stripped = query.strip()
+    identifiers = []
+    for match in _QUERY_TOKEN.finditer(stripped):
+        token = (match.group(1) or match.group(0)).strip().rstrip("()").strip()
+        if not token or not _WORD.fullmatch(token.replace(".", "_")):
+            continue
+        if (
+            match.group(1)
+            or match.group(2)
+            or "_" in token
+            or "." in token
+            or _CAMEL.search(token)
+            or token == stripped
+        ):
+            identifiers.append(token)
+            if "." in token:
+                identifiers.append(token.rsplit(".", 1)[1])
+    return list(dict.fromkeys(identifiers))
+
+
+class LexicalIndex(SQLiteStore):
+    """SQLite FTS5 index of stored chunks, kept in step with VectorStore writes.
+
+    Chunk text and symbol names are full-text searchable (BM25), and
+    symbol names also sit in a plain B-tree table, so an exact identifier
+    lookup is a single index probe that needs no embedding. Each thread
+    opens its own SQLite connection.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS chunks (
+            id INTEGER PRIMARY KEY,
+            project_id TEXT NOT NULL,
+            chunk_id TEXT NOT NULL,
+            file_path TEXT NOT NULL,
+            function_name TEXT NOT NULL,
+            language TEXT NOT NULL,
+            UNIQUE (project_id, chunk_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_chunks_file ON chunks(project_id, file_path);
+        CREATE TABLE IF NOT EXISTS chunk_symbols (
+            chunk INTEGER NOT NULL,
+            project_id TEXT NOT NULL,
+            symbol TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_chunk_symbols ON chunk_symbols(project_id, symbol);
+        CREATE INDEX IF NOT EXISTS idx_chunk_symbols_chunk ON chunk_symbols(chunk);
+        CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+            content, symbols, tokenize = "unicode61 tokenchars '_'"
+        );
+    """
+    # Rows per statement (SQLite bound-parameter limit)
+    BATCH_SIZE = 500
+    # BM25 column weights: content, symbols
+    SYMBOL_WEIGHT = 5.0
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._connect()  # Schema DDL runs here rather than in the first search
+
+    @classmethod
+    def from_env(cls) -> Optional["LexicalIndex"]:
+        """Build from LEXICAL_INDEX / LEXICAL_INDEX_PATH (LEXICAL_INDEX=0 disables the index)"""
+        if os.getenv("LEXICAL_INDEX", "1") != "1":
+            return None
+        return cls(os.getenv("LEXICAL_INDEX_PATH", "./lexical_index.sqlite3"))
+
+    @staticmethod
+    def _symbols(function_name: str) -> List[str]:
+        # Packed chunks name several elements ("a, b"); methods may be qualified
+        symbols = []
+        for name in function_name.split(","):
+            name = name.strip()
+            if name:
+                symbols.append(name)
+                if "." in name:
+                    symbols.append(name.rsplit(".", 1)[1])
+        return list(dict.fromkeys(symbols))
+
+    def upsert(
+        self,
+        project_id: str,
+        ids: Sequence[str],
+        documents: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+    ):
+        """Add or replace chunks (same ids, text and metadata as the Chroma write)"""
+        conn = self._connect()
+        with conn:
+            for chunk_id, document, metadata in zip(ids, documents, metadatas):
+                function_name = metadata.get("function_name") or ""
+                symbols = self._symbols(function_name)
+                row = conn.execute(
+                    "SELECT id FROM chunks WHERE project_id = ? AND chunk_id = ?",
+                    (project_id, chunk_id),
+                ).fetchone()
+                if row:
+                    self._delete_rows(conn, [row[0]])
+                cursor = conn.execute(
+                    "INSERT INTO chunks (project_id, chunk_id, file_path, function_name, language) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (
+                        project_id,
+                        chunk_id,
+                        metadata.get("file_path", ""),
+                        function_name,
+                        metadata.get("language", "unknown"),
+                    ),
+                )
+                rowid = cursor.lastrowid
+                conn.execute(
+                    "INSERT INTO chunks_fts (rowid, content, symbols) VALUES (?, ?, ?)",
+                    (rowid, document, " ".join(symbols)),
+                )
+                conn.executemany(
+                    "INSERT INTO chunk_symbols (chunk, project_id, symbol) VALUES (?, ?, ?)",
+                    [(rowid, project_id, symbol) for symbol in symbols],
+                )
+
+    def _delete_rows(self, conn: sqlite3.Connection, rowids: List[int]):
+        for i in range(0, len(rowids), self.BATCH_SIZE):
+            batch = rowids[i : i + self.BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            conn.execute(f"DELETE FROM chunks_fts WHERE rowid IN ({placeholders})", batch)
+            conn.execute(f"DELETE FROM chunk_symbols WHERE chunk IN ({placeholders})", batch)
+            conn.execute(f"DELETE FROM chunks WHERE id IN ({placeholders})", batch)
+
+    def delete_files(self, project_id: str, file_paths: Iterable[str]):
+        file_paths = list(file_paths)
+        conn = self._connect()
+        with conn:
+            for i in range(0, len(file_paths), self.BATCH_SIZE):
+                batch = file_paths[i : i + self.BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rowids = [
+                    row[0]
+                    for row in conn.execute(
+                        f"SELECT id FROM chunks WHERE project_id = ? "
+                        f"AND file_path IN ({placeholders})",
+                        [project_id, *batch],
+                    )
+                ]
+                self._delete_rows(conn, rowids)
+
+    def delete_chunks(self, project_id: str, chunk_ids: Sequence[str]):
+        chunk_ids = list(chunk_ids)
+        conn = self._connect()
+        with conn:
+            for i in range(0, len(chunk_ids), self.BATCH_SIZE):
+                batch = chunk_ids[i : i + self.BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rowids = [
+                    row[0]
+                    for row in conn.execute(
+                        f"SELECT id FROM chunks WHERE project_id = ? "
+                        f"AND chunk_id IN ({placeholders})",
+                        [project_id, *batch],
+                    )
+                ]
+                self._delete_rows(conn, rowids)
+
+    def delete_project(self, project_id: str):
+        conn = self._connect()
+        with conn:
+            rowids = [
+                row[0]
+                for row in conn.execute("SELECT id FROM chunks WHERE project_id = ?", (project_id,))
+            ]
+            self._delete_rows(conn, rowids)
+
+    def count(self, project_id: str) -> int:
+        return (
+            self._connect()
+            .execute("SELECT COUNT(*) FROM chunks WHERE project_id = ?", (project_id,))
+            .fetchone()[0]
+        )
+
+    def lookup_symbols(
+        self, project_id: str, symbols: Sequence[str], limit: int = 5
+    ) -> List[Dict[str, Any]]:
+        """Chunks defining any of the symbols exactly (an index probe, no full-text search)"""
+        if not symbols:
+            return []
+        placeholders = ",".join("?" * len(symbols))
+        rows = self._connect().execute(
+            f"""
+            SELECT c.chunk_id, c.file_path, c.function_name, c.language, f.content
+            FROM chunk_symbols s
+            JOIN chunks c ON c.id = s.chunk
+            JOIN chunks_fts f ON f.rowid = c.id
+            WHERE s.project_id = ? AND s.symbol IN ({placeholders})
+            GROUP BY c.id
+            ORDER BY c.file_path, c.id
+            LIMIT ?
+            """,
+            [project_id, *symbols, limit],
+        )
+        return [self._result(row, "symbol") for row in rows]
+
+    def search(self, project_id: str, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Chunks matching any query word, best BM25 score first"""
+        words = list(dict.fromkeys(_WORD.findall(query)))
+        if not words:
+            return []
+        # Quoted, so query text is never parsed as FTS5 syntax
+        match = " OR ".join('"' + word.replace('"', '""') + '"' for word in words)
+        try:
+            rows = (
+                self._connect()
+                .execute(
+                    """
+                SELECT c.chunk_id, c.file_path, c.function_name, c.language, f.content,
+                       bm25(chunks_fts, 1.0, ?) AS rank
+                FROM chunks_fts f
+                JOIN chunks c ON c.id = f.rowid
+                WHERE chunks_fts MATCH ? AND c.project_id = ?
+                ORDER BY rank
+                LIMIT ?
+                """,
+                    (self.SYMBOL_WEIGHT, match, project_id, limit),
+                )
+                .fetchall()
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Lexical search failed: {e}")
+            return []
+        return [self._result(row[:5], "lexical") for row in rows]
+
+    @staticmethod
+    def _result(row, match: str) -> Dict[str, Any]:
+        """A hit in query_similar_code's result shape"""
+        chunk_id, file_path, function_name, language, content = row
+        return {
+            "id": chunk_id,
+            "content": content,
+            "metadata": {
+                "type": "code_snippet",
+                "file_path": file_path,
+                "function_name": function_name,
+                "language": language,
+            },
+            "match": match,
+        }
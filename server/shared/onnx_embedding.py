@@ -0,0 +1,185 @@
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Code-like texts the ONNX backend is compared on against the torch model
+PARITY_TEXTS = [
+    "def add(a, b):\n    return a + b",
+    "class UserRepository:\n    def get(self, user_id):\n        return self.db.find(user_id)",
+    "import os\nprint(os.getcwd())",
+    "async function fetchJson(url) { const r = await fetch(url); return r.json(); }",
+    "SELECT id, name FROM users WHERE active = 1 ORDER BY name",
+    "How do I read a file line by line in Python?",
+    "Fix the off-by-one error in the pagination loop",
+    "x",
+]
+
+
+def mean_pool(hidden: np.ndarray, attention_mask: np.ndarray, normalize: bool = True) -> np.ndarray:
+    """Sentence vectors from token vectors: mask-weighted mean, optionally L2-normalized"""
+    mask = attention_mask[..., None].astype(hidden.dtype)
+    pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+    if normalize:
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        pooled = pooled / np.clip(norms, 1e-12, None)
+    return pooled
+
+
+class OnnxEmbeddingFunction:
+    """SentenceTransformer-compatible embeddings run by ONNX Runtime on CPU.
+
+    Loads the ONNX export shipped with a local SentenceTransformer model
+    directory (onnx/model.onnx or model.onnx) and its tokenizer.json, then
+    applies the same truncation, mean pooling and normalization. With
+    quantize, weights are converted to int8 once (dynamic quantization)
+    and the quantized file is reused on later starts. Needs onnxruntime
+    and tokenizers, not torch (pip install -r requirements-onnx.txt).
+    """
+
+    # Texts per session run; sorted by length so padding stays short
+    RUN_BATCH_SIZE = 32
+
+    def __init__(self, model_path: str, quantize: bool = True, threads: int = 0):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.model_path = model_path
+        onnx_path = self._find_model_file(model_path)
+        self.quantized = False
+        if quantize:
+            onnx_path, self.quantized = self._quantized_model_file(onnx_path)
+        self.max_length = self._max_seq_length(model_path)
+        self.normalize = self._normalizes(model_path)
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_path, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.max_length)
+        pad_id = self.tokenizer.token_to_id("[PAD]") or 0
+        self.tokenizer.enable_padding(pad_id=pad_id, pad_token="[PAD]")
+
+        options = onnxruntime.SessionOptions()
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            onnx_path, options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        logger.info(f"Loaded ONNX embedding model {onnx_path}")
+
+    @classmethod
+    def from_env(cls, model_path: str) -> "OnnxEmbeddingFunction":
+        """Build from EMBEDDING_ONNX_QUANTIZE / EMBEDDING_ONNX_THREADS"""
+        return cls(
+            model_path,
+            quantize=os.getenv("EMBEDDING_ONNX_QUANTIZE", "1") == "1",
+            threads=int(os.getenv("EMBEDDING_ONNX_THREADS", "0")),
+        )
+
+    @property
+    def model_id(self) -> str:
+        """Embedding cache model id; int8 vectors differ slightly from the torch ones"""
+        return f"{self.model_path}#onnx{'-int8' if self.quantized else ''}"
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        vectors: List[Optional[List[float]]] = [None] * len(input)
+        order = sorted(range(len(input)), key=lambda i: len(input[i]))
+        for start in range(0, len(order), self.RUN_BATCH_SIZE):
+            indices = order[start : start + self.RUN_BATCH_SIZE]
+            pooled = self._embed_batch([input[i] for i in indices])
+            for index, vector in zip(indices, pooled.tolist()):
+                vectors[index] = vector
+        return vectors
+
+    def name(self) -> str:
+        """Return name for ChromaDB compatibility."""
+        return "OnnxSentenceEmbedding"
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": attention_mask,
+        }
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        hidden = self.session.run(None, feeds)[0]  # (batch, tokens, dim)
+        return mean_pool(hidden, attention_mask, self.normalize)
+
+    @staticmethod
+    def _find_model_file(model_path: str) -> str:
+        for candidate in ("onnx/model.onnx", "model.onnx"):
+            path = os.path.join(model_path, candidate)
+            if os.path.exists(path):
+                return path
+        raise FileNotFoundError(f"No onnx/model.onnx or model.onnx under {model_path}")
+
+    @staticmethod
+    def _quantized_model_file(onnx_path: str):
+        """(path, quantized): an int8 copy of the model, created on first use"""
+        quantized_path = onnx_path[: -len(".onnx")] + "_int8.onnx"
+        if os.path.exists(quantized_path):
+            return quantized_path, True
+        try:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+        except ImportError:
+            logger.warning("int8 quantization needs the onnx package; using the fp32 model.")
+            return onnx_path, False
+        try:
+            quantize_dynamic(onnx_path, quantized_path, weight_type=QuantType.QInt8)
+        except Exception as e:
+            logger.warning(f"Quantizing {onnx_path} failed: {e}. Using the fp32 model.")
+            return onnx_path, False
+        logger.info(f"Wrote int8 model {quantized_path}")
+        return quantized_path, True
+
+    @staticmethod
+    def _max_seq_length(model_path: str) -> int:
+        try:
+            with open(os.path.join(model_path, "sentence_bert_config.json"), encoding="utf-8") as f:
+                return int(json.load(f)["max_seq_length"])
+        except (OSError, ValueError, KeyError):
+            return 256  # all-MiniLM-L6-v2
+
+    @staticmethod
+    def _normalizes(model_path: str) -> bool:
+        """Whether the SentenceTransformer pipeline ends with a Normalize module"""
+        try:
+            with open(os.path.join(model_path, "modules.json"), encoding="utf-8") as f:
+                return any(m.get("type", "").endswith(".Normalize") for m in json.load(f))
+        except (OSError, ValueError, AttributeError):
+            return True
+
+
+@dataclass
+class ParityReport:
+    """Cosine similarity between two backends' embeddings of the same texts"""
+
+    min_cosine: float
+    mean_cosine: float
+    texts: int
+
+    def passed(self, min_cosine: float) -> bool:
+        return self.min_cosine >= min_cosine
+
+
+EmbedFn = Callable[[List[str]], Sequence[Sequence[float]]]
+
+
+def parity_report(
+    reference: EmbedFn, candidate: EmbedFn, texts: Sequence[str] = PARITY_TEXTS
+) -> ParityReport:
+    """Compare candidate embeddings (e.g. ONNX int8) with reference ones (torch)"""
+    expected = np.asarray(reference(input=list(texts)), dtype=np.float64)
+    actual = np.asarray(candidate(input=list(texts)), dtype=np.float64)
+    expected /= np.clip(np.linalg.norm(expected, axis=1, keepdims=True), 1e-12, None)
+    actual /= np.clip(np.linalg.norm(actual, axis=1, keepdims=True), 1e-12, None)
+    cosines = (expected * actual).sum(axis=1)
+    return ParityReport(
+        min_cosine=float(cosines.min()), mean_cosine=float(cosines.mean()), texts=len(texts)
+    )
@@ -0,0 +1,257 @@
+import logging
+import os
+import re
+import stat
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Pattern, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WalkEntry:
+    """A file found by ProjectWalker (stat taken once during the walk)"""
+
+    path: str
+    size: int
+    mtime_ns: int
+
+
+def _translate_pattern(pattern: str) -> str:
+    """Translate a gitignore glob into a regex over '/'-separated relative paths"""
+    out, i, n = [], 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1 : end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+class IgnoreRules:
+    """Compiled rules of one .gitignore/.aideignore file.
+
+    Supports comments, negation (!), directory-only (trailing /), anchored
+    (leading or inner /) patterns and ** wildcards.
+    """
+
+    def __init__(self, base: str, lines: Iterable[str]):
+        self.base = base  # Directory of the ignore file, relative to the walk root
+        self.rules: List[Tuple[Pattern, bool, bool]] = []  # (regex, negate, dir_only)
+        for raw in lines:
+            line = raw.rstrip("\n").rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            anchored = "/" in line
+            line = line.lstrip("/")
+            regex = _translate_pattern(line)
+            if not anchored:
+                regex = "(?:.*/)?" + regex
+            self.rules.append((re.compile(regex + r"\Z"), negate, dir_only))
+
+    @classmethod
+    def load(cls, base: str, file_path: str) -> Optional["IgnoreRules"]:
+        try:
+            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+                rules = cls(base, f)
+        except OSError:
+            return None
+        return rules if rules.rules else None
+
+    def match(self, rel_path: str, is_dir: bool) -> Optional[bool]:
+        """True = ignored, False = re-included by a ! rule, None = no rule applies"""
+        if self.base:
+            if not rel_path.startswith(self.base + "/"):
+                return None
+            rel_path = rel_path[len(self.base) + 1 :]
+        for regex, negate, dir_only in reversed(self.rules):
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path):
+                return not negate
+        return None
+
+
+class ProjectWalker:
+    """scandir-based project walker shared by ingestion and the auditor.
+
+    Prunes skipped/ignored directories before descending, honors
+    .gitignore and .aideignore at any level, and filters files by extension
+    before the single stat call used for the size limit.
+    """
+
+    SKIP_DIRS = {
+        "node_modules",
+        "__pycache__",
+        ".git",
+        "dist",
+        "build",
+        "vendor",
+        ".venv",
+        "venv",
+    }
+    IGNORE_FILES = (".gitignore", ".aideignore")
+
+    def __init__(
+        self,
+        extensions: Optional[Iterable[str]] = None,
+        max_file_size: Optional[int] = None,
+        skip_hidden_dirs: bool = True,
+    ):
+        self.extensions = {e.lower() for e in extensions} if extensions is not None else None
+        self.max_file_size = max_file_size
+        self.skip_hidden_dirs = skip_hidden_dirs
+
+    def walk(self, root: str) -> Iterator[WalkEntry]:
+        # Stack of (absolute dir, dir relative to root, ignore rules in effect)
+        stack: List[Tuple[str, str, List[IgnoreRules]]] = [(root, "", [])]
+        while stack:
+            dir_path, rel_dir, rules = stack.pop()
+            try:
+                with os.scandir(dir_path) as it:
+                    entries = list(it)
+            except OSError as e:
+                logger.debug(f"Cannot scan {dir_path}: {e}")
+                continue
+
+            names = {entry.name for entry in entries}
+            for ignore_name in self.IGNORE_FILES:
+                if ignore_name in names:
+                    loaded = IgnoreRules.load(rel_dir, os.path.join(dir_path, ignore_name))
+                    if loaded:
+                        rules = rules + [loaded]
+
+            subdirs = []
+            for entry in entries:
+                name = entry.name
+                rel_path = f"{rel_dir}/{name}" if rel_dir else name
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+
+                if is_dir:
+                    if name in self.SKIP_DIRS or (self.skip_hidden_dirs and name.startswith(".")):
+                        continue
+                    if self._is_ignored(rules, rel_path, True):
+                        continue
+                    subdirs.append((entry.path, rel_path, rules))
+                    continue
+
+                if self.extensions is not None:
+                    if os.path.splitext(name)[1].lower() not in self.extensions:
+                        continue
+                if rules and self._is_ignored(rules, rel_path, False):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue
+                if self.max_file_size is not None and st.st_size > self.max_file_size:
+                    continue
+                yield WalkEntry(entry.path, st.st_size, st.st_mtime_ns)
+
+            # Reversed so directories are visited in listing order
+            stack.extend(reversed(subdirs))
+
+    def filter_paths(self, root: str, rel_paths: Iterable[str]) -> Iterator[WalkEntry]:
+        """Entries walk(root) would yield for the given '/'-separated relative paths.
+
+        Lets callers that already know which paths changed (e.g. from git)
+        apply the same directory, ignore, extension and size rules without
+        walking the tree. Ignore files are read once per directory.
+        """
+        dir_rules: Dict[str, Optional[List[IgnoreRules]]] = {}
+        for rel_path in rel_paths:
+            parts = rel_path.split("/")
+            name = parts[-1]
+            if self.extensions is not None:
+                if os.path.splitext(name)[1].lower() not in self.extensions:
+                    continue
+            rules = self._rules_for_dir(root, parts[:-1], dir_rules)
+            if rules is None:  # Inside a skipped or ignored directory
+                continue
+            if rules and self._is_ignored(rules, rel_path, False):
+                continue
+            full_path = os.path.join(root, *parts)
+            try:
+                st = os.stat(full_path)
+            except OSError:
+                continue
+            if not stat.S_ISREG(st.st_mode):
+                continue
+            if self.max_file_size is not None and st.st_size > self.max_file_size:
+                continue
+            yield WalkEntry(full_path, st.st_size, st.st_mtime_ns)
+
+    def _rules_for_dir(
+        self,
+        root: str,
+        dir_parts: List[str],
+        cache: Dict[str, Optional[List[IgnoreRules]]],
+    ) -> Optional[List[IgnoreRules]]:
+        """Ignore rules in effect inside a directory, or None if walk() never enters it"""
+        rel_dir = "/".join(dir_parts)
+        if rel_dir in cache:
+            return cache[rel_dir]
+
+        if dir_parts:
+            parent = self._rules_for_dir(root, dir_parts[:-1], cache)
+            name = dir_parts[-1]
+            if (
+                parent is None
+                or name in self.SKIP_DIRS
+                or (self.skip_hidden_dirs and name.startswith("."))
+                or self._is_ignored(parent, rel_dir, True)
+            ):
+                cache[rel_dir] = None
+                return None
+        else:
+            parent = []
+
+        rules = parent
+        for ignore_name in self.IGNORE_FILES:
+            loaded = IgnoreRules.load(rel_dir, os.path.join(root, *dir_parts, ignore_name))
+            if loaded:
+                rules = rules + [loaded]
+        cache[rel_dir] = rules
+        return rules
+
+    def _is_ignored(self, rules: List[IgnoreRules], rel_path: str, is_dir: bool) -> bool:
+        # Deeper ignore files take precedence, as in git
+        for rule_set in reversed(rules):
+            result = rule_set.match(rel_path, is_dir)
+            if result is not None:
+                return result
+        return False
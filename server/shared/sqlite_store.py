@@ -0,0 +1,48 @@
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+
+class SQLiteStore:
+    """Base for the on-disk SQLite stores shared by threads and processes.
+
+    Each thread opens its own connection on first use (WAL journal,
+    synchronous=NORMAL) and runs SCHEMA on it. Size-bounded stores report
+    writes through _count_writes, which calls _evict every
+    EVICT_CHECK_INTERVAL written entries rather than on every write.
+    """
+
+    # CREATE ... IF NOT EXISTS statements run on each new connection
+    SCHEMA = ""
+    # Check the size bound every N written entries
+    EVICT_CHECK_INTERVAL = 1024
+    # Eviction frees space down to this fraction of max_bytes
+    EVICT_TARGET = 0.9
+
+    def __init__(self, path: str, max_bytes: Optional[int] = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes_since_check = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _count_writes(self, conn: sqlite3.Connection, count: int = 1):
+        self._writes_since_check += count
+        if self._writes_since_check >= self.EVICT_CHECK_INTERVAL:
+            self._writes_since_check = 0
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Bring the store down to EVICT_TARGET of max_bytes; size-bounded stores override this"""
@@ -2,20 +2,53 @@ import asyncio
 import hashlib
 import logging
 import os
+import threading
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor, TimeoutError
-from typing import Any, Dict, List, Optional
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
 
 import chromadb
 from chromadb.config import Settings
+from chromadb.errors import NotFoundError
 from chromadb.utils import embedding_functions
 
+from server.shared.embedding_cache import EmbeddingCache
+from server.shared.embedding_worker import EmbeddingWorker, EmbedPriority
+from server.shared.lexical_index import LexicalIndex, query_identifiers
+from server.shared.onnx_embedding import OnnxEmbeddingFunction, parity_report
+
 logger = logging.getLogger(__name__)
 
 
+class EmbeddingModelNotReady(RuntimeError):
+    """The embedding model is still loading, so nothing could be embedded for storage"""
+
+
+@dataclass
+class EmbeddedSnippets:
+    """Snippets embedded by embed_snippets, ready for write_embedded_snippets"""
+
+    doc_ids: List[str]  # One per input snippet, in input order
+    ids: List[str] = field(default_factory=list)  # Unique ids to write
+    documents: List[str] = field(default_factory=list)
+    metadatas: List[Dict[str, Any]] = field(default_factory=list)
+    embeddings: List[Any] = field(default_factory=list)
+
+
 class VectorStore:
     """ChromaDB wrapper with async support and project-specific collections"""
 
-    def __init__(self):
+    # Snippets per collection.add in add_code_snippets (one embedding call each)
+    ADD_BATCH_SIZE = 256
+    # Records per page when reading a whole collection's metadata
+    SCAN_PAGE_SIZE = 5000
+    # Project collection handles kept open (least recently used are dropped)
+    COLLECTION_CACHE_SIZE = 64
+    # Reciprocal rank fusion constant for search_code (higher flattens rank differences)
+    FUSION_K = 60
+
+    def __init__(self, background_load: bool = False):
         self.host = os.getenv("CHROMA_SERVER_HOST", "local")
 
         if self.host == "local":
@@ -26,10 +59,129 @@ class VectorStore:
                 settings=Settings(chroma_server_ssl_enabled=False, anonymized_telemetry=False),
             )
 
-        self.embedding_fn = self._init_embedding_function()
+        self._collections: "OrderedDict[str, chromadb.Collection]" = OrderedDict()
+        self._collections_lock = threading.Lock()
 
-    def _init_embedding_function(self):
-        """Initialize embedding function with timeout and offline-friendly fallback."""
+        # Model name/path the embeddings come from; None for dummy embeddings (not cached)
+        self.embedding_model_id: Optional[str] = None
+        self.embedding_cache = EmbeddingCache.from_env()
+        self.embedding_worker = EmbeddingWorker.from_env(max_batch=self.ADD_BATCH_SIZE)
+        self.lexical_index = LexicalIndex.from_env()
+        # "loading" until the model is usable, then "ready" (or "fallback" for dummy embeddings)
+        self.embedding_status = "loading"
+        self._embedding_ready = threading.Event()
+        self._fallback_fn = self._dummy_embedding_fn()
+        # Seconds embedding calls wait for a background load before giving up (queries
+        # then use dummy embeddings; ingestion fails rather than store placeholder vectors)
+        self.warm_up_timeout = float(os.getenv("EMBEDDING_WARMUP_TIMEOUT", "120"))
+
+        if background_load:
+            self.embedding_fn = self._fallback_fn  # Replaced once the model has loaded
+            threading.Thread(target=self._warm_up, name="embedding-warm-up", daemon=True).start()
+        else:
+            embedding_fn = self._init_embedding_function()
+            self._set_embedding_function(embedding_fn, self.embedding_model_id)
+
+    @property
+    def is_ready(self) -> bool:
+        """Whether embedding calls can run without waiting for the model to load"""
+        return self._embedding_ready.is_set()
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        return self._embedding_ready.wait(timeout)
+
+    def _set_embedding_function(self, embedding_fn, model_id: Optional[str] = None):
+        self.embedding_fn = embedding_fn
+        self.embedding_model_id = model_id
+        self.embedding_status = "ready" if model_id else "fallback"
+        self.invalidate_collections()  # Handles carry the embedding function
+        self._embedding_ready.set()
+
+    def _warm_up(self):
+        """Load the model and run one embedding, off the request path"""
+        model_target = self._embedding_model_target()
+        if model_target is None:
+            self._set_embedding_function(self._fallback_fn)
+            return
+        try:
+            embedding_fn, model_id = self._build_embedding_function(model_target)
+            embedding_fn(input=["warm up"])  # First call initializes the model's kernels
+        except Exception as e:
+            logger.warning(f"Failed to load embedding model: {e}. Using dummy embeddings.")
+            self._set_embedding_function(self._fallback_fn)
+            return
+        self._set_embedding_function(embedding_fn, model_id)
+        logger.info(f"Embedding model {model_id} loaded")
+
+    def _build_embedding_function(self, model_target: str) -> Tuple[Any, str]:
+        """(embedding_fn, model_id) for the backend EMBEDDING_BACKEND selects.
+
+        "sentence_transformers" (default) runs the model on torch. "onnx"
+        runs the ONNX export in a local model directory with ONNX Runtime,
+        int8-quantized by default; with EMBEDDING_ONNX_PARITY_CHECK=1 it is
+        first compared with the torch model, which is used instead if the
+        embeddings disagree.
+        """
+        backend = os.getenv("EMBEDDING_BACKEND", "sentence_transformers").lower()
+        if backend != "onnx":
+            return (
+                embedding_functions.SentenceTransformerEmbeddingFunction(model_name=model_target),
+                model_target,
+            )
+
+        if not os.path.isdir(model_target):
+            raise ValueError("EMBEDDING_BACKEND=onnx needs a local EMBEDDING_MODEL_PATH")
+        embedding_fn = OnnxEmbeddingFunction.from_env(model_target)
+        if os.getenv("EMBEDDING_ONNX_PARITY_CHECK", "0") == "1":
+            reference = embedding_functions.SentenceTransformerEmbeddingFunction(
+                model_name=model_target
+            )
+            report = parity_report(reference, embedding_fn)
+            min_cosine = float(os.getenv("EMBEDDING_ONNX_MIN_COSINE", "0.99"))
+            if not report.passed(min_cosine):
+                logger.warning(
+                    f"ONNX embeddings differ from torch (min cosine {report.min_cosine:.4f} "
+                    f"< {min_cosine}); using the torch model."
+                )
+                return reference, model_target
+            logger.info(f"ONNX parity check passed (min cosine {report.min_cosine:.4f})")
+        return embedding_fn, embedding_fn.model_id
+
+    def _current_embedding(self, timeout: Optional[float] = None):
+        """(embedding_fn, model_id) to embed with, waiting for a background load.
+
+        Raises EmbeddingModelNotReady when the model is still loading after
+        timeout (warm_up_timeout by default).
+        """
+        if not self._embedding_ready.wait(self.warm_up_timeout if timeout is None else timeout):
+            raise EmbeddingModelNotReady("Embedding model is still loading")
+        return self.embedding_fn, self.embedding_model_id
+
+    def _query_embedding(self):
+        """(embedding_fn, model_id) for a query: dummy embeddings if the model is still loading"""
+        try:
+            return self._current_embedding()
+        except EmbeddingModelNotReady:
+            logger.warning("Embedding model is still loading; using dummy embeddings.")
+            return self._fallback_fn, None
+
+    async def wait_for_model(self):
+        """Wait for a background model load without blocking the event loop.
+
+        Only calls made while the model loads wait, on a pool thread blocked
+        on the ready event. Raises EmbeddingModelNotReady after
+        warm_up_timeout seconds.
+        """
+        if self.is_ready:
+            return
+        loop = asyncio.get_running_loop()
+        if not await loop.run_in_executor(None, self.wait_until_ready, self.warm_up_timeout):
+            raise EmbeddingModelNotReady(
+                f"Embedding model still loading after {self.warm_up_timeout:.0f}s"
+            )
+
+    def _embedding_model_target(self) -> Optional[str]:
+        """Model name or local path to load; None when offline without a local model"""
         offline_flag = os.getenv("TRANSFORMERS_OFFLINE", "0") == "1"
         explicit_path = os.getenv("EMBEDDING_MODEL_PATH")
         explicit_name = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
@@ -47,26 +199,34 @@ class VectorStore:
         # If explicitly offline and no usable local path, skip expensive load entirely.
         if offline_flag and (not explicit_path or not os.path.exists(explicit_path)):
             logger.info("TRANSFORMERS_OFFLINE=1 with no local model; using dummy embeddings.")
-            return self._dummy_embedding_fn()
+            return None
+        return model_target
+
+    def _init_embedding_function(self):
+        """Initialize embedding function with timeout and offline-friendly fallback."""
+        model_target = self._embedding_model_target()
+        if model_target is None:
+            return self._fallback_fn
 
         def build_embedding():
-            return embedding_functions.SentenceTransformerEmbeddingFunction(model_name=model_target)
+            return self._build_embedding_function(model_target)
 
         executor: Optional[ThreadPoolExecutor] = None
         try:
             executor = ThreadPoolExecutor(max_workers=1)
             future = executor.submit(build_embedding)
             # Time-box initialization to avoid blocking startup on downloads.
-            return future.result(timeout=5)
+            embedding_fn, self.embedding_model_id = future.result(timeout=5)
+            return embedding_fn
         except TimeoutError:
-            logger.warning("Timed out loading SentenceTransformer (5s). Using dummy embeddings.")
+            logger.warning("Timed out loading embedding model (5s). Using dummy embeddings.")
         except Exception as e:
-            logger.warning(f"Failed to load SentenceTransformer: {e}. Using dummy embeddings.")
+            logger.warning(f"Failed to load embedding model: {e}. Using dummy embeddings.")
         finally:
             if executor:
                 executor.shutdown(wait=False)
 
-        return self._dummy_embedding_fn()
+        return self._fallback_fn
 
     def _dummy_embedding_fn(self):
         """Return a cheap, deterministic dummy embedding function."""
@@ -86,77 +246,411 @@ class VectorStore:
         return DummyEmbeddingFunction()
 
     def _get_project_collection(self, project_id: str) -> chromadb.Collection:
-        """Get or create collection for a project (Synchronous)"""
-        collection_name = f"project_{project_id}"
-        try:
-            return self.client.get_collection(
-                name=collection_name, embedding_function=self.embedding_fn
-            )
-        except:
-            return self.client.create_collection(
-                name=collection_name,
+        """Get or create collection for a project (Synchronous)
+
+        Handles are cached, so only the first use of a project (or the first
+        after its handle was evicted or invalidated) asks Chroma.
+        """
+        with self._collections_lock:
+            collection = self._collections.get(project_id)
+            if collection is not None:
+                self._collections.move_to_end(project_id)
+                return collection
+
+            collection = self.client.get_or_create_collection(
+                name=f"project_{project_id}",
                 embedding_function=self.embedding_fn,
                 metadata={"project_id": project_id},
             )
+            self._collections[project_id] = collection
+            if len(self._collections) > self.COLLECTION_CACHE_SIZE:
+                self._collections.popitem(last=False)
+            return collection
+
+    def invalidate_collections(self, project_id: Optional[str] = None):
+        """Drop cached collection handles (one project's, or all)"""
+        with self._collections_lock:
+            if project_id is None:
+                self._collections.clear()
+            else:
+                self._collections.pop(project_id, None)
+
+    def _delete_project_sync(self, project_id: str):
+        """Delete a project's collection sync"""
+        with self._collections_lock:
+            self._collections.pop(project_id, None)
+            try:
+                self.client.delete_collection(name=f"project_{project_id}")
+            except NotFoundError:
+                pass
+        if self.lexical_index:
+            self.lexical_index.delete_project(project_id)
+
+    async def delete_project(self, project_id: str):
+        """Delete all of a project's chunks (its collection) async wrapper"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, lambda: self._delete_project_sync(project_id))
 
     def _add_code_snippet_sync(
         self, project_id: str, code: str, file_path: str, function_name: Optional[str] = None
     ) -> str:
         """Add code snippet sync"""
-        collection = self._get_project_collection(project_id)
-
-        metadata = {
-            "type": "code_snippet",
-            "file_path": file_path,
-            "function_name": function_name or "",
-            "language": self._detect_language(file_path),
-        }
-
-        doc_id = hashlib.md5(f"{project_id}:{file_path}:{code}".encode()).hexdigest()
-
-        collection.add(documents=[code], metadatas=[metadata], ids=[doc_id])
-        return doc_id
+        snippet = {"code": code, "file_path": file_path, "function_name": function_name}
+        return self._add_code_snippets_sync(project_id, [snippet])[0]
 
     async def add_code_snippet(
         self, project_id: str, code: str, file_path: str, function_name: Optional[str] = None
     ) -> str:
         """Add code snippet async wrapper"""
+        await self.wait_for_model()
         loop = asyncio.get_running_loop()
         return await loop.run_in_executor(
             None, lambda: self._add_code_snippet_sync(project_id, code, file_path, function_name)
         )
 
+    def _prepare_snippets(
+        self, project_id: str, snippets: List[Dict[str, Any]]
+    ) -> EmbeddedSnippets:
+        """Ids and metadata for snippets, dropping duplicates (not embedded yet)"""
+        prepared = EmbeddedSnippets(doc_ids=[])
+        seen = set()
+        for snippet in snippets:
+            code = snippet["code"]
+            file_path = snippet["file_path"]
+            doc_id = hashlib.md5(f"{project_id}:{file_path}:{code}".encode()).hexdigest()
+            prepared.doc_ids.append(doc_id)
+            if doc_id in seen:
+                continue  # Identical snippet in the same file; Chroma rejects duplicate ids
+            seen.add(doc_id)
+            prepared.ids.append(doc_id)
+            prepared.documents.append(code)
+            prepared.metadatas.append(
+                {
+                    "type": "code_snippet",
+                    "file_path": file_path,
+                    "function_name": snippet.get("function_name") or "",
+                    "language": self._detect_language(file_path),
+                }
+            )
+        return prepared
+
+    def _embed_snippets_sync(
+        self,
+        project_id: str,
+        snippets: List[Dict[str, Any]],
+        priority: EmbedPriority = EmbedPriority.INGEST,
+    ) -> EmbeddedSnippets:
+        """Embed snippets sync"""
+        embedded = self._prepare_snippets(project_id, snippets)
+        embedded.embeddings = self._embed_documents(embedded.documents, priority)
+        return embedded
+
+    def _embed_documents(
+        self, documents: List[str], priority: EmbedPriority = EmbedPriority.INGEST
+    ) -> List[Any]:
+        """Embeddings for documents, from the embedding cache where possible.
+
+        Misses are embedded on the embedding worker (at most ADD_BATCH_SIZE
+        per model call), each distinct text once, and written back to the
+        cache.
+        """
+        if priority == EmbedPriority.QUERY:
+            embedding_fn, model_id = self._query_embedding()
+        else:
+            # Stored vectors must come from the model: callers wait in wait_for_model first
+            embedding_fn, model_id = self._current_embedding(timeout=0)
+        cache = self.embedding_cache if model_id else None
+        if cache is None:
+            return self.embedding_worker.embed(documents, embedding_fn, priority)
+
+        embeddings = cache.get_many(model_id, documents)
+        missing: Dict[str, List[int]] = {}  # Text -> positions needing it
+        for index, vector in enumerate(embeddings):
+            if vector is None:
+                missing.setdefault(documents[index], []).append(index)
+
+        texts = list(missing)
+        if texts:
+            vectors = self.embedding_worker.embed(texts, embedding_fn, priority)
+            vectors = [[float(x) for x in vector] for vector in vectors]
+            cache.put_many(model_id, texts, vectors)
+            for text, vector in zip(texts, vectors):
+                for index in missing[text]:
+                    embeddings[index] = vector
+        if documents:
+            logger.debug(f"Embedded {len(texts)} of {len(documents)} documents; rest cached")
+        return embeddings
+
+    def _write_embedded_snippets_sync(
+        self, project_id: str, embedded: EmbeddedSnippets
+    ) -> List[str]:
+        """Write already embedded snippets sync, ADD_BATCH_SIZE per write.
+
+        Upserts, so re-writing a batch (resumed or repaired ingest) replaces
+        its chunks instead of failing or duplicating them. The lexical index
+        gets the same chunks.
+        """
+        collection = self._get_project_collection(project_id)
+        for i in range(0, len(embedded.ids), self.ADD_BATCH_SIZE):
+            end = i + self.ADD_BATCH_SIZE
+            collection.upsert(
+                ids=embedded.ids[i:end],
+                documents=embedded.documents[i:end],
+                metadatas=embedded.metadatas[i:end],
+                embeddings=embedded.embeddings[i:end],
+            )
+        if self.lexical_index:
+            self.lexical_index.upsert(
+                project_id, embedded.ids, embedded.documents, embedded.metadatas
+            )
+        return embedded.doc_ids
+
+    def _add_code_snippets_sync(self, project_id: str, snippets: List[Dict[str, Any]]) -> List[str]:
+        """Add snippets sync: embed, then write"""
+        embedded = self._embed_snippets_sync(project_id, snippets)
+        return self._write_embedded_snippets_sync(project_id, embedded)
+
+    async def add_code_snippets(self, project_id: str, snippets: List[Dict[str, Any]]) -> List[str]:
+        """Bulk add snippets ({"code", "file_path", "function_name"} dicts) async wrapper"""
+        if not snippets:
+            return []
+        await self.wait_for_model()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, lambda: self._add_code_snippets_sync(project_id, snippets)
+        )
+
+    async def embed_snippets(
+        self,
+        project_id: str,
+        snippets: List[Dict[str, Any]],
+        priority: EmbedPriority = EmbedPriority.INGEST,
+    ) -> EmbeddedSnippets:
+        """Embed snippets without writing them (the embed stage of a pipelined ingest).
+
+        Saved files pass EmbedPriority.INTERACTIVE to go ahead of queued bulk slices.
+        Raises EmbeddingModelNotReady if the model does not finish loading in time.
+        """
+        await self.wait_for_model()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, lambda: self._embed_snippets_sync(project_id, snippets, priority)
+        )
+
+    async def write_embedded_snippets(
+        self, project_id: str, embedded: EmbeddedSnippets
+    ) -> List[str]:
+        """Write snippets returned by embed_snippets; returns their ids in input order"""
+        if not embedded.ids:
+            return embedded.doc_ids
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, lambda: self._write_embedded_snippets_sync(project_id, embedded)
+        )
+
+    def _delete_file_chunks_sync(self, project_id: str, file_paths: List[str]):
+        """Delete all chunks stored for the given files sync"""
+        collection = self._get_project_collection(project_id)
+        for i in range(0, len(file_paths), 500):
+            collection.delete(where={"file_path": {"$in": file_paths[i : i + 500]}})
+        if self.lexical_index:
+            self.lexical_index.delete_files(project_id, file_paths)
+
+    async def delete_file_chunks(self, project_id: str, file_paths: List[str]):
+        """Delete file chunks async wrapper (used before re-ingesting or after removal)"""
+        if not file_paths:
+            return
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            None, lambda: self._delete_file_chunks_sync(project_id, file_paths)
+        )
+
+    def _replace_file_chunks_sync(
+        self, project_id: str, file_paths: List[str], embedded: EmbeddedSnippets
+    ) -> List[str]:
+        """Swap the files' stored chunks for embedded ones sync.
+
+        The new chunks are upserted before the stale ones are deleted, so
+        the files are never left without chunks in between.
+        """
+        collection = self._get_project_collection(project_id)
+        stale = set()
+        for i in range(0, len(file_paths), 500):
+            found = collection.get(
+                where={"file_path": {"$in": file_paths[i : i + 500]}}, include=[]
+            )
+            stale.update(found["ids"])
+        stale = sorted(stale.difference(embedded.ids))
+
+        doc_ids = self._write_embedded_snippets_sync(project_id, embedded)
+        for i in range(0, len(stale), 500):
+            collection.delete(ids=stale[i : i + 500])
+        if self.lexical_index and stale:
+            self.lexical_index.delete_chunks(project_id, stale)
+        return doc_ids
+
+    async def replace_file_chunks(
+        self, project_id: str, file_paths: List[str], embedded: EmbeddedSnippets
+    ) -> List[str]:
+        """Replace every stored chunk of file_paths with already embedded snippets"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, lambda: self._replace_file_chunks_sync(project_id, file_paths, embedded)
+        )
+
+    def _count_chunks_by_file_sync(self, project_id: str) -> Dict[str, int]:
+        """Stored chunk count per file_path sync, reading metadata a page at a time"""
+        collection = self._get_project_collection(project_id)
+        counts: Dict[str, int] = {}
+        offset = 0
+        while True:
+            page = collection.get(include=["metadatas"], limit=self.SCAN_PAGE_SIZE, offset=offset)
+            for metadata in page["metadatas"]:
+                file_path = (metadata or {}).get("file_path", "")
+                counts[file_path] = counts.get(file_path, 0) + 1
+            if len(page["ids"]) < self.SCAN_PAGE_SIZE:
+                return counts
+            offset += self.SCAN_PAGE_SIZE
+
+    async def count_chunks_by_file(self, project_id: str) -> Dict[str, int]:
+        """Count chunks per file async wrapper (used to reconcile with the file index)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: self._count_chunks_by_file_sync(project_id))
+
+    def _sync_lexical_index_sync(self, project_id: str, chunk_count: int) -> bool:
+        """Rebuild the project's lexical index from Chroma unless it holds chunk_count chunks"""
+        if not self.lexical_index or self.lexical_index.count(project_id) == chunk_count:
+            return False
+        self.lexical_index.delete_project(project_id)
+        collection = self._get_project_collection(project_id)
+        offset = 0
+        while True:
+            page = collection.get(
+                include=["documents", "metadatas"], limit=self.SCAN_PAGE_SIZE, offset=offset
+            )
+            self.lexical_index.upsert(
+                project_id,
+                page["ids"],
+                page["documents"],
+                [metadata or {} for metadata in page["metadatas"]],
+            )
+            if len(page["ids"]) < self.SCAN_PAGE_SIZE:
+                break
+            offset += self.SCAN_PAGE_SIZE
+        logger.info(f"Rebuilt lexical index of {project_id} ({chunk_count} chunks)")
+        return True
+
+    async def sync_lexical_index(self, project_id: str, chunk_count: int) -> bool:
+        """Repair the lexical index (e.g. chunks written before it existed); True if rebuilt"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, lambda: self._sync_lexical_index_sync(project_id, chunk_count)
+        )
+
     def _query_similar_code_sync(
-        self, project_id: str, query: str, n_results: int = 5
+        self, project_id: str, query: str, n_results: int = 5, query_embedding: Any = None
     ) -> List[Dict]:
         """Query similar code sync"""
         collection = self._get_project_collection(project_id)
 
+        # Embedded here rather than by the collection: uses the current model and the cache
+        if query_embedding is None:
+            query_embedding = self._embed_documents([query], EmbedPriority.QUERY)[0]
         results = collection.query(
-            query_texts=[query],
+            query_embeddings=[query_embedding],
             n_results=n_results,
             include=["documents", "metadatas", "distances"],
         )
 
         formatted_results = []
         if results["documents"]:
-            for doc, metadata, distance in zip(
-                results["documents"][0], results["metadatas"][0], results["distances"][0]
+            for doc_id, doc, metadata, distance in zip(
+                results["ids"][0],
+                results["documents"][0],
+                results["metadatas"][0],
+                results["distances"][0],
             ):
                 formatted_results.append(
-                    {"content": doc, "metadata": metadata, "similarity": 1 - distance}
+                    {"id": doc_id, "content": doc, "metadata": metadata, "similarity": 1 - distance}
                 )
         return formatted_results
 
     async def query_similar_code(
         self, project_id: str, query: str, n_results: int = 5
     ) -> List[Dict]:
-        """Query similar code async wrapper - prevents event loop blocking"""
+        """Query similar code async wrapper - prevents event loop blocking
+
+        The query is embedded on the embedding worker, ahead of ingestion
+        and batched with concurrent queries; no pool thread waits for it.
+        """
         loop = asyncio.get_running_loop()
+        try:
+            await self.wait_for_model()
+            embedding_fn = self.embedding_fn
+        except EmbeddingModelNotReady:
+            logger.warning("Embedding model is still loading; using dummy embeddings.")
+            embedding_fn = self._fallback_fn
+        embedding = (
+            await self.embedding_worker.embed_async([query], embedding_fn, EmbedPriority.QUERY)
+        )[0]
         return await loop.run_in_executor(
-            None, lambda: self._query_similar_code_sync(project_id, query, n_results)
+            None, lambda: self._query_similar_code_sync(project_id, query, n_results, embedding)
         )
 
+    async def search_code(self, project_id: str, query: str, n_results: int = 5) -> List[Dict]:
+        """Hybrid retrieval: exact symbol hits, else lexical and vector results fused.
+
+        When the query names an identifier that a stored chunk defines,
+        those chunks are returned straight from the lexical index, without
+        embedding the query. Otherwise BM25 and vector searches run
+        concurrently and are merged by reciprocal rank fusion; vector
+        search is skipped while the embedding model is still loading.
+        """
+        if not self.lexical_index:
+            if not self.is_ready:
+                return []  # Answer without context rather than wait for the model
+            return await self.query_similar_code(project_id, query, n_results)
+
+        loop = asyncio.get_running_loop()
+        identifiers = query_identifiers(query)
+        if identifiers:
+            # Off the event loop: the probe can wait on SQLite's lock behind a writer
+            hits = await loop.run_in_executor(
+                None, lambda: self.lexical_index.lookup_symbols(project_id, identifiers, n_results)
+            )
+            if hits:
+                return hits
+
+        searches = [
+            loop.run_in_executor(
+                None, lambda: self.lexical_index.search(project_id, query, n_results)
+            )
+        ]
+        if self.is_ready:
+            searches.append(self.query_similar_code(project_id, query, n_results))
+        ranked_lists = []
+        for result in await asyncio.gather(*searches, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.warning(f"Search failed for {project_id}: {result}")
+            else:
+                ranked_lists.append(result)
+        return self._fuse(ranked_lists, n_results)
+
+    def _fuse(self, ranked_lists: List[List[Dict]], n_results: int) -> List[Dict]:
+        """Reciprocal rank fusion of result lists, keyed by chunk id"""
+        scores: Dict[str, float] = {}
+        merged: Dict[str, Dict] = {}
+        for results in ranked_lists:
+            for rank, result in enumerate(results):
+                key = result.get("id") or result["content"]
+                scores[key] = scores.get(key, 0.0) + 1.0 / (self.FUSION_K + rank + 1)
+                if key in merged:
+                    merged[key] = {**result, **merged[key], "match": "hybrid"}
+                else:
+                    merged[key] = {"match": "vector", **result}
+        ranked = sorted(merged, key=lambda key: scores[key], reverse=True)[:n_results]
+        return [{**merged[key], "score": scores[key]} for key in ranked]
+
     def _detect_language(self, file_path: str) -> str:
         """Simple language detection"""
         ext = os.path.splitext(file_path)[1].lower()
@@ -172,3 +666,22 @@ class VectorStore:
             ".json": "json",
         }
         return mapping.get(ext, "unknown")
+
+
+_shared_store: Optional[VectorStore] = None
+_shared_store_lock = threading.Lock()
+
+
+def get_vector_store() -> VectorStore:
+    """The process-wide VectorStore, created on first use with a background model load.
+
+    Chat and ingestion share it, so the Chroma client and embedding model
+    are loaded once per process instead of per request.
+    """
+    global _shared_store
+    if _shared_store is None:
+        with _shared_store_lock:
+            if _shared_store is None:
+                logger.info("Initializing shared VectorStore...")
+                _shared_store = VectorStore(background_load=True)
+    return _shared_store
@@ -0,0 +1,689 @@
+"""
+Integration tests for the ingestion pipeline in the ingestion router.
+The vector store is mocked; parsing and index tracking run for real.
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import threading
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from server.ingestion import router as ingestion_router
+from server.ingestion.coalescer import SaveCoalescer
+from server.ingestion.parser import CodeParser
+from server.ingestion.pipeline import Stage, batched, run_pipeline
+from server.ingestion.progress import progress_delta, progress_fields
+from server.ingestion.reconcile import reconcile_project
+from server.ingestion.scheduler import IngestionScheduler, Priority
+from server.models.file_index import FileIndexStatus, ProjectGitState
+from server.models.ingestion import IngestionJob, IngestionStatus
+from server.services.file_index_tracker import FileIndexTracker
+from server.shared.database import Base
+from server.shared.embedding_worker import EmbedPriority
+
+
+@pytest.fixture
+def project_dir(tmp_path):
+    for i in range(25):
+        (tmp_path / f"module_{i}.py").write_text(f"def func_{i}():\n    return {i}\n")
+    return tmp_path
+
+
+@pytest.fixture
+def mock_vector_store():
+    store = Mock()
+    store.add_code_snippets = AsyncMock(
+        side_effect=lambda project_id, snippets: ["id"] * len(snippets)
+    )
+    store.embed_snippets = AsyncMock(
+        side_effect=lambda project_id, snippets, priority=EmbedPriority.INGEST: snippets
+    )
+    store.write_embedded_snippets = AsyncMock(
+        side_effect=lambda project_id, embedded: ["id"] * len(embedded)
+    )
+    store.replace_file_chunks = AsyncMock(
+        side_effect=lambda project_id, file_paths, embedded: ["id"] * len(embedded)
+    )
+    store.delete_file_chunks = AsyncMock()
+    with patch.object(ingestion_router, "get_vector_store", return_value=store):
+        yield store
+
+
+@pytest.fixture
+def db_session(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'index.db'}", connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(
+        bind=engine, tables=[FileIndexStatus.__table__, ProjectGitState.__table__]
+    )
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+async def run_ingest(project_dir, db, incremental=False, use_git=False):
+    job = IngestionJob(id=f"job-{incremental}", project_id="p", project_path=str(project_dir))
+    ingestion_router.ingestion_jobs[job.id] = job
+    await ingestion_router.ingest_project_background(
+        job.id,
+        str(project_dir),
+        "p",
+        max_workers=1,
+        db=db,
+        incremental=incremental,
+        use_git=use_git,
+    )
+    return job
+
+
+def git(repo, *args):
+    subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=repo,
+        check=True,
+        capture_output=True,
+    )
+
+
+class TestStreamingScan:
+    """Tests for the bounded-queue scan stream."""
+
+    @pytest.mark.asyncio
+    async def test_stream_yields_every_file(self, project_dir):
+        """Test every parsed file comes through the stream."""
+        paths = list(ingestion_router.parser.iter_project_files(str(project_dir)))
+
+        results = [item async for item in ingestion_router.stream_scan_results(paths, 1)]
+
+        assert len(results) == 25
+        assert all(meta is not None for meta, _, _ in results)
+
+    @pytest.mark.asyncio
+    async def test_early_stop_releases_producer(self, project_dir):
+        """Test that abandoning the stream does not leave the scan thread blocked."""
+        paths = list(ingestion_router.parser.iter_project_files(str(project_dir)))
+
+        with patch.object(ingestion_router, "SCAN_QUEUE_SIZE", 2):
+            stream = ingestion_router.stream_scan_results(paths, 1)
+            async for _ in stream:
+                break
+            await stream.aclose()
+
+
+class TestPipeline:
+    """Tests for the staged parse/embed/persist pipeline."""
+
+    @pytest.mark.asyncio
+    async def test_stages_overlap_and_keep_order(self):
+        """Test stages work on different items at once and every item gets through."""
+        active, peak, written = set(), [0], []
+
+        async def source():
+            for i in range(6):
+                yield i
+
+        def stage(name, sink=None):
+            async def fn(item):
+                active.add(name)
+                peak[0] = max(peak[0], len(active))
+                await asyncio.sleep(0.02)
+                active.discard(name)
+                if sink is not None:
+                    sink.append(item)
+                return item
+
+            return fn
+
+        await run_pipeline(
+            batched(source(), 2),
+            [Stage("embed", stage("embed")), Stage("persist", stage("w", written))],
+        )
+
+        assert written == [[0, 1], [2, 3], [4, 5]]
+        assert peak[0] == 2
+
+    @pytest.mark.asyncio
+    async def test_error_cancels_and_closes_source(self):
+        """Test a failing stage stops the pipeline, raises, and closes the source."""
+        closed = []
+
+        async def source():
+            try:
+                for i in range(100):
+                    yield i
+            finally:
+                closed.append(True)
+
+        async def fail_on_two(item):
+            if item == 2:
+                raise ValueError("write failed")
+            return item
+
+        with pytest.raises(ValueError, match="write failed"):
+            await run_pipeline(
+                source(),
+                [Stage("embed", AsyncMock(side_effect=lambda i: i)), Stage("persist", fail_on_two)],
+            )
+
+        assert closed == [True]
+
+
+class TestIngestionScheduler:
+    """Tests for priority scheduling of ingestion work."""
+
+    @pytest.mark.asyncio
+    async def test_interactive_runs_before_queued_bulk(self):
+        """Test a save queued behind bulk work starts first once a slot frees."""
+        scheduler = IngestionScheduler(max_workers=1, reserved_interactive=0)
+        gate = threading.Event()
+        order = []
+
+        blocking = asyncio.ensure_future(scheduler.run(Priority.BULK, "p", gate.wait))
+        await asyncio.sleep(0.05)
+        bulk = asyncio.ensure_future(scheduler.run(Priority.BULK, "p", order.append, "bulk"))
+        save = asyncio.ensure_future(scheduler.run(Priority.INTERACTIVE, "p", order.append, "save"))
+        await asyncio.sleep(0.05)
+        gate.set()
+        await asyncio.gather(blocking, bulk, save)
+
+        assert order == ["save", "bulk"]
+
+    @pytest.mark.asyncio
+    async def test_reserved_slot_and_project_limit(self):
+        """Test bulk work leaves a slot for saves and is capped per project."""
+        scheduler = IngestionScheduler(max_workers=3, per_project_limit=1)
+        gate = threading.Event()
+
+        first = asyncio.ensure_future(scheduler.run(Priority.BULK, "a", gate.wait))
+        same_project = asyncio.ensure_future(scheduler.run(Priority.BULK, "a", gate.wait))
+        other_project = asyncio.ensure_future(scheduler.run(Priority.BULK, "b", gate.wait))
+        third = asyncio.ensure_future(scheduler.run(Priority.BULK, "c", gate.wait))
+        await asyncio.sleep(0.05)
+        assert scheduler._running[Priority.BULK] == 2  # "a" and "b"; "c" is over the bulk cap
+
+        # The reserved slot serves a save immediately
+        assert await scheduler.run(Priority.INTERACTIVE, "a", lambda: "saved") == "saved"
+        assert not same_project.done()
+
+        gate.set()
+        await asyncio.gather(first, same_project, other_project, third)
+        assert sum(scheduler._running.values()) == 0
+
+    @pytest.mark.asyncio
+    async def test_bulk_pauses_for_interactive(self):
+        """Test pause_for_interactive waits until in-flight saves finish."""
+        scheduler = IngestionScheduler(max_workers=2)
+        gate = threading.Event()
+
+        save = asyncio.ensure_future(scheduler.run(Priority.INTERACTIVE, "p", gate.wait))
+        await asyncio.sleep(0.05)
+        pause = asyncio.ensure_future(scheduler.pause_for_interactive())
+        await asyncio.sleep(0.05)
+        assert not pause.done()
+
+        gate.set()
+        await asyncio.wait_for(asyncio.gather(save, pause), timeout=2)
+
+
+class TestProgressStream:
+    """Tests for pushed job progress events."""
+
+    def test_delta_has_only_changed_fields_and_new_errors(self):
+        """Test events after the first carry only what changed."""
+        job = IngestionJob(id="j", project_id="p", project_path="/p", total_files=10)
+        first = progress_fields(job)
+        assert progress_delta({}, first, job)["total_files"] == 10
+
+        job.processed_files = job.failed_files = 1
+        job.add_errors(["bad.py: syntax error"])
+        delta = progress_delta(first, progress_fields(job), job)
+
+        assert "total_files" not in delta
+        assert delta["processed_files"] == 1 and delta["failed_files"] == 1
+        assert delta["errors"] == ["bad.py: syntax error"]
+
+    def test_stream_pushes_deltas_until_finished(self):
+        """Test a client gets a full event, then deltas, then the socket closes."""
+        app = FastAPI()
+        app.include_router(ingestion_router.router)
+        job = IngestionJob(id="job-stream", project_id="p", project_path="/p", total_files=4)
+        job.status = IngestionStatus.PROCESSING
+        ingestion_router.ingestion_jobs[job.id] = job
+
+        try:
+            with TestClient(app).websocket_connect("/ingestion/ws/job/job-stream") as ws:
+                first = ws.receive_json()
+                assert first["type"] == "progress"
+                assert first["total_files"] == 4 and first["status"] == "processing"
+
+                job.processed_files = job.successful_files = 4
+                job.status = IngestionStatus.COMPLETED
+                final = ws.receive_json()
+                assert final["status"] == "completed" and final["processed_files"] == 4
+                assert final["eta_seconds"] == 0
+                assert "total_files" not in final
+        finally:
+            ingestion_router.ingestion_jobs.pop(job.id, None)
+
+    def test_stream_unknown_job(self):
+        """Test an unknown job id gets an error event."""
+        app = FastAPI()
+        app.include_router(ingestion_router.router)
+
+        with patch.object(ingestion_router.task_queue, "get", return_value=None):
+            with TestClient(app).websocket_connect("/ingestion/ws/job/missing") as ws:
+                assert ws.receive_json()["type"] == "error"
+
+
+class TestIngestProjectBackground:
+    """Tests for the background project ingestion job."""
+
+    @pytest.mark.asyncio
+    async def test_ingests_all_files(self, project_dir, mock_vector_store):
+        """Test a project ingest stores every chunk and tracks every file."""
+        job = IngestionJob(id="job-stream", project_id="p", project_path=str(project_dir))
+        ingestion_router.ingestion_jobs[job.id] = job
+        tracker = Mock()
+
+        with patch.object(ingestion_router, "FileIndexTracker", return_value=tracker):
+            await ingestion_router.ingest_project_background(
+                job.id, str(project_dir), "p", max_workers=1, db=Mock()
+            )
+
+        assert job.status == IngestionStatus.COMPLETED
+        assert job.total_files == 25
+        assert job.processed_files == 25
+        stored = [
+            s
+            for call in mock_vector_store.write_embedded_snippets.await_args_list
+            for s in call.args[1]
+        ]
+        assert len(stored) == job.total_chunks
+        # One embedding pass and one bulk write per batch of 10 files
+        assert mock_vector_store.embed_snippets.await_count == 3
+        assert mock_vector_store.write_embedded_snippets.await_count == 3
+        upserted = [e for call in tracker.upsert_file_statuses.call_args_list for e in call.args[1]]
+        assert len(upserted) == 25
+        assert tracker.upsert_file_statuses.call_count == 3
+
+    @pytest.mark.asyncio
+    async def test_large_file_is_ingested_in_parts(self, tmp_path, mock_vector_store):
+        """Test a large file is stored part by part and tracked once with all its chunks."""
+        (tmp_path / "dump.txt").write_text(
+            "".join(f"INSERT INTO t VALUES ({i});\n" for i in range(3000))
+        )
+        job = IngestionJob(id="job-large", project_id="p", project_path=str(tmp_path))
+        ingestion_router.ingestion_jobs[job.id] = job
+        tracker = Mock()
+
+        with patch.object(CodeParser, "LARGE_FILE_SIZE", 1024):
+            with patch.object(CodeParser, "LARGE_FILE_PART_CHUNKS", 5):
+                with patch.object(ingestion_router, "FileIndexTracker", return_value=tracker):
+                    await ingestion_router.ingest_project_background(
+                        job.id, str(tmp_path), "p", max_workers=1, db=Mock()
+                    )
+
+        assert job.status == IngestionStatus.COMPLETED
+        assert job.processed_files == job.successful_files == 1
+        stored = [
+            s
+            for call in mock_vector_store.write_embedded_snippets.await_args_list
+            for s in call.args[1]
+        ]
+        assert len(stored) == job.total_chunks > 5
+        assert mock_vector_store.write_embedded_snippets.await_count > 1
+        upserted = [e for call in tracker.upsert_file_statuses.call_args_list for e in call.args[1]]
+        assert [e["chunks_count"] for e in upserted] == [job.total_chunks]
+
+
+class TestIncrementalIngestion:
+    """Tests for incremental re-ingestion driven by file_index_status."""
+
+    @pytest.mark.asyncio
+    async def test_only_changed_files_are_reingested(
+        self, project_dir, db_session, mock_vector_store
+    ):
+        """Test unchanged files are skipped, modified re-ingested, removed cleaned up."""
+        first = await run_ingest(project_dir, db_session)
+        assert first.total_files == 25
+
+        modified = project_dir / "module_1.py"
+        modified.write_text("def changed():\n    return 'a longer body'\n")
+        removed = project_dir / "module_2.py"
+        removed.unlink()
+        touched = project_dir / "module_3.py"
+        st = touched.stat()
+        os.utime(touched, ns=(st.st_atime_ns, st.st_mtime_ns + 10_000_000))
+        mock_vector_store.delete_file_chunks.reset_mock()
+
+        job = await run_ingest(project_dir, db_session, incremental=True)
+
+        assert job.status == IngestionStatus.COMPLETED
+        assert job.total_files == 1
+        assert job.skipped_files == 23
+        assert job.removed_files == 1
+        mock_vector_store.delete_file_chunks.assert_awaited_once_with(
+            "p", [str(removed), str(modified)]
+        )
+        paths = {r.file_path for r in db_session.query(FileIndexStatus).filter_by(project_id="p")}
+        assert str(removed) not in paths
+        assert len(paths) == 24
+
+    def test_touched_file_is_hashed_once(self, project_dir, db_session):
+        """Test a touched-but-identical file is unchanged and gets its stat refreshed."""
+        tracker = FileIndexTracker(db_session)
+        path = str(project_dir / "module_0.py")
+        tracker.update_file_status("p", path, "indexed", chunks_count=1)
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10_000_000))
+
+        changes = tracker.detect_changes("p", [path])
+        assert changes.unchanged == [path]
+
+        with patch.object(tracker, "_calculate_file_hash") as calc:
+            assert tracker.detect_changes("p", [path]).unchanged == [path]
+        calc.assert_not_called()
+
+    def test_edit_after_parse_is_detected(self, project_dir, db_session):
+        """Test the tracker stores the parse-time stat, so a later edit is not missed."""
+        tracker = FileIndexTracker(db_session)
+        path = project_dir / "module_0.py"
+        result = ingestion_router.parser.parse_file(str(path))
+        path.write_text(path.read_text() + "# edited before the row was written\n")
+
+        tracker.upsert_file_statuses("p", ingestion_router.file_status_entries([(*result, [])]))
+
+        assert tracker.detect_changes("p", [str(path)]).changed == [str(path)]
+
+
+class TestSaveCoalescing:
+    """Tests for debounced batch ingestion of saved files."""
+
+    @pytest.mark.asyncio
+    async def test_save_storm_becomes_one_batch(self):
+        """Test repeated saves within the window flush once with the latest content."""
+        flushed = []
+
+        async def flush(project_id, files):
+            flushed.append(dict(files))
+            return {path: {"content": content} for path, content in files.items()}
+
+        coalescer = SaveCoalescer(flush, debounce=0.05, max_delay=5)
+        results = await asyncio.gather(
+            coalescer.submit("p", {"a.py": "v1"}),
+            coalescer.submit("p", {"a.py": "v2", "b.py": "b"}),
+            coalescer.submit("p", {"a.py": "v3"}),
+        )
+
+        assert flushed == [{"a.py": "v3", "b.py": "b"}]
+        assert results[0] == {"a.py": {"content": "v3"}}
+        assert results[1] == {"a.py": {"content": "v3"}, "b.py": {"content": "b"}}
+
+    @pytest.mark.asyncio
+    async def test_max_delay_bounds_a_continuous_storm(self):
+        """Test saves arriving faster than the debounce still flush after max_delay."""
+        flushed = []
+
+        async def flush(project_id, files):
+            flushed.append(sorted(files))
+            return {path: None for path in files}
+
+        coalescer = SaveCoalescer(flush, debounce=0.05, max_delay=0.1)
+        waiters = []
+        for i in range(8):
+            waiters.append(asyncio.ensure_future(coalescer.submit("p", {f"f{i}.py": ""})))
+            await asyncio.sleep(0.03)
+        await asyncio.gather(*waiters)
+
+        assert len(flushed) > 1
+        assert sum(len(files) for files in flushed) == 8
+
+    @pytest.mark.asyncio
+    async def test_failed_embed_keeps_stored_chunks(self, mock_vector_store):
+        """Test a save whose embedding fails leaves the file's previous chunks in place."""
+        mock_vector_store.embed_snippets.side_effect = RuntimeError("model not ready")
+
+        with pytest.raises(RuntimeError):
+            await ingestion_router.ingest_saved_files("p", {"a.py": "def a():\n    pass\n"})
+
+        mock_vector_store.replace_file_chunks.assert_not_awaited()
+        mock_vector_store.delete_file_chunks.assert_not_awaited()
+
+    def test_ndjson_endpoint_ingests_distinct_files_once(self, tmp_path, mock_vector_store):
+        """Test a batch request parses, embeds and tracks each distinct file once."""
+        engine = create_engine(
+            f"sqlite:///{tmp_path / 'files.db'}", connect_args={"check_same_thread": False}
+        )
+        Base.metadata.create_all(bind=engine, tables=[FileIndexStatus.__table__])
+        app = FastAPI()
+        app.include_router(ingestion_router.router)
+        lines = [
+            {"file_path": "src/a.py", "content": "def a():\n    return 0\n"},
+            {"file_path": "src/b.py", "content": "def b():\n    return 1\n"},
+            {"file_path": "src/a.py", "content": "def a():\n    return 2\n"},
+        ]
+        body = "\n".join(json.dumps(line) for line in lines)
+
+        with patch.object(ingestion_router, "SessionLocal", sessionmaker(bind=engine)):
+            response = TestClient(app).post("/ingestion/files?project_id=p", content=body)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["received"] == 3 and data["files"] == 2
+        assert data["results"]["src/a.py"]["status"] == "success"
+        mock_vector_store.embed_snippets.assert_awaited_once()
+        # Ahead of bulk ingestion slices waiting for the embedding worker
+        assert mock_vector_store.embed_snippets.await_args.kwargs["priority"] == (
+            EmbedPriority.INTERACTIVE
+        )
+        codes = [s["code"] for s in mock_vector_store.embed_snippets.await_args.args[1]]
+        assert any("return 2" in code for code in codes)
+        assert not any("return 0" in code for code in codes)
+        rows = sessionmaker(bind=engine)().query(FileIndexStatus).all()
+        assert sorted(r.file_path for r in rows) == ["src/a.py", "src/b.py"]
+
+    def test_ndjson_endpoint_rejects_bad_lines(self):
+        """Test malformed lines are reported with their line number."""
+        app = FastAPI()
+        app.include_router(ingestion_router.router)
+
+        response = TestClient(app).post("/ingestion/files?project_id=p", content='{"x": 1}')
+
+        assert response.status_code == 400
+        assert "Line 1" in response.json()["detail"]
+
+
+class TestResumeAndReconcile:
+    """Tests for resuming interrupted jobs and repairing index mismatches."""
+
+    @pytest.mark.asyncio
+    async def test_resume_skips_files_stored_by_earlier_attempt(
+        self, project_dir, db_session, mock_vector_store
+    ):
+        """Test a resumed full ingest only processes files not yet committed."""
+        started = datetime.utcnow() - timedelta(minutes=1)
+        tracker = FileIndexTracker(db_session)
+        done = [str(project_dir / f"module_{i}.py") for i in range(5)]
+        tracker.upsert_file_statuses("p", [{"file_path": p, "status": "indexed"} for p in done])
+
+        job = IngestionJob(id="job-resume", project_id="p", project_path=str(project_dir))
+        ingestion_router.ingestion_jobs[job.id] = job
+        await ingestion_router.ingest_project_background(
+            job.id, str(project_dir), "p", max_workers=1, db=db_session, resume_since=started
+        )
+
+        assert job.status == IngestionStatus.COMPLETED
+        assert job.resumed_files == 5
+        assert job.total_files == job.processed_files == 20
+        written = {
+            s["file_path"]
+            for call in mock_vector_store.embed_snippets.await_args_list
+            for s in call.args[1]
+        }
+        assert written.isdisjoint(done)
+
+    @pytest.mark.asyncio
+    async def test_reconcile_repairs_orphans_and_mismatches(self, db_session):
+        """Test orphaned chunks are dropped and mismatched files marked for re-ingest."""
+        tracker = FileIndexTracker(db_session)
+        tracker.upsert_file_statuses(
+            "p",
+            [
+                {"file_path": "ok.py", "status": "indexed", "chunks_count": 2, "file_hash": "h"},
+                {"file_path": "short.py", "status": "indexed", "chunks_count": 3, "file_hash": "h"},
+                {"file_path": "lost.py", "status": "indexed", "chunks_count": 1, "file_hash": "h"},
+            ],
+        )
+        store = Mock()
+        store.count_chunks_by_file = AsyncMock(
+            return_value={"ok.py": 2, "short.py": 1, "orphan.py": 4}
+        )
+        store.delete_file_chunks = AsyncMock()
+        store.sync_lexical_index = AsyncMock(return_value=False)
+
+        report = await reconcile_project("p", store, tracker)
+
+        assert report.orphaned_files == ["orphan.py"]
+        assert report.mismatched_files == ["lost.py", "short.py"]
+        store.delete_file_chunks.assert_awaited_once_with("p", ["orphan.py", "short.py"])
+        store.sync_lexical_index.assert_awaited_once_with("p", 2)  # ok.py only
+        statuses = {r.file_path: r.status for r in db_session.query(FileIndexStatus)}
+        assert statuses == {"ok.py": "indexed", "short.py": "pending", "lost.py": "pending"}
+        assert tracker.detect_changes("p", ["ok.py", "short.py", "lost.py"]).changed == [
+            "short.py",
+            "lost.py",
+        ]
+
+
+class TestGitIngestion:
+    """Tests for git-aware incremental ingestion."""
+
+    @pytest.fixture
+    def repo(self, project_dir):
+        git(project_dir, "init", "-q")
+        git(project_dir, "add", ".")
+        git(project_dir, "commit", "-q", "-m", "initial")
+        return project_dir
+
+    @pytest.mark.asyncio
+    async def test_second_run_ingests_only_the_diff(self, repo, db_session, mock_vector_store):
+        """Test commits, deletions and untracked files are found without walking the tree."""
+        first = await run_ingest(repo, db_session, use_git=True)
+        assert first.total_files == 25
+        assert db_session.get(ProjectGitState, "p").commit_sha
+
+        (repo / "module_1.py").write_text("def changed():\n    return 'new'\n")
+        (repo / "module_2.py").unlink()
+        git(repo, "commit", "-q", "-am", "edit")
+        (repo / "scratch.py").write_text("def scratch():\n    pass\n")
+        (repo / "notes.log").write_text("not source\n")
+
+        with patch.object(ingestion_router.parser, "iter_project_files") as walk:
+            job = await run_ingest(repo, db_session, use_git=True)
+        walk.assert_not_called()
+
+        assert job.status == IngestionStatus.COMPLETED
+        assert job.total_files == 2
+        assert job.removed_files == 1
+        paths = {r.file_path for r in db_session.query(FileIndexStatus)}
+        assert str(repo / "scratch.py") in paths
+        assert str(repo / "module_2.py") not in paths
+
+    @pytest.mark.asyncio
+    async def test_reverted_edit_is_reingested(self, repo, db_session, mock_vector_store):
+        """Test a file dirty at the last ingest is re-checked after it is reverted."""
+        await run_ingest(repo, db_session, use_git=True)
+        (repo / "module_3.py").write_text("def dirty():\n    return 3\n")
+        assert (await run_ingest(repo, db_session, use_git=True)).total_files == 1
+
+        git(repo, "checkout", "--", "module_3.py")
+        job = await run_ingest(repo, db_session, use_git=True)
+
+        assert job.total_files == 1
+        assert mock_vector_store.embed_snippets.await_args.args[1][0]["code"].startswith(
+            "def func_3"
+        )
+
+    @pytest.mark.asyncio
+    async def test_non_git_project_falls_back_to_walk(
+        self, project_dir, db_session, mock_vector_store
+    ):
+        """Test use_git on a plain directory behaves like an incremental ingest."""
+        await run_ingest(project_dir, db_session, use_git=True)
+        job = await run_ingest(project_dir, db_session, use_git=True)
+
+        assert job.total_files == 0
+        assert job.skipped_files == 25
+        assert db_session.get(ProjectGitState, "p") is None
+
+
+class TestFileIndexUpsert:
+    """Tests for batched file status upserts."""
+
+    def test_upsert_inserts_and_updates_in_one_commit(self, project_dir, db_session):
+        """Test a batch inserts new rows, updates existing ones and commits once."""
+        tracker = FileIndexTracker(db_session)
+        paths = [str(project_dir / f"module_{i}.py") for i in range(3)]
+        tracker.update_file_status("p", paths[0], "indexed", chunks_count=1)
+        indexed_at = (
+            db_session.query(FileIndexStatus).filter_by(file_path=paths[0]).one().indexed_at
+        )
+
+        entries = [{"file_path": p, "status": "indexed", "chunks_count": 2} for p in paths[1:]]
+        entries.append({"file_path": paths[0], "status": "error", "error_message": "boom"})
+        with patch.object(db_session, "commit", wraps=db_session.commit) as commit:
+            tracker.upsert_file_statuses("p", entries)
+        commit.assert_called_once()
+
+        rows = {r.file_path: r for r in db_session.query(FileIndexStatus).filter_by(project_id="p")}
+        assert len(rows) == 3
+        assert rows[paths[0]].status == "error"
+        assert rows[paths[0]].indexed_at == indexed_at  # Kept from the last good index
+        assert rows[paths[1]].chunks_count == 2
+        assert rows[paths[1]].file_size == os.path.getsize(paths[1])
+
+    def test_parser_hash_is_reused(self, tmp_path, db_session):
+        """Test the parser's raw-bytes hash is stored without re-reading the file."""
+        path = tmp_path / "crlf.py"
+        path.write_bytes(b"def f():\r\n    return 1\r\n")
+        metadata, _ = ingestion_router.parser.parse_file(str(path))
+        tracker = FileIndexTracker(db_session)
+
+        with patch.object(tracker, "_calculate_file_hash") as calc:
+            tracker.upsert_file_statuses(
+                "p",
+                [{"file_path": str(path), "status": "indexed", "file_hash": metadata.file_hash}],
+            )
+        calc.assert_not_called()
+
+        # Same hash detect_changes computes from disk, despite the CRLF line endings
+        assert metadata.file_hash == tracker._calculate_file_hash(str(path))
+        assert tracker.detect_changes("p", [str(path)]).unchanged == [str(path)]
+
+    def test_large_and_binary_files_carry_parser_hash(self, tmp_path, db_session):
+        """Test streamed large files and skipped binaries also hand their hash to the tracker."""
+        large = tmp_path / "dump.sql"
+        large.write_text("".join(f"INSERT INTO t VALUES ({i});\n" for i in range(500)))
+        binary = tmp_path / "blob.py"
+        binary.write_bytes(b"\x00\x01" * 100)
+        with patch.object(CodeParser, "LARGE_FILE_SIZE", 1024):
+            results = [ingestion_router.parser._scan_file(str(p)) for p in (large, binary)]
+        tracker = FileIndexTracker(db_session)
+
+        entries = ingestion_router.file_status_entries(results)
+        with patch.object(tracker, "_calculate_file_hash") as calc:
+            tracker.upsert_file_statuses("p", entries)
+        calc.assert_not_called()
+
+        for entry in entries:
+            assert entry["file_hash"] == tracker._calculate_file_hash(entry["file_path"])
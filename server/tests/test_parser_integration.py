@@ -0,0 +1,518 @@
+"""
+Integration tests for the ingestion CodeParser.
+Covers tree-sitter structural extraction and chunk boundaries.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+from server.ingestion.parse_cache import ParseCache
+from server.ingestion.parser import CodeParser, ParsedSource, ParserMode
+from server.ingestion.regex_scanner import SCANNERS, RegexScanner, register_scanner
+from server.ingestion.token_budget import TokenBudget
+from server.shared.project_walker import ProjectWalker
+
+PYTHON_SOURCE = """import os
+from .utils import helper
+
+
+@decorator
+def outer():
+    def inner():
+        pass
+    return inner
+
+
+class Service(Base):
+    name = "svc"
+
+    def start(self):
+        return True
+
+    def stop(self):
+        return False
+"""
+
+
+@pytest.fixture
+def parser():
+    return CodeParser()
+
+
+requires_tree_sitter = pytest.mark.skipif(
+    not CodeParser().capabilities.tree_sitter_available, reason="tree-sitter not installed"
+)
+
+
+@requires_tree_sitter
+class TestTreeSitterExtraction:
+    """Tests for query-based tree-sitter extraction."""
+
+    def test_python_exact_boundaries(self, parser):
+        """Test functions and classes get real end lines, decorators included."""
+        metadata, _ = parser.parse_file("service.py", PYTHON_SOURCE)
+
+        assert metadata.parser_mode_used == ParserMode.TREE_SITTER
+        functions = {f["name"]: f for f in metadata.functions}
+        assert functions["outer"]["start_line"] == 4  # the decorator line
+        assert functions["outer"]["end_line"] == 8
+        assert functions["stop"]["end_line"] == 18
+        assert metadata.classes[0]["name"] == "Service"
+        assert metadata.classes[0]["end_line"] == 18
+        assert sorted(metadata.imports) == [".utils", "os"]
+
+    def test_python_chunks_do_not_overlap(self, parser):
+        """Test nested definitions are chunked once and chunks never overlap."""
+        _, chunks = parser.parse_file("service.py", PYTHON_SOURCE)
+
+        names = [c.metadata.get("element_name") for c in chunks]
+        assert names == [None, "outer", "Service", "start", "stop"]
+        for prev, nxt in zip(chunks, chunks[1:]):
+            assert prev.end_line <= nxt.start_line
+        assert chunks[0].content == "import os\nfrom .utils import helper"
+        assert chunks[1].content.startswith("@decorator")
+        assert "return inner" in chunks[1].content
+
+    def test_every_line_is_chunked(self, parser):
+        """Test module-level code and class bodies between members are chunked too."""
+        python = (
+            "import sys\nLIMIT = 10\n\n\nclass Config:\n    debug = False\n\n"
+            "    def load(self):\n        return 1\n\n    timeout = 30\n    retries = 3\n\n"
+            "    def save(self):\n        return 2\n\n    verbose = True\n\n\n"
+            "def main():\n    pass\n\n\nif __name__ == '__main__':\n    main()\n"
+        )
+        javascript = (
+            "import fs from 'fs';\nconst LIMIT = 10;\n\nclass Store {\n  size = 0;\n"
+            "  get() {\n    return 1;\n  }\n  count = 2;\n}\n\nfunction run() {\n"
+            "  return new Store();\n}\n\nrun();\nmodule.exports = { run };\n"
+        )
+        for file_path, content in (("config.py", python), ("store.js", javascript)):
+            _, chunks = parser.parse_file(file_path, content)
+            chunked = set()
+            for chunk in chunks:
+                chunked.update(line.strip() for line in chunk.content.split("\n"))
+            missing = [
+                line for line in content.split("\n") if line.strip() and line.strip() not in chunked
+            ]
+            assert missing == [], file_path
+
+    def test_small_gaps_join_the_definition_before(self, parser):
+        """Test a closing brace or a lone attribute is not chunked on its own."""
+        javascript = (
+            "import fs from 'fs';\n\nclass Store {\n  get() {\n    return 1;\n  }\n"
+            "  count = 2;\n}\n\nfunction run() {\n  return 1;\n}\n"
+        )
+        _, chunks = parser.parse_file("store.js", javascript)
+
+        assert [c.metadata.get("element_name") for c in chunks] == [None, "Store", "get", "run"]
+        assert chunks[0].content == "import fs from 'fs';"
+        assert chunks[2].content.endswith("  count = 2;\n}")
+
+    def test_javascript_and_java(self, parser):
+        """Test extraction for the other tree-sitter languages."""
+        js = "import x from 'lib';\nconst add = (a, b) => {\n  return a + b;\n};\n"
+        metadata, _ = parser.parse_file("math.js", js)
+        assert metadata.functions[0]["name"] == "add"
+        assert metadata.functions[0]["end_line"] == 3
+        assert metadata.imports == ["lib"]
+
+        java = (
+            "import java.util.List;\npublic class A {\n  public int m() {\n    return 1;\n  }\n}\n"
+        )
+        metadata, _ = parser.parse_file("A.java", java)
+        assert metadata.classes[0]["end_line"] == 5
+        assert metadata.functions[0]["name"] == "m"
+        assert metadata.imports == ["java.util.List"]
+
+    def test_file_without_definitions_falls_back_to_lines(self, parser):
+        """Test that a file with no definitions still produces chunks."""
+        _, chunks = parser.parse_file("settings.py", "DEBUG = True\nPORT = 8000\n")
+        assert len(chunks) == 1
+        assert chunks[0].parser_mode == ParserMode.TREE_SITTER
+
+    def test_parsers_are_per_thread(self, parser):
+        """Test that worker threads never share a tree-sitter parser."""
+
+        def parse(_):
+            parser.parse_file("service.py", PYTHON_SOURCE)
+            return parser._local.treesitter["python"][0]
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(parse, range(16)))
+
+        main_thread_parser = parser._get_treesitter_parser("python", "x.py")[0]
+        assert all(p is not main_thread_parser for p in results)
+        assert len({id(p) for p in results}) <= 4
+
+
+class TestRegexFallback:
+    """Tests for the regex parsing path."""
+
+    def test_regex_mode_keeps_estimated_windows(self, parser):
+        """Test regex extraction still chunks without exact end lines."""
+        source = ParsedSource(PYTHON_SOURCE)
+        metadata, chunks = parser._parse_with_regex("service.py", source, "python")
+
+        assert metadata.parser_mode_used == ParserMode.REGEX
+        assert all(f["end_line"] is None for f in metadata.functions)
+        elements = [c for c in chunks if "element_name" in c.metadata]
+        assert len(elements) == len(metadata.functions) + len(metadata.classes)
+
+    def test_single_pass_finds_all_constructs(self, parser):
+        """Test functions, classes and split imports come from one scan."""
+        source = ParsedSource("import os, sys as system\nfrom .x import y\n" + PYTHON_SOURCE)
+        functions, classes, imports = parser._extract_with_regex(source, "python")
+
+        assert [f["name"] for f in functions] == ["outer", "inner", "start", "stop"]
+        assert [c["name"] for c in classes] == ["Service"]
+        assert sorted(imports) == [".utils", ".x", "os", "sys"]
+
+    def test_go_rust_csharp_structure(self, parser):
+        """Test the languages without tree-sitter queries get structure from regex."""
+        go = 'import (\n\t"fmt"\n)\n\ntype Server struct {\n}\n\nfunc (s *Server) Start() {\n}\n'
+        rust = "use std::io;\n\npub struct Config {\n}\n\npub async fn load() {}\n"
+        csharp = "using System;\npublic class Service {\n    public void Run() {}\n}\n"
+
+        for name, text, function, cls, module in [
+            ("main.go", go, "Start", "Server", "fmt"),
+            ("lib.rs", rust, "load", "Config", "std::io"),
+            ("Service.cs", csharp, "Run", "Service", "System"),
+        ]:
+            metadata, chunks = parser.parse_file(name, text)
+            assert metadata.parser_mode_used == ParserMode.REGEX
+            assert [f["name"] for f in metadata.functions] == [function]
+            assert [c["name"] for c in metadata.classes] == [cls]
+            assert metadata.imports == [module]
+            elements = [c for c in chunks if "element_type" in c.metadata]
+            assert elements[0].metadata["element_type"] == "class"
+
+    def test_registered_scanner_routes_language_to_regex(self, parser):
+        """Test registering a scanner gives a new language structure extraction."""
+        scanner = RegexScanner(
+            [("function", r"def\s+(?P<name>\w+)"), ("class", r"class\s+(?P<name>\w+)")]
+        )
+        with patch.dict(SCANNERS):
+            register_scanner("ruby", scanner)
+            metadata, _ = parser.parse_file("app.rb", "class App\n  def run\n  end\nend\n")
+
+        assert parser.capabilities.get_recommended_mode("ruby") == ParserMode.LINES
+        assert metadata.parser_mode_used == ParserMode.REGEX
+        assert [f["name"] for f in metadata.functions] == ["run"]
+
+
+class TestParsedSource:
+    """Tests for the shared per-file source buffer."""
+
+    def test_line_of_matches_newline_count(self):
+        """Test bisect lookup agrees with counting newlines before the offset."""
+        text = "a\n\nbc\ndef f():\n    pass\n"
+        source = ParsedSource(text)
+
+        for offset in range(len(text)):
+            assert source.line_of(offset) == text[:offset].count("\n")
+
+    def test_views_and_hash(self):
+        """Test the lines view, total lines and content hash."""
+        import hashlib
+
+        source = ParsedSource("x = 1\ny = 2")
+        assert source.lines == ["x = 1", "y = 2"]
+        assert source.total_lines == 2
+        assert source.join_lines(1, 2) == "y = 2"
+        assert source.content_hash == hashlib.md5(b"x = 1\ny = 2").hexdigest()
+
+
+class TestLargeFiles:
+    """Tests for streamed large-file chunking and binary detection."""
+
+    def test_large_file_streams_same_chunks(self, parser, tmp_path):
+        """Test large files get the same line chunks, hash and line count as in-memory parsing."""
+        content = "".join(f"INSERT INTO t VALUES ({i});\n" for i in range(3000))
+        path = tmp_path / "dump.txt"
+        path.write_text(content)
+
+        with patch.object(CodeParser, "LARGE_FILE_SIZE", 1024):
+            metadata, chunks = parser.parse_file(str(path))
+        expected_meta, expected_chunks = parser._parse_with_lines(
+            str(path), ParsedSource(content), "text"
+        )
+        expected_meta.file_hash = expected_meta.hash
+        expected_meta.file_stat = (path.stat().st_mtime_ns, path.stat().st_size)
+
+        assert metadata == expected_meta
+        assert chunks == expected_chunks
+
+    def test_large_file_is_yielded_in_parts(self, parser, tmp_path):
+        """Test streamed large files yield their chunks in parts, finished metadata last."""
+        content = "".join(f"INSERT INTO t VALUES ({i});\n" for i in range(3000))
+        path = tmp_path / "dump.txt"
+        path.write_text(content)
+
+        with patch.object(CodeParser, "LARGE_FILE_SIZE", 1024):
+            expected_meta, expected_chunks = parser.parse_file(str(path))
+            with patch.object(CodeParser, "LARGE_FILE_PART_CHUNKS", 20):
+                parts = list(parser.iter_parse_files([str(path)], stream_large_files=True))
+
+        assert len(parts) == 4
+        assert all(meta.partial for meta, _, _ in parts[:-1])
+        assert [chunk for _, chunks, _ in parts for chunk in chunks] == expected_chunks
+        metadata = parts[-1][0]
+        assert not metadata.partial
+        assert metadata.hash == expected_meta.hash
+        assert metadata.total_lines == expected_meta.total_lines
+        assert metadata.chunks_count == len(expected_chunks)
+
+    def test_binary_content_is_skipped(self, parser, tmp_path):
+        """Test NUL bytes in the first block mark the file as binary."""
+        path = tmp_path / "blob.py"
+        path.write_bytes(b"\x00\x01\x02" * 100)
+
+        metadata, chunks = parser.parse_file(str(path))
+
+        assert chunks == []
+        assert metadata.error_messages == ["Binary content skipped"]
+
+    def test_line_windows_overlap(self, parser):
+        """Test line windows step by chunk size minus overlap."""
+        lines = [f"line {i}" for i in range(120)]
+        chunks = list(parser.iter_line_chunks("f.txt", lines, "text", ParserMode.LINES))
+
+        assert [(c.start_line, c.end_line) for c in chunks] == [(0, 50), (40, 90), (80, 120)]
+
+
+class TestTokenBudget:
+    """Tests for token-budget-aware chunking."""
+
+    @pytest.fixture
+    def budget(self):
+        # Heuristic counts: "x = 1" is 3 tokens
+        return TokenBudget(max_tokens=32)
+
+    def test_line_windows_fill_budget(self, budget):
+        """Test token windows stay within budget, overlap and cover every line."""
+        parser = CodeParser(token_budget=budget)
+        lines = [f"x = {i}" for i in range(40)]
+        chunks = list(parser.iter_line_chunks("f.txt", lines, "text", ParserMode.LINES))
+
+        assert all(
+            sum(budget.count_lines(c.content.split("\n"))) <= budget.content_tokens for c in chunks
+        )
+        assert chunks[0].start_line == 0 and chunks[-1].end_line == 40
+        for prev, nxt in zip(chunks, chunks[1:]):
+            assert prev.start_line < nxt.start_line < prev.end_line
+
+    def test_oversized_definition_is_split(self, budget):
+        """Test a function over the budget becomes several windows of that function."""
+        body = "".join(f"    value_{i} = {i}\n" for i in range(30))
+        _, chunks = CodeParser(token_budget=budget).parse_file("big.py", f"def big():\n{body}")
+
+        assert len(chunks) > 1
+        assert all(c.metadata["element_name"] == "big" for c in chunks)
+        assert chunks[-1].end_line == 31
+
+    @requires_tree_sitter
+    def test_small_definitions_are_packed(self):
+        """Test neighbouring definitions share a chunk when they fit the budget."""
+        parser = CodeParser(token_budget=TokenBudget(max_tokens=256))
+        _, chunks = parser.parse_file("service.py", PYTHON_SOURCE)
+
+        assert len(chunks) == 1
+        assert chunks[0].metadata["element_name"] == "outer, Service, start, stop"
+        assert chunks[0].metadata["element_type"] == "group"
+
+    def test_line_counts_are_cached(self, budget):
+        """Test each distinct line is tokenized once."""
+        with patch.object(budget, "_count_uncached", wraps=budget._count_uncached) as count:
+            budget.count_lines(["a = 1", "b = 2", "a = 1"])
+            budget.count_line("b = 2")
+        count.assert_called_once()
+        assert sorted(count.call_args[0][0]) == ["a = 1", "b = 2"]
+
+    def test_budget_changes_cache_key(self, tmp_path, budget):
+        """Test results cached under one budget are not reused under another."""
+        cache = ParseCache(str(tmp_path / "parse_cache.sqlite3"), max_bytes=1024 * 1024)
+        CodeParser(cache=cache, token_budget=budget).parse_file("service.py", PYTHON_SOURCE)
+
+        with patch.object(cache, "put") as put:
+            CodeParser(cache=cache).parse_file("service.py", PYTHON_SOURCE)
+        put.assert_called_once()
+
+
+class TestProjectScan:
+    """Tests for serial and process-pool project scans."""
+
+    @pytest.fixture
+    def project_dir(self, tmp_path):
+        for i in range(12):
+            (tmp_path / f"module_{i}.py").write_text(f"def func_{i}():\n    return {i}\n")
+        (tmp_path / "node_modules").mkdir()
+        (tmp_path / "node_modules" / "dep.js").write_text("function dep() {}\n")
+        return tmp_path
+
+    def test_parallel_scan_matches_serial(self, parser, project_dir):
+        """Test the process-pool scan parses the same files as the serial scan."""
+        serial = parser.scan_project(str(project_dir))
+        parallel = parser.scan_project(str(project_dir), max_workers=2)
+
+        assert len(serial) == 12
+        assert sorted(m.file_path for m, _, _ in parallel) == sorted(
+            m.file_path for m, _, _ in serial
+        )
+        assert all(not errors for _, _, errors in parallel)
+
+    def test_parallel_scan_reports_vanished_file(self, parser, project_dir):
+        """Test a file deleted after listing fails alone instead of the whole scan."""
+        paths = list(parser.iter_project_files(str(project_dir)))
+        missing = str(project_dir / "deleted.py")
+
+        results = list(parser.iter_parse_files(paths + [missing], max_workers=2))
+
+        failed = [errors for metadata, _, errors in results if metadata is None]
+        assert len(results) == 13
+        assert len(failed) == 1 and "deleted.py" in failed[0][0]
+
+    def test_parallel_scan_bounds_batches_in_flight(self, parser, project_dir):
+        """Test only a few batches are submitted ahead and closing stops submitting."""
+        files = [(str(path), path.stat().st_size) for path in project_dir.glob("*.py")]
+        submit = ProcessPoolExecutor.submit
+        with patch.object(CodeParser, "MIN_SCAN_BATCH_BYTES", 1):
+            assert len(parser._batch_by_size(files, max_workers=1)) == 4
+            with patch.object(
+                ProcessPoolExecutor, "submit", autospec=True, side_effect=submit
+            ) as submitted:
+                results = parser._scan_files_parallel(files, max_workers=1)
+                next(results)
+                results.close()
+
+        assert submitted.call_count == 2
+
+    def test_batches_balance_by_size(self, parser):
+        """Test batching targets equal bytes and schedules large files first."""
+        files = [("big.py", 4_000_000)] + [(f"f{i}.py", 1000) for i in range(300)]
+        batches = parser._batch_by_size(files, max_workers=2)
+
+        assert batches[0] == ["big.py"]
+        assert sum(len(b) for b in batches) == 301
+        assert all(len(b) <= parser.MAX_SCAN_BATCH_FILES for b in batches)
+
+
+class TestProjectWalker:
+    """Tests for the shared ignore-aware project walker."""
+
+    @pytest.fixture
+    def tree(self, tmp_path):
+        files = [
+            "src/app.py",
+            "src/rebuild_utils.py",
+            "src/generated/out.py",
+            "src/keep.log.py",
+            "lib/build/artifact.py",
+            "node_modules/pkg/index.js",
+            ".git/hooks/pre-commit.py",
+            "docs/readme.md",
+            "docs/image.png",
+            "debug.log",
+        ]
+        for rel in files:
+            path = tmp_path / rel
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text("x = 1\n")
+        (tmp_path / ".gitignore").write_text("# comment\n*.log.py\n/src/generated/\n")
+        (tmp_path / "src" / ".aideignore").write_text("app.py\n")
+        return tmp_path
+
+    def walk(self, root, **kwargs):
+        walker = ProjectWalker(extensions=CodeParser.SUPPORTED_EXTENSIONS, **kwargs)
+        return sorted(
+            os.path.relpath(e.path, root).replace(os.sep, "/") for e in walker.walk(str(root))
+        )
+
+    def test_prunes_and_honors_ignore_files(self, tree):
+        """Test skip dirs are matched by name and ignore files apply per directory."""
+        assert self.walk(tree) == ["docs/readme.md", "src/rebuild_utils.py"]
+
+    def test_negation_and_size_limit(self, tree):
+        """Test ! re-includes files and oversized files are skipped."""
+        (tree / "src" / ".aideignore").write_text("*.py\n!rebuild_utils.py\n")
+        (tree / "docs" / "big.md").write_text("x" * 2000)
+
+        assert self.walk(tree, max_file_size=1000) == ["docs/readme.md", "src/rebuild_utils.py"]
+
+    def test_filter_paths_agrees_with_walk(self, tree):
+        """Test known paths are filtered by the same rules walk() applies."""
+        walker = ProjectWalker(extensions=CodeParser.SUPPORTED_EXTENSIONS)
+        everything = [
+            os.path.relpath(os.path.join(d, f), tree).replace(os.sep, "/")
+            for d, _, files in os.walk(tree)
+            for f in files
+        ] + ["src/deleted.py"]
+
+        filtered = sorted(
+            os.path.relpath(e.path, tree).replace(os.sep, "/")
+            for e in walker.filter_paths(str(tree), everything)
+        )
+        assert filtered == self.walk(tree)
+
+    def test_should_parse_file_matches_dir_names_not_substrings(self, parser, tree):
+        """Test "build" in a file name no longer excludes it."""
+        assert parser.should_parse_file(str(tree / "src" / "rebuild_utils.py"))
+        assert not parser.should_parse_file(str(tree / "lib" / "build" / "artifact.py"))
+
+
+class TestParseCache:
+    """Tests for the persistent parse cache."""
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        return ParseCache(str(tmp_path / "parse_cache.sqlite3"), max_bytes=1024 * 1024)
+
+    def test_hit_skips_extraction(self, cache):
+        """Test a second parse of the same content is served from the cache."""
+        metadata, chunks = CodeParser(cache=cache).parse_file("service.py", PYTHON_SOURCE)
+
+        parser = CodeParser(cache=cache)
+        with patch.object(parser, "_parse_with_treesitter", side_effect=AssertionError):
+            with patch.object(parser, "_parse_with_regex", side_effect=AssertionError):
+                cached_meta, cached_chunks = parser.parse_file("service.py", PYTHON_SOURCE)
+
+        assert cached_meta == metadata
+        assert cached_chunks == chunks
+
+    def test_hit_for_other_path_rebuilds_path_fields(self, cache):
+        """Test identical content at another path gets that path's ids and metadata."""
+        parser = CodeParser(cache=cache)
+        parser.parse_file("a/service.py", PYTHON_SOURCE)
+        expected_meta, expected_chunks = CodeParser().parse_file("b/service.py", PYTHON_SOURCE)
+
+        metadata, chunks = parser.parse_file("b/service.py", PYTHON_SOURCE)
+
+        assert metadata == expected_meta
+        assert [c.chunk_id for c in chunks] == [c.chunk_id for c in expected_chunks]
+        assert all(c.metadata["file_path"] == "b/service.py" for c in chunks)
+
+    def test_key_includes_parser_version(self, cache):
+        """Test bumping PARSER_VERSION misses entries written by older parsers."""
+        parser = CodeParser(cache=cache)
+        parser.parse_file("service.py", PYTHON_SOURCE)
+
+        with patch.object(CodeParser, "PARSER_VERSION", CodeParser.PARSER_VERSION + 1):
+            with patch.object(cache, "put") as put:
+                parser.parse_file("service.py", PYTHON_SOURCE)
+        put.assert_called_once()
+
+    def test_lru_eviction(self, tmp_path):
+        """Test least recently used entries are evicted past max_bytes."""
+        cache = ParseCache(str(tmp_path / "small.sqlite3"), max_bytes=4000)
+        cache.EVICT_CHECK_INTERVAL = 1
+
+        cache.put("first", {"data": "x" * 1000})
+        for i in range(5):
+            cache.put(f"key-{i}", {"data": "x" * 1000})
+            cache.get("first")  # Keep "first" hot
+
+        assert cache.get("first") is not None
+        assert cache.get("key-0") is None
+        assert cache.get("key-4") is not None
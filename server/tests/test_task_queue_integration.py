@@ -0,0 +1,232 @@
+"""
+Integration tests for the durable task queue and its worker.
+Uses a temporary SQLite database per test.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from server.ingestion import router as ingestion_router
+from server.models.ingestion import IngestionJob, IngestionStatus
+from server.models.task_queue import QueuedTask
+from server.services.task_queue import TaskFailed, TaskQueue, TaskWorker
+from server.shared.database import Base
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'tasks.db'}", connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine, tables=[QueuedTask.__table__])
+    return sessionmaker(bind=engine, expire_on_commit=False)
+
+
+@pytest.fixture
+def queue(session_factory):
+    return TaskQueue(session_factory, lease_seconds=60, worker_id="worker-a")
+
+
+def expire_lease(session_factory, task_id):
+    db = session_factory()
+    task = db.get(QueuedTask, task_id)
+    task.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    db.close()
+
+
+async def wait_for_status(queue, task_id, statuses, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while asyncio.get_running_loop().time() < deadline:
+        task = queue.get(task_id)
+        if task["status"] in statuses:
+            return task
+        await asyncio.sleep(0.05)
+    raise AssertionError(f"Task {task_id} never reached {statuses}")
+
+
+class TestTaskQueue:
+    """Tests for leasing, completion, errors and eviction."""
+
+    def test_lease_is_exclusive_until_finished(self, queue, session_factory):
+        """Test a leased task is not handed to another worker."""
+        task_id = queue.enqueue("ingest_project", {"project_id": "p"}, project_id="p")
+        other = TaskQueue(session_factory, worker_id="worker-b")
+
+        task = queue.lease(["ingest_project"])
+        assert task["id"] == task_id
+        assert task["payload"] == {"project_id": "p"}
+        assert other.lease(["ingest_project"]) is None
+
+        queue.complete(task_id, {"done": True})
+        finished = queue.get(task_id)
+        assert finished["status"] == "completed"
+        assert finished["progress"] == {"done": True}
+
+    def test_expired_lease_is_retried_then_abandoned(self, queue, session_factory):
+        """Test a dead worker's task moves to another worker, up to MAX_ATTEMPTS."""
+        task_id = queue.enqueue("audit_project", {})
+        other = TaskQueue(session_factory, worker_id="worker-b")
+
+        for attempt in range(1, TaskQueue.MAX_ATTEMPTS + 1):
+            worker = queue if attempt % 2 else other
+            assert worker.lease(["audit_project"])["attempts"] == attempt
+            expire_lease(session_factory, task_id)
+
+        # Only the lease owner (worker-a, attempt 3) may finish the task
+        other.complete(task_id)
+        assert queue.get(task_id)["status"] == "processing"
+        assert other.lease(["audit_project"]) is None
+        task = queue.get(task_id)
+        assert task["status"] == "failed"
+        assert "Abandoned" in task["errors"][0]
+
+    def test_failed_task_requeued_with_progress(self, queue):
+        """Test a failed task can be queued again and keeps its last progress."""
+        task_id = queue.enqueue("ingest_project", {})
+        queue.lease(["ingest_project"])
+        assert not queue.requeue(task_id)  # Still running
+
+        queue.fail(task_id, "crashed", {"processed_files": 7})
+        assert queue.requeue(task_id)
+
+        task = queue.lease(["ingest_project"])
+        assert task["id"] == task_id and task["attempts"] == 1
+        assert task["progress"] == {"processed_files": 7}
+
+    def test_errors_are_a_bounded_ring(self, queue):
+        """Test only the most recent MAX_ERRORS errors are kept."""
+        task_id = queue.enqueue("audit_project", {})
+        queue.lease(["audit_project"])
+
+        with patch.object(TaskQueue, "MAX_ERRORS", 3):
+            queue.fail(task_id, "final")
+            db = queue.session_factory()
+            task = db.get(QueuedTask, task_id)
+            queue._push_errors(task, [f"e{i}" for i in range(5)])
+            db.commit()
+            db.close()
+
+        task = queue.get(task_id)
+        assert task["errors"] == ["e2", "e3", "e4"]
+        assert task["error_count"] == 6
+
+    def test_finished_tasks_evicted_after_ttl(self, queue, session_factory):
+        """Test eviction removes only finished tasks older than the TTL."""
+        old_id = queue.enqueue("audit_project", {})
+        queue.lease(["audit_project"])
+        queue.complete(old_id)
+        pending_id = queue.enqueue("audit_project", {})
+
+        db = session_factory()
+        db.get(QueuedTask, old_id).finished_at = datetime.utcnow() - timedelta(days=30)
+        db.commit()
+        db.close()
+
+        assert queue.evict_finished() == 1
+        assert queue.get(old_id) is None
+        assert queue.get(pending_id)["status"] == "pending"
+
+
+class TestTaskWorker:
+    """Tests for running handlers from the queue."""
+
+    @pytest.mark.asyncio
+    async def test_worker_runs_and_records_results(self, queue):
+        """Test handlers' results and failures are written back to the queue."""
+        worker = TaskWorker(queue, max_concurrent=2)
+        worker.POLL_INTERVAL = 0.05
+
+        async def succeed(task):
+            return {"echo": task["payload"]["value"]}
+
+        async def fail(task):
+            raise TaskFailed("boom", {"partial": 1})
+
+        worker.register("ok", succeed)
+        worker.register("bad", fail)
+        ok_id = queue.enqueue("ok", {"value": 42})
+        bad_id = queue.enqueue("bad", {})
+
+        await worker.start()
+        try:
+            ok = await wait_for_status(queue, ok_id, {"completed", "failed"})
+            bad = await wait_for_status(queue, bad_id, {"completed", "failed"})
+        finally:
+            await worker.stop()
+
+        assert ok["status"] == "completed" and ok["progress"] == {"echo": 42}
+        assert bad["status"] == "failed"
+        assert bad["errors"] == ["boom"] and bad["progress"] == {"partial": 1}
+
+
+class TestQueuedIngestion:
+    """Tests for project ingestion running as a queued task."""
+
+    @pytest.mark.asyncio
+    async def test_ingestion_task_persists_job(self, queue, tmp_path):
+        """Test a queued ingestion's final job state is served from the queue."""
+        (tmp_path / "module.py").write_text("def f():\n    return 1\n")
+        store = Mock()
+        store.embed_snippets = AsyncMock(return_value=[])
+        store.write_embedded_snippets = AsyncMock(return_value=[])
+        payload = {
+            "project_path": str(tmp_path),
+            "project_id": "p",
+            "max_workers": 1,
+            "incremental": False,
+        }
+        task_id = queue.enqueue(ingestion_router.INGEST_TASK, payload, project_id="p")
+        task = queue.lease([ingestion_router.INGEST_TASK])
+
+        with patch.object(ingestion_router, "task_queue", queue), patch.object(
+            ingestion_router, "get_vector_store", return_value=store
+        ), patch.object(ingestion_router, "FileIndexTracker"):
+            result = await ingestion_router.run_ingestion_task(task)
+            queue.complete(task_id, result)
+            job = await ingestion_router.get_job_status(task_id)
+
+        assert task_id not in ingestion_router.ingestion_jobs
+        assert job.status == IngestionStatus.COMPLETED
+        assert job.processed_files == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_progress_save_is_logged(self, queue, tmp_path, caplog):
+        """Test a progress write is awaited and its failure logged, not fatal to the job."""
+        (tmp_path / "module.py").write_text("def f():\n    return 1\n")
+        store = Mock()
+        store.embed_snippets = AsyncMock(return_value=[])
+        store.write_embedded_snippets = AsyncMock(return_value=[])
+        payload = {
+            "project_path": str(tmp_path),
+            "project_id": "p",
+            "max_workers": 1,
+            "incremental": False,
+        }
+        queue.enqueue(ingestion_router.INGEST_TASK, payload, project_id="p")
+        task = queue.lease([ingestion_router.INGEST_TASK])
+
+        with patch.object(ingestion_router, "task_queue", queue), patch.object(
+            ingestion_router, "get_vector_store", return_value=store
+        ), patch.object(ingestion_router, "FileIndexTracker"), patch.object(
+            queue, "save_progress", side_effect=RuntimeError("db locked")
+        ) as save:
+            result = await ingestion_router.run_ingestion_task(task)
+
+        save.assert_called_once()
+        assert result["status"] == IngestionStatus.COMPLETED.value
+        assert "db locked" in caplog.text
+
+    def test_job_errors_are_bounded(self):
+        """Test an ingestion job keeps only its most recent errors."""
+        job = IngestionJob(id="j", project_id="p", project_path="/p")
+        job.add_errors([f"e{i}" for i in range(IngestionJob.MAX_ERRORS + 5)])
+
+        assert len(job.errors) == IngestionJob.MAX_ERRORS
+        assert job.errors[0] == "e5"
+        assert job.error_count == IngestionJob.MAX_ERRORS + 5
@@ -2,14 +2,22 @@
 Integration tests for lazy-loaded VectorStore with fallback embeddings.
 """
 
+import asyncio
 import os
+import sqlite3
 import tempfile
+import threading
 from concurrent.futures import TimeoutError as FuturesTimeoutError
 from unittest.mock import Mock, patch
 
+import numpy as np
 import pytest
 
-from server.shared.vector_store import VectorStore
+from server.shared.embedding_cache import EmbeddingCache
+from server.shared.embedding_worker import EmbeddingWorker, EmbedPriority
+from server.shared.lexical_index import LexicalIndex, query_identifiers
+from server.shared.onnx_embedding import OnnxEmbeddingFunction, mean_pool, parity_report
+from server.shared.vector_store import EmbeddingModelNotReady, VectorStore
 
 
 class TestVectorStoreInitialization:
@@ -109,6 +117,38 @@ class TestVectorStoreOperations:
         assert collection is not None
         assert "test-project" in collection.name
 
+    def test_collection_handles_are_cached(self, store):
+        """Test Chroma is asked for a project's collection once, within the LRU bound."""
+        lookups = Mock(wraps=store.client.get_or_create_collection)
+        with patch.object(store.client, "get_or_create_collection", lookups), patch.object(
+            VectorStore, "COLLECTION_CACHE_SIZE", 2
+        ):
+            first = store._get_project_collection("cache-a")
+            assert store._get_project_collection("cache-a") is first
+            store._get_project_collection("cache-b")
+            store._get_project_collection("cache-a")
+            store._get_project_collection("cache-c")  # Evicts cache-b, the least recent
+            store._get_project_collection("cache-a")
+
+        assert [call.kwargs["name"] for call in lookups.call_args_list] == [
+            "project_cache-a",
+            "project_cache-b",
+            "project_cache-c",
+        ]
+        assert list(store._collections) == ["cache-c", "cache-a"]
+
+    @pytest.mark.asyncio
+    async def test_delete_project_invalidates_handle(self, store):
+        """Test a deleted project's next use gets a new, empty collection."""
+        project_id = f"test-delete-{id(self)}"
+        await store.add_code_snippets(project_id, [{"code": "x = 1", "file_path": "x.py"}])
+
+        await store.delete_project(project_id)
+        await store.delete_project(project_id)  # Already gone
+
+        assert project_id not in store._collections
+        assert store._get_project_collection(project_id).count() == 0
+
     @pytest.mark.asyncio
     async def test_add_code_snippet(self, store):
         """Test adding code snippet to vector store."""
@@ -122,6 +162,75 @@ class TestVectorStoreOperations:
         assert doc_id is not None
         assert isinstance(doc_id, str)
 
+    @pytest.mark.asyncio
+    async def test_add_code_snippets_embeds_once_per_batch(self, store):
+        """Test bulk adds make one embedding call and one write per batch."""
+        project_id = f"test-bulk-{id(self)}"
+        snippets = [
+            {"code": f"def f{i}(): return {i}", "file_path": "bulk.py", "function_name": f"f{i}"}
+            for i in range(5)
+        ]
+        snippets.append(dict(snippets[0]))  # Duplicate content in the same file
+
+        calls = []
+        embed = type(store.embedding_fn).__call__
+
+        def counting_embed(self, input):
+            calls.append(input)
+            return embed(self, input)
+
+        with patch.object(type(store.embedding_fn), "__call__", counting_embed):
+            doc_ids = await store.add_code_snippets(project_id, snippets)
+
+        assert [len(texts) for texts in calls] == [5]
+        assert doc_ids[0] == doc_ids[5]
+        assert store._get_project_collection(project_id).count() == 5
+
+    @pytest.mark.asyncio
+    async def test_saved_files_embed_ahead_of_bulk_slices(self, store):
+        """Test a save made during a bulk ingest is embedded before the queued bulk slices."""
+        calls, started, release = [], threading.Event(), threading.Event()
+
+        def blocking_embed(self, input):
+            calls.append(list(input))
+            started.set()
+            release.wait(5)
+            return [[0.0] * 384 for _ in input]
+
+        store.embedding_worker = EmbeddingWorker(window=0, max_batch=2)
+        bulk = [{"code": f"bulk_{i} = {i}", "file_path": "bulk.py"} for i in range(6)]
+        saved = [{"code": "saved = 1", "file_path": "saved.py"}]
+        with patch.object(type(store.embedding_fn), "__call__", blocking_embed):
+            bulk_task = asyncio.ensure_future(store.embed_snippets("p", bulk))
+            assert await asyncio.to_thread(started.wait, 5)  # First bulk slice running
+            save_task = asyncio.ensure_future(
+                store.embed_snippets("p", saved, priority=EmbedPriority.INTERACTIVE)
+            )
+            while len(store.embedding_worker._queue) < 3:  # Two bulk slices and the save
+                await asyncio.sleep(0.01)
+            release.set()
+            await asyncio.gather(bulk_task, save_task)
+
+        assert calls == [
+            ["bulk_0 = 0", "bulk_1 = 1"],
+            ["saved = 1"],
+            ["bulk_2 = 2", "bulk_3 = 3"],
+            ["bulk_4 = 4", "bulk_5 = 5"],
+        ]
+
+    @pytest.mark.asyncio
+    async def test_count_chunks_by_file(self, store):
+        """Test stored chunks are counted per file, across pages."""
+        project_id = f"test-count-{id(self)}"
+        snippets = [{"code": f"x = {i}", "file_path": f"f{i % 2}.py"} for i in range(5)]
+        await store.add_code_snippets(project_id, snippets)
+        await store.add_code_snippets(project_id, snippets[:1])  # Rewrite upserts
+
+        with patch.object(VectorStore, "SCAN_PAGE_SIZE", 2):
+            counts = await store.count_chunks_by_file(project_id)
+
+        assert counts == {"f0.py": 3, "f1.py": 2}
+
     @pytest.mark.asyncio
     async def test_query_similar_code(self, store):
         """Test querying similar code."""
@@ -152,6 +261,388 @@ class TestVectorStoreOperations:
         assert store._detect_language("test.unknown") == "unknown"
 
 
+class TestEmbeddingCache:
+    """Tests for the content-addressed embedding cache."""
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        return EmbeddingCache(str(tmp_path / "embedding_cache.sqlite3"), max_bytes=1024 * 1024)
+
+    @pytest.fixture
+    def store(self, cache):
+        with patch.dict("os.environ", {"TRANSFORMERS_OFFLINE": "1"}):
+            store = VectorStore()
+        store.embedding_model_id = "test-model"
+        store.embedding_cache = cache
+        return store
+
+    @pytest.mark.asyncio
+    async def test_identical_code_embedded_once_across_projects(self, store):
+        """Test code seen in any project or path is not embedded again."""
+        calls = []
+
+        def counting_embed(self, input):
+            calls.append(list(input))
+            return [[float(len(text)), 1.0] + [0.0] * 382 for text in input]
+
+        snippets = [
+            {"code": "def shared(): return 1", "file_path": "a.py"},
+            {"code": "def shared(): return 1", "file_path": "b.py"},
+            {"code": "def own(): return 2", "file_path": "a.py"},
+        ]
+        vendored = [{"code": "def shared(): return 1", "file_path": "vendor/lib.py"}]
+        with patch.object(type(store.embedding_fn), "__call__", counting_embed):
+            first = await store.embed_snippets(f"cache-a-{id(self)}", snippets)
+            second = await store.embed_snippets(f"cache-b-{id(self)}", vendored)
+
+        assert calls == [["def shared(): return 1", "def own(): return 2"]]
+        assert second.embeddings[0] == first.embeddings[0]
+        assert first.embeddings[0][:2] == [22.0, 1.0]
+
+    def test_cache_is_keyed_by_model(self, cache):
+        """Test vectors from one model are not served for another."""
+        cache.put_many("model-a", ["x = 1"], [[0.5, 0.25]])
+
+        assert cache.get_many("model-a", ["x = 1", "y = 2"]) == [[0.5, 0.25], None]
+        assert cache.get_many("model-b", ["x = 1"]) == [None]
+
+    def test_least_recently_used_entries_evicted(self, tmp_path):
+        """Test the cache stays under its size limit, keeping recently used vectors."""
+        cache = EmbeddingCache(str(tmp_path / "small.sqlite3"), max_bytes=4096)
+        cache.EVICT_CHECK_INTERVAL = 1
+        vector = [0.0] * 64  # 256 bytes + key
+
+        cache.put_many("m", ["keep"], [vector])
+        for i in range(30):
+            cache.get_many("m", ["keep"])
+            cache.put_many("m", [f"text {i}"], [vector])
+
+        assert cache.get_many("m", ["keep"]) == [vector]
+        assert cache.get_many("m", ["text 0"]) == [None]
+        count = cache._connect().execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+        assert count < 31
+
+
+class TestEmbeddingWorker:
+    """Tests for the dedicated, micro-batching embedding thread."""
+
+    @staticmethod
+    def recording_fn(calls, started=None, release=None):
+        def embed(input):
+            calls.append(list(input))
+            if started is not None:
+                started.set()
+                release.wait(5)
+            return [[float(len(text))] for text in input]
+
+        return embed
+
+    def test_concurrent_queries_share_one_model_call(self):
+        """Test queries submitted within the window are embedded together."""
+        calls = []
+        worker = EmbeddingWorker(window=0.05)
+        fn = self.recording_fn(calls)
+
+        futures = [worker.submit(["q" * i], fn, EmbedPriority.QUERY)[0] for i in range(1, 6)]
+
+        assert [f.result(5) for f in futures] == [[[float(i)]] for i in range(1, 6)]
+        assert calls == [["q", "qq", "qqq", "qqqq", "qqqqq"]]
+
+    def test_queries_run_before_queued_ingestion(self):
+        """Test a query overtakes ingestion slices already waiting."""
+        calls, started, release = [], threading.Event(), threading.Event()
+        worker = EmbeddingWorker(window=0, max_batch=2)
+        fn = self.recording_fn(calls, started, release)
+
+        first = worker.submit(["a1", "a2"], fn, EmbedPriority.INGEST)
+        assert started.wait(5)  # Worker is busy with the first slice
+        ingest = worker.submit(["b1", "b2", "b3"], fn, EmbedPriority.INGEST)
+        query = worker.submit(["q"], fn, EmbedPriority.QUERY)
+        release.set()
+
+        for future in first + ingest + query:
+            future.result(5)
+        assert calls == [["a1", "a2"], ["q"], ["b1", "b2"], ["b3"]]
+
+    def test_embed_keeps_order_across_slices(self):
+        """Test texts longer than max_batch come back in input order."""
+        worker = EmbeddingWorker(window=0, max_batch=3)
+        texts = ["x" * i for i in range(1, 9)]
+
+        vectors = worker.embed(texts, self.recording_fn([]), EmbedPriority.INGEST)
+
+        assert vectors == [[float(i)] for i in range(1, 9)]
+
+    def test_model_errors_reach_every_waiter(self):
+        """Test a failed model call fails each request in the batch."""
+
+        def broken(input):
+            raise RuntimeError("model crashed")
+
+        worker = EmbeddingWorker(window=0.05)
+        futures = worker.submit(["a"], broken, EmbedPriority.QUERY)
+        futures += worker.submit(["b"], broken, EmbedPriority.QUERY)
+
+        for future in futures:
+            with pytest.raises(RuntimeError):
+                future.result(5)
+
+
+class TestOnnxEmbedding:
+    """Tests for the ONNX Runtime embedding backend."""
+
+    @pytest.fixture
+    def onnx_fn(self):
+        """An OnnxEmbeddingFunction over a word-level tokenizer and a fake session."""
+        from tokenizers import Tokenizer, models, pre_tokenizers
+
+        tokenizer = Tokenizer(models.WordLevel({"[PAD]": 0, "[UNK]": 1, "a": 2, "b": 3}, "[UNK]"))
+        tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+        tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        def run(outputs, feeds):
+            # Each token's vector is [id, 1]: pooled vectors expose the mask handling
+            ids = feeds["input_ids"].astype(np.float32)[..., None]
+            return [np.concatenate([ids, np.ones_like(ids)], axis=-1)]
+
+        fn = OnnxEmbeddingFunction.__new__(OnnxEmbeddingFunction)
+        fn.tokenizer = tokenizer
+        fn.session = Mock(run=Mock(side_effect=run))
+        fn.input_names = {"input_ids", "attention_mask"}
+        fn.normalize = False
+        return fn
+
+    def test_mean_pool_ignores_padding_and_normalizes(self):
+        """Test padded positions do not affect the pooled, unit-length vector."""
+        hidden = np.array([[[3.0, 4.0], [100.0, 100.0]]])
+        mask = np.array([[1, 0]])
+
+        assert mean_pool(hidden, mask, normalize=False).tolist() == [[3.0, 4.0]]
+        assert mean_pool(hidden, mask).tolist() == [[0.6, 0.8]]
+
+    def test_embeddings_follow_input_order(self, onnx_fn):
+        """Test length-sorted runs map back to the input order."""
+        with patch.object(OnnxEmbeddingFunction, "RUN_BATCH_SIZE", 2):
+            vectors = onnx_fn(["a b a", "b", "a b"])
+
+        assert vectors == [[pytest.approx(7 / 3), 1.0], [3.0, 1.0], [2.5, 1.0]]
+        assert onnx_fn.session.run.call_count == 2
+
+    def test_parity_report(self):
+        """Test parity is measured as the worst and mean cosine similarity."""
+        reference = lambda input: [[1.0, 0.0] for _ in input]
+        same_direction = lambda input: [[2.0, 0.0] for _ in input]
+        rotated = lambda input: [[1.0, 1.0]] + [[1.0, 0.0] for _ in input[1:]]
+
+        assert parity_report(reference, same_direction, ["x", "y"]).min_cosine == pytest.approx(1)
+        report = parity_report(reference, rotated, ["x", "y"])
+        assert report.min_cosine == pytest.approx(2**-0.5)
+        assert not report.passed(0.99)
+
+    def test_missing_model_dir_falls_back(self):
+        """Test the ONNX backend without a local model directory uses dummy embeddings."""
+        with patch.dict("os.environ", {"EMBEDDING_BACKEND": "onnx", "TRANSFORMERS_OFFLINE": "0"}):
+            store = VectorStore()
+
+        assert store.embedding_status == "fallback"
+
+    def test_failed_parity_check_uses_torch_model(self, tmp_path):
+        """Test ONNX embeddings that disagree with torch are not used."""
+        env = {
+            "EMBEDDING_BACKEND": "onnx",
+            "EMBEDDING_MODEL_PATH": str(tmp_path),
+            "EMBEDDING_ONNX_PARITY_CHECK": "1",
+            "TRANSFORMERS_OFFLINE": "0",
+        }
+        torch_fn = Mock(side_effect=lambda input: [[1.0, 0.0] for _ in input])
+        onnx_fn = Mock(side_effect=lambda input: [[0.0, 1.0] for _ in input], model_id="m#onnx")
+        with patch.dict("os.environ", env), patch(
+            "server.shared.vector_store.embedding_functions.SentenceTransformerEmbeddingFunction",
+            return_value=torch_fn,
+        ), patch.object(OnnxEmbeddingFunction, "from_env", return_value=onnx_fn):
+            store = VectorStore()
+            assert store.embedding_fn is torch_fn
+            assert store.embedding_model_id == str(tmp_path)
+
+            onnx_fn.side_effect = torch_fn.side_effect  # Now in agreement
+            store = VectorStore()
+            assert store.embedding_fn is onnx_fn
+            assert store.embedding_model_id == "m#onnx"
+
+
+class TestLexicalIndex:
+    """Tests for the FTS5 chunk index and hybrid retrieval."""
+
+    @pytest.fixture
+    def index(self, tmp_path):
+        index = LexicalIndex(str(tmp_path / "lexical.sqlite3"))
+        index.upsert(
+            "p",
+            ["c1", "c2", "c3"],
+            [
+                "def parse_file(path):\n    return open(path).read()",
+                "class TokenBudget:\n    def count_line(self, line): ...",
+                "# reads the config file from disk",
+            ],
+            [
+                {"file_path": "parser.py", "function_name": "parse_file", "language": "python"},
+                {"file_path": "budget.py", "function_name": "TokenBudget, TokenBudget.count_line"},
+                {"file_path": "config.py", "function_name": ""},
+            ],
+        )
+        return index
+
+    @pytest.fixture
+    def hybrid_store(self, tmp_path):
+        env = {
+            "TRANSFORMERS_OFFLINE": "1",
+            "LEXICAL_INDEX_PATH": str(tmp_path / "lexical.sqlite3"),
+            "EMBEDDING_CACHE_MAX_MB": "0",
+        }
+        with patch.dict("os.environ", env):
+            return VectorStore()
+
+    def test_query_identifiers(self):
+        """Test identifiers are picked out of questions, plain words are not."""
+        assert query_identifiers("where is parse_file called?") == ["parse_file"]
+        assert query_identifiers("What does TokenBudget.count_line return") == [
+            "TokenBudget.count_line",
+            "count_line",
+        ]
+        assert query_identifiers("explain `main` and run()") == ["main", "run"]
+        assert query_identifiers("how does the parser work") == []
+        assert query_identifiers("TokenBudget") == ["TokenBudget"]
+
+    def test_symbol_lookup_is_exact(self, index):
+        """Test symbols match whole names, including packed and qualified ones."""
+        assert [r["id"] for r in index.lookup_symbols("p", ["parse_file"])] == ["c1"]
+        assert [r["id"] for r in index.lookup_symbols("p", ["count_line"])] == ["c2"]
+        assert index.lookup_symbols("p", ["parse"]) == []
+        assert index.lookup_symbols("other", ["parse_file"]) == []
+
+    def test_search_ranks_by_bm25(self, index):
+        """Test full-text search matches words and ignores FTS syntax in queries."""
+        results = index.search("p", 'read the "file" NOT (config')
+
+        assert {r["id"] for r in results} == {"c1", "c3"}
+        assert results[0]["metadata"]["file_path"] in {"parser.py", "config.py"}
+
+    def test_upsert_and_delete_keep_index_in_step(self, index):
+        """Test rewrites replace rows and deletes remove them everywhere."""
+        index.upsert("p", ["c1"], ["def parse_file(): pass"], [{"file_path": "parser.py"}])
+        assert index.count("p") == 3
+        assert index.lookup_symbols("p", ["parse_file"]) == []  # New metadata has no name
+
+        index.delete_files("p", ["budget.py"])
+        assert index.count("p") == 2
+        assert index.search("p", "count_line") == []
+
+        index.delete_project("p")
+        assert index.count("p") == 0
+
+    @pytest.mark.asyncio
+    async def test_symbol_hits_skip_the_embedder(self, hybrid_store):
+        """Test a query naming a stored symbol is answered by the lexical index."""
+        project_id = f"test-hybrid-{id(self)}"
+        await hybrid_store.add_code_snippets(
+            project_id,
+            [
+                {
+                    "code": "def load_settings(): ...",
+                    "file_path": "a.py",
+                    "function_name": "load_settings",
+                },
+                {"code": "def save(): ...", "file_path": "b.py", "function_name": "save"},
+            ],
+        )
+
+        lookup = hybrid_store.lexical_index.lookup_symbols
+        threads = []
+
+        def recording_lookup(*args):
+            threads.append(threading.current_thread())
+            return lookup(*args)
+
+        with patch.object(hybrid_store.embedding_worker, "embed_async") as embed, patch.object(
+            hybrid_store.lexical_index, "lookup_symbols", recording_lookup
+        ):
+            results = await hybrid_store.search_code(project_id, "what calls load_settings?")
+
+        embed.assert_not_called()
+        assert threads and threads[0] is not threading.main_thread()  # Not on the event loop
+        assert [r["metadata"]["file_path"] for r in results] == ["a.py"]
+        assert results[0]["match"] == "symbol"
+
+    def test_schema_is_created_at_construction(self, tmp_path):
+        """Test the tables exist before the first query, so no search runs the DDL."""
+        path = tmp_path / "lexical.sqlite3"
+        LexicalIndex(str(path))
+
+        with sqlite3.connect(path) as conn:
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+        assert {"chunks", "chunk_symbols", "chunks_fts"} <= tables
+
+    @pytest.mark.asyncio
+    async def test_replace_file_chunks_swaps_only_stale_chunks(self, hybrid_store):
+        """Test replacing a file's chunks keeps unchanged ones and drops the rest everywhere."""
+        project_id = f"test-replace-{id(self)}"
+        await hybrid_store.add_code_snippets(
+            project_id,
+            [
+                {"code": "def keep(): ...", "file_path": "a.py", "function_name": "keep"},
+                {"code": "def old(): ...", "file_path": "a.py", "function_name": "old"},
+                {"code": "def other(): ...", "file_path": "b.py", "function_name": "other"},
+            ],
+        )
+        new = [
+            {"code": "def keep(): ...", "file_path": "a.py", "function_name": "keep"},
+            {"code": "def new(): ...", "file_path": "a.py", "function_name": "new"},
+        ]
+        embedded = await hybrid_store.embed_snippets(project_id, new)
+
+        await hybrid_store.replace_file_chunks(project_id, ["a.py"], embedded)
+
+        stored = hybrid_store._get_project_collection(project_id).get()
+        assert sorted(stored["documents"]) == [
+            "def keep(): ...",
+            "def new(): ...",
+            "def other(): ...",
+        ]
+        assert hybrid_store.lexical_index.count(project_id) == 3
+        assert hybrid_store.lexical_index.lookup_symbols(project_id, ["old"]) == []
+
+    @pytest.mark.asyncio
+    async def test_search_fuses_lexical_and_vector_results(self, hybrid_store):
+        """Test results found by both searches are merged and ranked first."""
+        project_id = f"test-fusion-{id(self)}"
+        await hybrid_store.add_code_snippets(
+            project_id,
+            [
+                {"code": "retry the upload request", "file_path": "a.py"},
+                {"code": "unrelated helper", "file_path": "b.py"},
+            ],
+        )
+
+        results = await hybrid_store.search_code(project_id, "upload retry", n_results=2)
+
+        assert results[0]["metadata"]["file_path"] == "a.py"
+        assert results[0]["match"] == "hybrid"
+        assert len(results) == 2
+
+    @pytest.mark.asyncio
+    async def test_sync_rebuilds_from_chroma(self, hybrid_store):
+        """Test a lexical index missing chunks is rebuilt from the collection."""
+        project_id = f"test-rebuild-{id(self)}"
+        await hybrid_store.add_code_snippets(
+            project_id, [{"code": f"x{i} = {i}", "file_path": "x.py"} for i in range(3)]
+        )
+        hybrid_store.lexical_index.delete_project(project_id)
+
+        assert await hybrid_store.sync_lexical_index(project_id, 3)
+        assert hybrid_store.lexical_index.count(project_id) == 3
+        assert not await hybrid_store.sync_lexical_index(project_id, 3)
+
+
 class TestVectorStoreWithChroma:
     """Tests for ChromaDB integration."""
 
@@ -181,14 +672,15 @@ class TestVectorStoreWithChroma:
 
 
 class TestVectorStoreLazyLoading:
-    """Tests for lazy loading behavior in ingestion router."""
+    """Tests for the shared, lazily created VectorStore."""
 
     def test_get_vector_store_singleton_pattern(self):
-        """Test that get_vector_store returns same instance."""
+        """Test that chat and ingestion get the same instance."""
+        from server.chat import router_enhanced
         from server.ingestion.router import get_vector_store
 
         store1 = get_vector_store()
-        store2 = get_vector_store()
+        store2 = router_enhanced.get_vector_store()
 
         assert store1 is store2, "Should return same singleton instance"
 
@@ -215,14 +707,109 @@ class TestVectorStoreLazyLoading:
 
     def test_vector_store_initialized_on_first_use(self):
         """Test that VectorStore is created on first get_vector_store call."""
-        from server.ingestion.router import _vector_store, get_vector_store
+        from server.shared import vector_store
 
-        # Initially should be None
-        # (Can't directly access _vector_store due to scope, but conceptually tested)
-        # First call creates it
-        with patch.dict("os.environ", {"TRANSFORMERS_OFFLINE": "1"}):
-            store = get_vector_store()
-            assert store is not None
+        with patch.object(vector_store, "_shared_store", None), patch.dict(
+            "os.environ", {"TRANSFORMERS_OFFLINE": "1"}
+        ):
+            store = vector_store.get_vector_store()
+            assert store is vector_store._shared_store
+            assert store.wait_until_ready(5)
+            assert store.embedding_status == "fallback"
+
+
+class TestBackgroundWarmUp:
+    """Tests for loading the embedding model off the request path."""
+
+    @pytest.fixture
+    def slow_model(self):
+        """A SentenceTransformer stand-in that loads when release is set."""
+        release = threading.Event()
+
+        class SlowModel:
+            def __init__(self, model_name):
+                release.wait(10)
+
+            def __call__(self, input):
+                return [[1.0] * 384 for _ in input]
+
+        with patch(
+            "server.shared.vector_store.embedding_functions.SentenceTransformerEmbeddingFunction",
+            SlowModel,
+        ), patch.dict("os.environ", {"TRANSFORMERS_OFFLINE": "0", "EMBEDDING_CACHE_MAX_MB": "0"}):
+            yield release
+
+    def test_reports_loading_until_model_is_ready(self, slow_model):
+        """Test construction returns at once and readiness follows the load."""
+        store = VectorStore(background_load=True)
+        assert not store.is_ready
+        assert store.embedding_status == "loading"
+
+        slow_model.set()
+
+        assert store.wait_until_ready(5)
+        assert store.embedding_status == "ready"
+        assert store.embedding_model_id == "all-MiniLM-L6-v2"
+
+    @pytest.mark.asyncio
+    async def test_embedding_waits_for_the_model(self, slow_model):
+        """Test embeddings requested during warm-up come from the model, not the fallback."""
+        store = VectorStore(background_load=True)
+        threading.Timer(0.1, slow_model.set).start()
+
+        embedded = await store.embed_snippets("p", [{"code": "def f(): pass", "file_path": "f.py"}])
+
+        assert embedded.embeddings == [[1.0] * 384]
+
+    @pytest.mark.asyncio
+    async def test_ingestion_fails_instead_of_storing_placeholders(self, slow_model):
+        """Test ingestion during a warm-up that outlasts the timeout stores nothing."""
+        store = VectorStore(background_load=True)
+        store.warm_up_timeout = 0.1
+        project_id = f"warm-up-{id(self)}"
+
+        with pytest.raises(EmbeddingModelNotReady):
+            await store.add_code_snippets(project_id, [{"code": "x = 1", "file_path": "x.py"}])
+        with pytest.raises(EmbeddingModelNotReady):
+            store._embed_documents(["x = 1"])  # Pool threads never wait for the model
+
+        assert store._get_project_collection(project_id).count() == 0
+        slow_model.set()
+
+    def test_readiness_endpoint(self):
+        """Test /health/ready is 503 while loading and 200 once ready."""
+        from fastapi.testclient import TestClient
+
+        from server import main_enhanced
+
+        store = Mock(is_ready=False, embedding_status="loading", embedding_model_id=None)
+        client = TestClient(main_enhanced.app)
+        with patch.object(main_enhanced, "get_vector_store", return_value=store):
+            loading = client.get("/health/ready")
+            store.is_ready, store.embedding_status = True, "ready"
+            ready = client.get("/health/ready")
+
+        assert loading.status_code == 503
+        assert loading.json()["embedding"] == "loading"
+        assert ready.status_code == 200
+
+    def test_readiness_endpoint_in_fallback(self):
+        """Test /health/ready stays 503 when the model failed and dummy embeddings are used."""
+        from fastapi.testclient import TestClient
+
+        from server import main_enhanced
+
+        store = Mock(is_ready=True, embedding_status="fallback", embedding_model_id=None)
+        client = TestClient(main_enhanced.app)
+        with patch.object(main_enhanced, "get_vector_store", return_value=store):
+            response = client.get("/health/ready")
+
+        assert response.status_code == 503
+        assert response.json() == {
+            "ready": False,
+            "embedding": "fallback",
+            "embedding_model": None,
+        }
 
 
 if __name__ == "__main__":